@@ -14,7 +14,7 @@ class AdminAPI {
         }
     }
 
-    async request(endpoint, options = {}, retryCount = 0) {
+    async request(endpoint, options = {}, retryCount = 0, refreshed = false) {
         try {
             // Get the latest token
             this.token = localStorage.getItem('token');
@@ -50,7 +50,12 @@ class AdminAPI {
                     // Handle specific status codes
                     switch (response.status) {
                         case 401:
-                            localStorage.removeItem('token');
+                            // Renew the access token once and replay the request
+                            if (!refreshed && !endpoint.includes('/auth/') &&
+                                await refreshAccessToken(this.baseUrl)) {
+                                return this.request(endpoint, options, retryCount, true);
+                            }
+                            clearAuthTokens();
                             localStorage.removeItem('userRole');
                             window.location.href = './login.html';
                             throw new Error('Authentication failed');
@@ -96,7 +101,7 @@ class AdminAPI {
                     if (retryCount < this.maxRetries) {
                         // Wait longer between each retry
                         await new Promise(resolve => setTimeout(resolve, this.retryDelay * (retryCount + 1)));
-                        return this.request(endpoint, options, retryCount + 1);
+                        return this.request(endpoint, options, retryCount + 1, refreshed);
                     } else {
                         throw new Error('Network connection failed. Please check your internet connection and try again.');
                     }
@@ -0,0 +1,61 @@
+// Access token renewal shared by the page API clients (admin.js, student-api.js, teacher-api.js, parent-ui.js)
+
+// login.js keeps the tokens in localStorage with "remember me", else in sessionStorage
+function authStorage() {
+    return sessionStorage.getItem('refreshToken') ? sessionStorage : localStorage;
+}
+
+function clearAuthTokens() {
+    [localStorage, sessionStorage].forEach(storage => {
+        storage.removeItem('token');
+        storage.removeItem('refreshToken');
+    });
+}
+
+let pendingRefresh = null;
+
+// Exchange the refresh token for a new access token and the next refresh token.
+// Requests that fail together share one exchange: a refresh token is spent on first
+// use, and presenting it twice revokes the whole login. Resolves to the new access
+// token, or to null once both tokens are cleared because the exchange failed.
+function refreshAccessToken(baseUrl) {
+    if (!pendingRefresh) {
+        pendingRefresh = exchangeRefreshToken(baseUrl).finally(() => {
+            pendingRefresh = null;
+        });
+    }
+    return pendingRefresh;
+}
+
+async function exchangeRefreshToken(baseUrl) {
+    const storage = authStorage();
+    const refreshToken = storage.getItem('refreshToken');
+    if (!refreshToken) {
+        clearAuthTokens();
+        return null;
+    }
+
+    try {
+        const response = await fetch(`${baseUrl}/auth/refresh`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            mode: 'cors',
+            credentials: 'omit',
+            body: JSON.stringify({ refresh_token: refreshToken })
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP Error: ${response.status}`);
+        }
+        const data = await response.json();
+        storage.setItem('token', data.access_token);
+        storage.setItem('refreshToken', data.refresh_token);
+        return data.access_token;
+    } catch (error) {
+        console.error('Token refresh failed:', error);
+        clearAuthTokens();
+        return null;
+    }
+}
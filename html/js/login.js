@@ -60,6 +60,7 @@ async function handleLogin(event) {
         // Store token and user info
         const storage = rememberMe ? localStorage : sessionStorage;
         storage.setItem('token', data.access_token);
+        storage.setItem('refreshToken', data.refresh_token);
         storage.setItem('userRole', data.user_role || data.role);
         storage.setItem('userEmail', email);
 
@@ -781,7 +781,7 @@ class ParentUI {
     }
     
     // Helper: Make API request
-    async apiRequest(endpoint, method = 'GET', data = null) {
+    async apiRequest(endpoint, method = 'GET', data = null, refreshed = false) {
         const url = this.baseUrl + endpoint;
         const token = localStorage.getItem('token');
         
@@ -800,6 +800,11 @@ class ParentUI {
         try {
             const response = await fetch(url, options);
             
+            // Renew the access token once and replay the request
+            if (response.status === 401 && !refreshed && await refreshAccessToken(this.baseUrl)) {
+                return this.apiRequest(endpoint, method, data, true);
+            }
+            
             if (!response.ok) {
                 const error = await response.json();
                 throw new Error(error.detail || 'API request failed');
@@ -10,7 +10,7 @@ class StudentAPI {
         }
     }
     
-    async makeRequest(endpoint, method = 'GET', data = null, isFormData = false) {
+    async makeRequest(endpoint, method = 'GET', data = null, isFormData = false, refreshed = false) {
         try {
             const headers = {
                 'Content-Type': 'application/json',
@@ -40,8 +40,17 @@ class StudentAPI {
             const response = await fetch(`${this.baseUrl}${endpoint}`, config);
             console.log('Response status:', response.status);
             
+            if (response.status === 401 && !refreshed) {
+                // Renew the access token once and replay the request
+                const token = await refreshAccessToken(this.baseUrl);
+                if (token) {
+                    this.token = token;
+                    return this.makeRequest(endpoint, method, data, isFormData, true);
+                }
+            }
+            
             if (response.status === 401 || response.status === 403) {
-                localStorage.removeItem('token');
+                clearAuthTokens();
                 window.location.href = './login.html';
                 throw new Error('Unauthorized');
             }
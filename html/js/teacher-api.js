@@ -10,7 +10,7 @@ class TeacherAPI {
         }
     }
 
-    async makeRequest(endpoint, method = 'GET', data = null) {
+    async makeRequest(endpoint, method = 'GET', data = null, refreshed = false) {
         try {
             const headers = {
                 'Content-Type': 'application/json',
@@ -34,6 +34,15 @@ class TeacherAPI {
             const response = await fetch(`${this.baseUrl}${endpoint}`, config);
             console.log('Response status:', response.status);
 
+            if (response.status === 401 && !refreshed) {
+                // Renew the access token once and replay the request
+                const token = await refreshAccessToken(this.baseUrl);
+                if (token) {
+                    this.token = token;
+                    return this.makeRequest(endpoint, method, data, true);
+                }
+            }
+
             if (response.status === 401 || response.status === 403) {
                 throw new Error('Unauthorized');
             }
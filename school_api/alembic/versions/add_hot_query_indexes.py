@@ -0,0 +1,73 @@
+"""Add indexes and unique keys for hot queries
+
+Revision ID: add_hot_query_indexes
+Revises: fix_grades_table
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_hot_query_indexes'
+down_revision: Union[str, None] = 'fix_grades_table'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Foreign key / filter columns used by the routers
+    op.create_index(op.f('ix_users_role'), 'users', ['role'], unique=False)
+    op.create_index(op.f('ix_users_parent_id'), 'users', ['parent_id'], unique=False)
+    op.create_index(op.f('ix_classes_teacher_id'), 'classes', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_assignments_teacher_id'), 'assignments', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_assignments_class_id'), 'assignments', ['class_id'], unique=False)
+
+    # Remove duplicates (keeping the newest row) so the unique keys can be created
+    op.execute(
+        "DELETE FROM grades WHERE assignment_id IS NOT NULL AND id NOT IN ("
+        "SELECT MAX(id) FROM grades WHERE assignment_id IS NOT NULL "
+        "GROUP BY class_id, assignment_id, student_id)"
+    )
+    # grades.submission_id references assignment_submissions without ON DELETE: move the
+    # grades of a duplicate submission to the one that is kept before deleting the rest
+    op.execute(
+        "UPDATE grades SET submission_id = ("
+        "SELECT MAX(kept.id) FROM assignment_submissions kept "
+        "JOIN assignment_submissions duplicate ON duplicate.assignment_id = kept.assignment_id "
+        "AND duplicate.student_id = kept.student_id "
+        "WHERE duplicate.id = grades.submission_id) "
+        "WHERE submission_id IN ("
+        "SELECT id FROM assignment_submissions WHERE id NOT IN ("
+        "SELECT MAX(id) FROM assignment_submissions GROUP BY assignment_id, student_id))"
+    )
+    op.execute(
+        "DELETE FROM assignment_submissions WHERE id NOT IN ("
+        "SELECT MAX(id) FROM assignment_submissions GROUP BY assignment_id, student_id)"
+    )
+    op.execute(
+        "DELETE FROM attendance WHERE id NOT IN ("
+        "SELECT MAX(id) FROM attendance GROUP BY class_id, date, student_id)"
+    )
+
+    # Composite unique keys; these back the ON CONFLICT upserts in the teacher router
+    op.create_index('uq_grades_class_assignment_student', 'grades',
+                    ['class_id', 'assignment_id', 'student_id'], unique=True)
+    op.create_index('uq_assignment_submissions_assignment_student', 'assignment_submissions',
+                    ['assignment_id', 'student_id'], unique=True)
+    op.create_index('uq_attendance_class_date_student', 'attendance',
+                    ['class_id', 'date', 'student_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_attendance_class_date_student', table_name='attendance')
+    op.drop_index('uq_assignment_submissions_assignment_student', table_name='assignment_submissions')
+    op.drop_index('uq_grades_class_assignment_student', table_name='grades')
+    op.drop_index(op.f('ix_assignments_class_id'), table_name='assignments')
+    op.drop_index(op.f('ix_assignments_teacher_id'), table_name='assignments')
+    op.drop_index(op.f('ix_classes_teacher_id'), table_name='classes')
+    op.drop_index(op.f('ix_users_parent_id'), table_name='users')
+    op.drop_index(op.f('ix_users_role'), table_name='users')
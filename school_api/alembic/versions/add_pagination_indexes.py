@@ -0,0 +1,43 @@
+"""Add indexes for keyset pagination of list endpoints
+
+Revision ID: add_pagination_indexes
+Revises: add_refresh_tokens
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_pagination_indexes'
+down_revision: Union[str, None] = 'add_refresh_tokens'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filter column followed by the sort key, so each page is one index range scan;
+    # these replace the single-column indexes they start with
+    op.drop_index(op.f('ix_users_role'), table_name='users')
+    op.create_index('ix_users_role_id', 'users', ['role', 'id'], unique=False)
+    op.drop_index(op.f('ix_assignments_teacher_id'), table_name='assignments')
+    op.create_index('ix_assignments_teacher_id_due_date', 'assignments', ['teacher_id', 'due_date', 'id'],
+                    unique=False)
+    op.drop_index(op.f('ix_assignments_class_id'), table_name='assignments')
+    op.create_index('ix_assignments_class_id_id', 'assignments', ['class_id', 'id'], unique=False)
+    op.create_index('ix_attendance_student_id_date', 'attendance', ['student_id', 'date', 'id'], unique=False)
+    op.create_index('ix_grades_student_id_id', 'grades', ['student_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_grades_student_id_id', table_name='grades')
+    op.drop_index('ix_attendance_student_id_date', table_name='attendance')
+    op.drop_index('ix_assignments_class_id_id', table_name='assignments')
+    op.create_index(op.f('ix_assignments_class_id'), 'assignments', ['class_id'], unique=False)
+    op.drop_index('ix_assignments_teacher_id_due_date', table_name='assignments')
+    op.create_index(op.f('ix_assignments_teacher_id'), 'assignments', ['teacher_id'], unique=False)
+    op.drop_index('ix_users_role_id', table_name='users')
+    op.create_index(op.f('ix_users_role'), 'users', ['role'], unique=False)
@@ -0,0 +1,127 @@
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import json
+import logging
+import queue
+import random
+import sys
+import time
+
+from .config import settings
+
+# Structured access records; handled on a background thread, never by the root logger
+access_logger = logging.getLogger("school_api.access")
+access_logger.propagate = False
+
+
+def route_template(scope) -> Optional[str]:
+    """Path template of the matched route (e.g. "/teacher/classes/{class_id}/grades")"""
+    route = scope.get("route")
+    return getattr(route, "path", None)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record):
+        return record
+
+
+class AccessLogFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            **getattr(record, "access", {"message": record.getMessage()}),
+        }
+        return json.dumps(entry, separators=(",", ":"))
+
+
+def configure_access_log(stream=None) -> QueueListener:
+    """Route access records through a queue to a handler running on its own thread"""
+    if settings.ACCESS_LOG_FILE:
+        target = logging.FileHandler(settings.ACCESS_LOG_FILE)
+    else:
+        target = logging.StreamHandler(stream or sys.stdout)
+    target.setFormatter(AccessLogFormatter())
+
+    log_queue = queue.SimpleQueue()
+    for handler in list(access_logger.handlers):
+        access_logger.removeHandler(handler)
+    access_logger.addHandler(DeferredQueueHandler(log_queue))
+    access_logger.setLevel(settings.ACCESS_LOG_LEVEL)
+
+    listener = QueueListener(log_queue, target, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class AccessLogMiddleware:
+    """Pure ASGI access log: one structured record per request, sampled, with per-route levels"""
+
+    def __init__(self, app):
+        self.app = app
+        self.route_levels = {
+            route: logging.getLevelName(level.upper()) for route, level in settings.ACCESS_LOG_ROUTE_LEVELS.items()
+        }
+        self.default_level = logging.getLevelName(settings.ACCESS_LOG_LEVEL.upper())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        response = {"status": 500, "db_queries": None, "trace_id": None}
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"x-db-queries":
+                        response["db_queries"] = int(value)
+                    elif name == b"x-trace-id":
+                        response["trace_id"] = value.decode()
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_and_capture)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.log(scope, response, time.perf_counter() - started, error)
+
+    def log(self, scope, response, duration, error):
+        status = response["status"]
+        duration_ms = duration * 1000
+        route = route_template(scope)
+
+        if error is not None or status >= 500:
+            level = logging.ERROR
+        elif duration_ms >= settings.ACCESS_LOG_SLOW_MS:
+            level = logging.WARNING
+        else:
+            level = self.route_levels.get(route or scope["path"], self.default_level)
+            # Sample routine successes only; errors and slow requests are always kept
+            if status < 400 and random.random() >= settings.ACCESS_LOG_SAMPLE_RATE:
+                return
+
+        if not access_logger.isEnabledFor(level):
+            return
+
+        client = scope.get("client")
+        access_logger.log(level, "access", extra={"access": {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "db_queries": response["db_queries"],
+            "trace_id": response["trace_id"],
+            "client": client[0] if client else None,
+            "error": repr(error) if error is not None else None,
+        }})
@@ -1,8 +1,14 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException, status, Depends
 from passlib.context import CryptContext
 from .models import User
-from .dependencies import get_current_user
+from .config import settings
+from .dependencies import Principal, get_current_principal
+import asyncio
 import logging
+import threading
+import time
 
 # Password hashing configuration
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -15,9 +21,90 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a stored password against one provided by user"""
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHashPool:
+    """Runs bcrypt on a fixed number of threads, away from the event loop.
+
+    Work beyond max_pending (running + queued) is refused with a 503 instead of
+    queueing without limit, so a login storm cannot stall every other request.
+    """
+
+    def __init__(self, workers: int, max_pending: int, retry_after: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _job(self, queued_at, func, *args):
+        waited = time.perf_counter() - queued_at
+        with self._lock:
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            # Only jobs that reached a worker count, so wait_ms_avg is over the waits measured
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many password checks in progress, please retry shortly",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._job, time.perf_counter(), func, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms_avg": round(self.wait_seconds_total / self.completed * 1000, 3) if self.completed else 0.0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            }
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
+
+# Password logins vs. refresh-token renewals, served at /_debug/logins
+login_counts = Counter()
+
+async def hash_password_async(password: str) -> str:
+    """get_password_hash on the password pool"""
+    return await password_pool.run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password pool"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
 async def get_current_teacher(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_principal)
+) -> Principal:
     """Get current authenticated teacher"""
     if current_user.role != "teacher":
         raise HTTPException(
@@ -27,8 +114,8 @@ async def get_current_teacher(
     return current_user
 
 async def get_current_student(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_principal)
+) -> Principal:
     """Get current authenticated student"""
     logger = logging.getLogger(__name__)
     logger.info(f"Checking if user {current_user.email} is a student")
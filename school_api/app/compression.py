@@ -0,0 +1,211 @@
+from typing import Optional
+import gzip
+import mimetypes
+import os
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from .config import settings
+
+# Content-Encoding -> file suffix of the precompressed variant, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# Types worth compressing; images, fonts and archives are already compressed
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The preferred coding of ENCODINGS the client accepts (q > 0), or None"""
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if qualities.get(encoding, qualities.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _Compressor:
+    """Streaming gzip/brotli encoder; flush() emits everything written so far"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31: gzip container
+            self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.flush()
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Negotiated br/gzip compression of compressible responses of at least COMPRESSION_MIN_SIZE.
+
+    A body sent in one message is compressed whole. Streamed bodies (StreamingResponse,
+    NDJSON) are compressed chunk by chunk and flushed after each one, so clients still
+    receive every chunk as soon as it is produced. Responses that already carry a
+    Content-Encoding (precompressed static files) pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if (start["status"] < 200 or start["status"] in (204, 304) or "content-encoding" in headers
+                        or not is_compressible(headers.get("content-type"))
+                        or (not more_body and len(body) < settings.COMPRESSION_MIN_SIZE)):
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if more_body:
+                    body = compressor.compress(body) + compressor.flush()
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    compressor = None
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if compressor is None:
+                await send(message)
+            elif more_body:
+                await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.flush(),
+                            "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.finish(),
+                            "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves the .br/.gz file written by precompress_directory when the client accepts it.
+
+    A variant older than its source is ignored, so an asset edited without re-running the
+    build step is still served (and then compressed on the fly by CompressionMiddleware).
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        encoding = accepted_encoding(request_headers.get("accept-encoding"))
+        if encoding is not None:
+            variant = f"{full_path}{ENCODINGS[encoding]}"
+            try:
+                variant_stat = os.stat(variant)
+            except OSError:
+                variant_stat = None
+            if variant_stat is not None and variant_stat.st_mtime >= stat_result.st_mtime:
+                media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+                response = FileResponse(variant, status_code=status_code, stat_result=variant_stat,
+                                        media_type=media_type, headers={"Content-Encoding": encoding})
+                response.headers.add_vary_header("Accept-Encoding")
+                if self.is_not_modified(response.headers, request_headers):
+                    return NotModifiedResponse(response.headers)
+                return response
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers.add_vary_header("Accept-Encoding")
+        return response
+
+
+def precompress_file(path: str, min_saving: Optional[float] = None) -> list:
+    """Write path.br and path.gz at maximum compression; returns the variants kept.
+
+    A variant that does not save at least min_saving of the file's size (e.g. for a JPEG)
+    is not written, and a stale one is removed.
+    """
+    if min_saving is None:
+        min_saving = settings.PRECOMPRESS_MIN_SAVING
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = {
+        "br": brotli.compress(data, quality=11),
+        "gzip": gzip.compress(data, compresslevel=9, mtime=0),
+    }
+    kept = []
+    for encoding, compressed in variants.items():
+        variant = path + ENCODINGS[encoding]
+        if len(compressed) <= len(data) * (1 - min_saving):
+            with open(variant, "wb") as f:
+                f.write(compressed)
+            kept.append(variant)
+        elif os.path.exists(variant):
+            os.remove(variant)
+    return kept
+
+
+def precompress_directory(directory: str, extensions: Optional[tuple] = None) -> dict:
+    """Precompress every file under directory with one of the extensions; returns path -> variants"""
+    extensions = tuple(extensions or settings.PRECOMPRESS_EXTENSIONS)
+    results = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in extensions:
+                path = os.path.join(root, name)
+                results[path] = precompress_file(path)
+    return results
@@ -1,31 +1,186 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
-
-# Get the directory containing this file
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-# Go up one level to get to the school_api directory
-PROJECT_DIR = os.path.dirname(BASE_DIR)
-# Database URL points to school.db in the project root
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(PROJECT_DIR, '..', 'school.db')}"
-
-# Create SQLAlchemy engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Only needed for SQLite
-)
-
-# Create SessionLocal class
+from sqlalchemy.pool import StaticPool
+from .config import settings
+
+# Database URL comes from settings (DATABASE_URL env var or .env file)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+
+# Requests with these methods are served from the read-only pool
+READ_ONLY_METHODS = {"GET", "HEAD"}
+
+# asyncio DBAPI drivers used for AsyncSession engines
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def engine_options(database_url: str) -> dict:
+    """Build create_engine keyword arguments for the given URL from settings"""
+    url = make_url(database_url)
+    options = {"echo": settings.DB_ECHO}
+
+    if url.get_backend_name() == "sqlite":
+        # SQLite connections are shared across the threadpool used by FastAPI
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            # An in-memory database only exists inside a single connection
+            options["poolclass"] = StaticPool
+            return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """PRAGMA statements for the SQLite production profile"""
+    pragmas = []
+    if settings.SQLITE_PRODUCTION_MODE:
+        pragmas += [
+            f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+            f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+            f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+            # Negative cache_size is measured in KiB rather than pages
+            f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}",
+            f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+            f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+        ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+def configure_sqlite(engine, read_only: bool = False):
+    """Apply the SQLite connection profile to every new DBAPI connection"""
+    pragmas = sqlite_pragmas(read_only)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def create_db_engine(database_url: str = SQLALCHEMY_DATABASE_URL, read_only: bool = False):
+    """Create a pooled SQLAlchemy engine for SQLite or PostgreSQL"""
+    db_engine = create_engine(database_url, **engine_options(database_url))
+    if db_engine.dialect.name == "sqlite":
+        configure_sqlite(db_engine, read_only=read_only)
+    return db_engine
+
+def create_read_engine(primary_engine):
+    """Create the engine used for read-only requests"""
+    if settings.DATABASE_READ_URL:
+        return create_db_engine(settings.DATABASE_READ_URL)
+    url = primary_engine.url
+    if url.get_backend_name() == "sqlite" and not _is_memory_sqlite(url):
+        # Separate pool of query_only connections; with WAL they never block writers
+        return create_db_engine(url.render_as_string(hide_password=False), read_only=True)
+    return primary_engine
+
+def async_database_url(database_url: str) -> str:
+    """Swap the driver of a database URL for its asyncio counterpart"""
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver and url.drivername != driver:
+        url = url.set(drivername=driver)
+    return url.render_as_string(hide_password=False)
+
+def create_async_db_engine(database_url: str = SQLALCHEMY_DATABASE_URL, read_only: bool = False):
+    """Create a pooled asyncio engine (aiosqlite / asyncpg) for the given URL"""
+    async_engine = create_async_engine(async_database_url(database_url), **engine_options(database_url))
+    if async_engine.dialect.name == "sqlite":
+        configure_sqlite(async_engine.sync_engine, read_only=read_only)
+    return async_engine
+
+def create_async_read_engine(primary_async_engine):
+    """Create the asyncio engine used for read-only requests, like create_read_engine"""
+    if settings.DATABASE_READ_URL:
+        return create_async_db_engine(settings.DATABASE_READ_URL)
+    url = primary_async_engine.url
+    if url.get_backend_name() == "sqlite" and not _is_memory_sqlite(url):
+        return create_async_db_engine(url.render_as_string(hide_password=False), read_only=True)
+    return primary_async_engine
+
+# Create SQLAlchemy engines
+engine = create_db_engine()
+read_engine = create_read_engine(engine)
+async_engine = create_async_db_engine()
+async_read_engine = create_async_read_engine(async_engine)
+
+# Create SessionLocal classes
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+# Async sessions keep loaded attributes after commit; lazy loads are not possible there
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+async def dispose_async_engines():
+    """Close pooled asyncio connections (their driver threads keep the process alive)"""
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+def upsert_insert(db):
+    """Dialect insert() construct supporting ON CONFLICT DO UPDATE (SQLite and PostgreSQL)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
 
 # Create Base class
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+def writes_on_read(endpoint):
+    """Mark a GET endpoint that writes, so it keeps using the primary pool"""
+    endpoint.writes_on_read = True
+    return endpoint
+
+def uses_read_pool(request: Request) -> bool:
+    if request.method not in READ_ONLY_METHODS:
+        return False
+    endpoint = request.scope.get("endpoint")
+    return not getattr(endpoint, "writes_on_read", False)
+
+# Dependency to get DB session; GET handlers get a read-only session
+def get_db(request: Request = None):
+    if request is not None and uses_read_pool(request):
+        db = ReadSessionLocal()
+    else:
+        db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# Dependency to explicitly get a read-only DB session
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get an AsyncSession; GET handlers get a read-only session
+async def get_async_db(request: Request = None):
+    if request is not None and uses_read_pool(request):
+        session_factory = AsyncReadSessionLocal
+    else:
+        session_factory = AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
@@ -3,9 +3,13 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from .models import User
 from .database import get_db
+from .principal_cache import attach_principal, principal_values
 from sqlalchemy.orm import Session
 from .config import settings
+from .instrumentation import current_stats, record_phase
+from .tracing import tracer
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,33 +17,99 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
-    logger.info("Attempting to get current user in dependencies")
+class Principal:
+    """The authenticated caller, authorized from token claims.
+
+    Column attributes are read from the cached user values; the ORM User is only
+    built (without a query) when a handler needs relationships or changes the row.
+    """
+
+    __slots__ = ("id", "email", "role", "token_version", "_db", "_values", "_user")
+
+    def __init__(self, db: Session, values: dict):
+        object.__setattr__(self, "id", values["id"])
+        object.__setattr__(self, "email", values["email"])
+        object.__setattr__(self, "role", values["role"])
+        object.__setattr__(self, "token_version", values["token_version"])
+        object.__setattr__(self, "_db", db)
+        object.__setattr__(self, "_values", values)
+        object.__setattr__(self, "_user", None)
+
+    @property
+    def user(self) -> User:
+        """The ORM row for this principal, attached to the request's session"""
+        if self._user is None:
+            object.__setattr__(self, "_user", attach_principal(self._db, self._values))
+        return self._user
+
+    def __getattr__(self, name):
+        if self._user is None and name in self._values:
+            return self._values[name]
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+
+    def __repr__(self):
+        return f"<Principal id={self.id} role={self.role}>"
+
+def authenticate_token(token: str, db: Session) -> Principal:
+    """Validate the JWT and build the Principal it describes"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        logger.info(f"Decoding token in dependencies: {token[:10]}...")
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             logger.error("No email found in token")
             raise credentials_exception
-        logger.info(f"Found email in token: {email}")
     except JWTError as e:
         logger.error(f"JWT Error in dependencies: {str(e)}")
         raise credentials_exception
-        
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+
+    # Served from the principal cache, so this is normally not a query
+    values = principal_values(db, email)
+    if values is None:
         logger.error(f"No user found for email: {email}")
         raise credentials_exception
-    
-    logger.info(f"Successfully found user in dependencies: {user.full_name}")
-    return user 
\ No newline at end of file
+    if values["is_active"] is False:
+        logger.error(f"User is deactivated: {email}")
+        raise credentials_exception
+
+    # Tokens issued before the uid/role/ver claims existed carry only "sub"
+    if "uid" in payload:
+        if (
+            payload["uid"] != values["id"]
+            or payload.get("role") != values["role"]
+            or payload.get("ver") != values["token_version"]
+        ):
+            logger.error(f"Token claims are out of date for: {email}")
+            raise credentials_exception
+
+    return Principal(db, values)
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """Get the authenticated caller from the JWT claims"""
+    started = time.perf_counter()
+    try:
+        with tracer.span("auth get_current_principal"):
+            principal = authenticate_token(token, db)
+    finally:
+        record_phase("auth", time.perf_counter() - started)
+
+    stats = current_stats()
+    if stats is not None:
+        stats.role = principal.role
+    return principal
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    """Get current authenticated user from JWT token"""
+    return principal
@@ -0,0 +1,135 @@
+from typing import Callable, Optional
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import get_db, upsert_insert
+from .responses import wants_ndjson
+
+# Tables some conditional GET depends on; only writes to these bump a cache_stamps row
+tracked_tables = set()
+
+
+def table_stamp(table: str) -> str:
+    """cache_stamps name of the change counter of a table"""
+    return f"table:{table}"
+
+
+def table_versions(db: Session, tables) -> tuple:
+    """Current change counter of each table (0 if it never changed), in the given order"""
+    names = [table_stamp(table) for table in tables]
+    versions = dict(db.execute(
+        select(models.CacheStamp.name, models.CacheStamp.version).filter(models.CacheStamp.name.in_(names))
+    ).all())
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def make_etag(*parts) -> str:
+    """Weak validator for a response computed from the given parts (route, scope, table versions)"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def conditional_get(*tracked_models, user: Optional[Callable] = None):
+    """Dependency answering 304 Not Modified while none of the models' tables changed.
+
+    The ETag is derived from the route, the query string, whether NDJSON was asked for, the
+    current user (when `user` is the auth dependency of a per-user view) and the change
+    counters of the tables, so a revalidation costs one primary-key lookup on cache_stamps:
+    no rows are loaded and no JSON is rendered. The dependency returns the ETag and Cache-Control headers; handlers
+    that build their own Response must pass them on (headers=...), for the others they are
+    set here.
+
+    Counters are bumped for ORM flushes and ORM bulk UPDATE/DELETE/INSERT statements, once
+    per transaction just before it commits, so a write made with raw SQL or outside the app
+    is not noticed until the next ORM write.
+    """
+    tables = tuple(model.__table__.name for model in tracked_models)
+    tracked_tables.update(tables)
+
+    def check(request: Request, response: Response, db: Session, user_id: Optional[int]) -> dict:
+        etag = make_etag(request.scope.get("route").path, request.url.query, wants_ndjson(request),
+                         user_id, tables, table_versions(db, tables))
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache" if user is not None else "no-cache",
+                   "Vary": "Accept"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        return headers
+
+    if user is None:
+        def dependency(request: Request, response: Response, db: Session = Depends(get_db)) -> dict:
+            return check(request, response, db, None)
+    else:
+        def dependency(request: Request, response: Response, db: Session = Depends(get_db),
+                       current_user=Depends(user)) -> dict:
+            return check(request, response, db, current_user.id)
+    return dependency
+
+
+def bump_tables(session: Session, tables):
+    """Increment the change counters of the tables, in the session's transaction"""
+    insert = upsert_insert(session)
+    stmt = insert(models.CacheStamp).values(
+        [{"name": table_stamp(table), "version": 1} for table in sorted(tables)]
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"version": models.CacheStamp.version + 1})
+    session.connection().execute(stmt)
+
+
+# Writes only note their tables; the counters are bumped once, right before the commit. The
+# upsert locks the cache_stamps rows until the transaction ends, so bumping on every flush
+# would serialize concurrent writers of a table for the whole of their transactions.
+def _note_written_tables(session, tables):
+    tables = set(tables) & tracked_tables
+    if tables:
+        session.info.setdefault("written_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_tables(session, flush_context):
+    changed = [obj for obj in session.dirty if session.is_modified(obj)]
+    written = list(session.new) + list(session.deleted) + changed
+    _note_written_tables(session, {obj.__table__.name for obj in written})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_written_table(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _note_written_tables(orm_execute_state.session, {mapper.local_table.name})
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_written_tables(session):
+    # commit() flushes pending changes only after this hook; flush them first to note their tables
+    session.flush()
+    tables = session.info.pop("written_tables", None)
+    if tables:
+        bump_tables(session, tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session):
+    session.info.pop("written_tables", None)
@@ -0,0 +1,69 @@
+from typing import FrozenSet, Iterable, List, Optional
+
+from fastapi import HTTPException, Query, status
+
+
+class Fieldset:
+    """The fields and expansions a list request asked for with ?fields= and ?include=.
+
+    fields is None when the client did not ask for a sparse fieldset, i.e. every field.
+    """
+
+    def __init__(self, fields: Optional[FrozenSet[str]], include: FrozenSet[str]):
+        self.fields = fields
+        self.include = include
+
+    def wants(self, name: str) -> bool:
+        return self.fields is None or name in self.fields
+
+    def includes(self, name: str) -> bool:
+        return name in self.include
+
+    def columns(self, columns: Iterable) -> List:
+        """The requested ones of the given model attributes, for select(*fieldset.columns(...))"""
+        return [column for column in columns if self.wants(column.key)]
+
+    def project(self, item: dict) -> dict:
+        """Drop the keys of a response object that were not requested"""
+        if self.fields is None:
+            return item
+        return {key: value for key, value in item.items() if key in self.fields or key in self.include}
+
+
+def _parse(value: str, allowed: FrozenSet[str], param: str) -> FrozenSet[str]:
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+    unknown = names - allowed
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}. Allowed: {', '.join(sorted(allowed))}"
+        )
+    return names
+
+
+def fieldset(names: Iterable[str], expansions: Iterable[str] = (), default_include: Iterable[str] = ()):
+    """Dependency parsing ?fields=a,b and ?include=x,y for a list endpoint.
+
+    `names` are the plain fields the endpoint returns, `expansions` the related objects it
+    can embed. Without either parameter every field and the default expansions are returned
+    (the endpoint's usual response). A fields= list always keeps "id" and, unless include=
+    is also given, embeds nothing.
+    """
+    allowed_fields = frozenset(names) - frozenset(expansions)
+    allowed_includes = frozenset(expansions)
+    default_include = frozenset(default_include)
+
+    def dependency(
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return (id is always returned)"),
+        include: Optional[str] = Query(None, description="Comma-separated related objects to embed"),
+    ) -> Fieldset:
+        selected = None if fields is None else _parse(fields, allowed_fields, "fields") | {"id"}
+        if include is not None:
+            expand = _parse(include, allowed_includes, "include")
+        elif selected is None:
+            expand = default_include
+        else:
+            expand = frozenset()
+        return Fieldset(selected, expand)
+
+    return dependency
@@ -0,0 +1,241 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import functools
+import inspect
+import logging
+import time
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import metrics
+from .access_log import route_template
+from .config import settings
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Longest statement text kept per query in the debug ring buffer
+MAX_STATEMENT_LENGTH = 300
+
+
+class QueryStats:
+    """SQL statement count, DB time and phase timings for one request (or one count_queries block)"""
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.statements = []
+        self.phases = {}  # "auth" / "handler" / "serialize" -> seconds
+        self.role = None  # Set by get_current_principal; decides who sees Server-Timing
+        self.method = None
+        self.route = None  # Route template, once routing has matched
+        self.endpoint_finished = None
+        self.profiler = None  # SamplingProfiler when an admin asked for this request to be profiled
+
+    def add_phase(self, name: str, duration: float):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.db_time += duration
+        if len(self.statements) < settings.DB_QUERY_LOG_STATEMENTS:
+            self.statements.append({
+                "sql": statement[:MAX_STATEMENT_LENGTH],
+                "ms": round(duration * 1000, 3),
+            })
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Most recent requests, newest last, served by /_debug/queries
+recent_requests = deque(maxlen=settings.DB_QUERY_LOG_SIZE)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """Stats for the request being handled, if any"""
+    return _current_stats.get()
+
+
+def record_phase(name: str, duration: float):
+    """Add time to a Server-Timing phase of the current request"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add_phase(name, duration)
+
+
+def _timed_endpoint(endpoint):
+    """Wrap a path operation so its body is timed as the "handler" phase"""
+    # include_router re-adds each route with its (already wrapped) endpoint
+    if getattr(endpoint, "_timed", False):
+        return endpoint
+
+    span_name = f"handler {endpoint.__name__}"
+
+    def finish(started):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.endpoint_finished = time.perf_counter()
+            stats.add_phase("handler", stats.endpoint_finished - started)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with tracer.span(span_name, **{"code.namespace": endpoint.__module__}):
+                    return await endpoint(*args, **kwargs)
+            finally:
+                finish(started)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            # Sync endpoints run on a worker thread the profiler would not otherwise sample
+            stats = _current_stats.get()
+            profiler = stats.profiler if stats is not None else None
+            if profiler is not None:
+                profiler.add_thread()
+            try:
+                with tracer.span(span_name, **{"code.namespace": endpoint.__module__}):
+                    return endpoint(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.remove_thread()
+                finish(started)
+    timed._timed = True
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that times the handler body and the response serialization separately"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            stats = _current_stats.get()
+            if stats is not None:
+                stats.method = request.method
+                stats.route = self.path
+            response = await handler(request)
+            if stats is not None and stats.endpoint_finished is not None:
+                # Response model validation, jsonable_encoder and rendering the body
+                stats.add_phase("serialize", time.perf_counter() - stats.endpoint_finished)
+            return response
+
+        return timed_handler
+
+
+# SQLAlchemy events, registered on the Engine class so every engine (sync, read-only and
+# the sync side of the async engines) is counted without wiring each one up
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_failed_query_start(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+@contextmanager
+def count_queries():
+    """Count the statements run inside the block, e.g. in scripts and tests"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+http_request_phase_seconds = metrics.registry.register(metrics.Histogram(
+    "http_request_phase_seconds", "Time per request phase (auth, db, handler, serialize) by route template",
+    ("route", "phase")))
+
+
+def server_timing(stats: QueryStats, total: float) -> str:
+    """Server-Timing header value; durations in milliseconds"""
+    entries = [f"{name};dur={duration * 1000:.3f}" for name, duration in stats.phases.items()]
+    entries.append(f'db;dur={stats.db_time * 1000:.3f};desc="{stats.count} queries"')
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+class QueryStatsMiddleware:
+    """Adds X-DB-Queries / X-DB-Time (and Server-Timing for SERVER_TIMING_ROLES) headers,
+    records phase timings into the metrics and each request in the ring buffer"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_stats(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"x-db-time", f"{stats.db_time * 1000:.3f}ms".encode()))
+                if stats.role in settings.SERVER_TIMING_ROLES:
+                    timing = server_timing(stats, time.perf_counter() - started)
+                    headers.append((b"server-timing", timing.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            route = route_template(scope)
+            if route is not None:
+                for name, duration in stats.phases.items():
+                    http_request_phase_seconds.observe(duration, route, name)
+                http_request_phase_seconds.observe(stats.db_time, route, "db")
+            if not scope["path"].startswith("/_debug/"):
+                recent_requests.append({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "queries": stats.count,
+                    "db_time_ms": round(stats.db_time * 1000, 3),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "statements": stats.statements,
+                })
+
+
+def assert_query_budget(response, budget: int):
+    """Fail if the response's X-DB-Queries header is over the endpoint's query budget"""
+    header = response.headers.get("x-db-queries")
+    assert header is not None, "response has no X-DB-Queries header; is QueryStatsMiddleware installed?"
+    queries = int(header)
+    assert queries <= budget, (
+        f"{response.request.method} {response.request.url.path} ran {queries} SQL statements, "
+        f"over its budget of {budget}"
+    )
@@ -0,0 +1,132 @@
+from collections import deque
+from typing import Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+
+from . import metrics
+from .access_log import route_template
+from .config import settings
+from .profiling import frame_label
+
+logger = logging.getLogger(__name__)
+
+# Innermost frames kept per stall
+MAX_STACK_DEPTH = 40
+
+event_loop_lag_seconds = metrics.registry.register(metrics.Histogram(
+    "event_loop_lag_seconds", "Delay between when the loop heartbeat was due and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+event_loop_stalls_total = metrics.registry.register(metrics.Counter(
+    "event_loop_stalls_total", "Heartbeats delayed beyond LOOP_LAG_THRESHOLD_MS, by the route blocking the loop",
+    ("route",)))
+event_loop_blocked_seconds_total = metrics.registry.register(metrics.Counter(
+    "event_loop_blocked_seconds_total", "Loop lag beyond the threshold, by the route blocking the loop",
+    ("route",)))
+
+
+def _blocking_request(frame) -> Optional[dict]:
+    """Method, path and route of the request whose code is on the loop thread's stack"""
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            return {"method": scope.get("method"), "path": scope.get("path"), "route": route_template(scope)}
+        frame = frame.f_back
+    return None
+
+
+class LoopLagMonitor:
+    """Measures event loop scheduling delay and attributes long stalls to the route causing them.
+
+    A heartbeat task sleeps for `interval` and measures how late it wakes up. A watchdog
+    thread notices when the heartbeat is overdue and, while the loop is still blocked,
+    captures the loop thread's stack and the request found on it. Once the heartbeat runs
+    again the full lag is charged to that route.
+    """
+
+    def __init__(self, interval: float, threshold: float, size: int):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=size)
+        self._beat = 0
+        self._beat_due = None
+        self._captured = {}  # beat -> snapshot taken by the watchdog while the loop was blocked
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            self._beat += 1
+            self._beat_due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._beat_due)
+            event_loop_lag_seconds.observe(lag)
+            snapshot = self._captured.pop(self._beat, None)
+            self._captured.clear()
+            if lag >= self.threshold:
+                self._record_stall(lag, snapshot)
+
+    def _record_stall(self, lag: float, snapshot: Optional[dict]):
+        request = (snapshot or {}).get("request") or {}
+        route = request.get("route") or metrics.UNMATCHED_ROUTE
+        event_loop_stalls_total.inc(route)
+        event_loop_blocked_seconds_total.inc(route, amount=lag)
+        self.stalls.append({
+            "ts": round(time.time(), 3),
+            "lag_ms": round(lag * 1000, 3),
+            "method": request.get("method"),
+            "path": request.get("path"),
+            "route": route,
+            "stack": (snapshot or {}).get("stack", []),
+        })
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms by {request.get('method')} {route}")
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            due = self._beat_due
+            beat = self._beat
+            if due is None or beat in self._captured or time.monotonic() - due < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = []
+            request = _blocking_request(frame)
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            # Outermost first, like a traceback, so the blocking call is last
+            self._captured[beat] = {"request": request, "stack": stack[::-1]}
+
+    def start(self):
+        """Start on the running event loop (called from the app's startup event)"""
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+        self._captured.clear()
+
+    def summary(self) -> dict:
+        """Stalls and blocked time per route since startup, worst first"""
+        routes = {}
+        for labels, count in event_loop_stalls_total.snapshot()["samples"]:
+            routes[labels[0]] = {"stalls": int(count)}
+        for labels, seconds in event_loop_blocked_seconds_total.snapshot()["samples"]:
+            routes.setdefault(labels[0], {})["blocked_ms"] = round(seconds * 1000, 3)
+        return dict(sorted(routes.items(), key=lambda item: -item[1].get("blocked_ms", 0)))
+
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_MS / 1000, settings.LOOP_LAG_THRESHOLD_MS / 1000,
+                              settings.LOOP_LAG_LOG_SIZE)
@@ -1,12 +1,23 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from .routers import auth, admin, public, teacher, student
 from .config import settings
-from .database import engine, Base
+from .database import engine, Base, dispose_async_engines
+from .access_log import AccessLogMiddleware, configure_access_log
+from . import metrics
+from .instrumentation import QueryStatsMiddleware, TimedRoute, recent_requests
+from .slow_queries import configure_slow_query_log, slow_query_log
+from .loop_monitor import loop_monitor
+from .tracing import TracingMiddleware, configure_tracing, shutdown_tracing
+from .profiling import ProfilingMiddleware, folded_stacks, profile_store, render_flamegraph
+from .principal_cache import principal_cache
+from .responses import ORJSONResponse
+from .compression import CompressionMiddleware, PrecompressedStaticFiles
+from .auth import login_counts, password_pool
+from typing import Optional
 import logging
-import time
+import os
 
 # Configure logging
 logging.basicConfig(
@@ -25,48 +36,49 @@ app = FastAPI(
     description="API for School Management System",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
+app.router.route_class = TimedRoute
 
 # Create the database tables
 Base.metadata.create_all(bind=engine)
 
-# Configure CORS
+# Sampling profiler for admin requests sent with "X-Profile: 1" (inside QueryStatsMiddleware,
+# which provides the authenticated role)
+app.add_middleware(ProfilingMiddleware)
+
+# br/gzip response compression (inside the metrics and access log, so their latencies include it)
+app.add_middleware(CompressionMiddleware)
+
+# Count SQL statements and DB time per request
+app.add_middleware(QueryStatsMiddleware)
+
+# Per-route latency histograms, status counters and in-flight gauge for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Server span per sampled request when TRACE_EXPORTER is set (inside the access log, which records X-Trace-Id)
+app.add_middleware(TracingMiddleware)
+
+# Structured access log, written from a background thread (outside QueryStatsMiddleware so it sees X-DB-Queries)
+access_log_listener = configure_access_log()
+app.add_middleware(AccessLogMiddleware)
+
+# Slow statements with their EXPLAIN plans, browsable at /_debug/slow-queries
+configure_slow_query_log()
+
+# CORS, added last so it is the outermost middleware: preflights are answered here without
+# reaching the routers, and browsers cache them for CORS_MAX_AGE
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://127.0.0.1:5500", "http://localhost:5500"],
+    allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=settings.CORS_EXPOSE_HEADERS,
+    max_age=settings.CORS_MAX_AGE,
 )
 
-# Add request logging middleware
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Log request details
-        start_time = time.time()
-        path = request.url.path
-        method = request.method
-        logger.info(f"Request started: {method} {path}")
-        logger.info(f"Request headers: {dict(request.headers)}")  # Add this line to log headers
-        
-        try:
-            response = await call_next(request)
-            
-            # Log response details
-            process_time = time.time() - start_time
-            status_code = response.status_code
-            logger.info(f"Request completed: {method} {path} - Status: {status_code} - Time: {process_time:.3f}s")
-            
-            return response
-        except Exception as e:
-            # Log exceptions
-            process_time = time.time() - start_time
-            logger.error(f"Request failed: {method} {path} - Error: {str(e)} - Time: {process_time:.3f}s")
-            raise
-
-app.add_middleware(RequestLoggingMiddleware)
-
 # Include routers
 logger.info("Registering routers...")
 
@@ -87,6 +99,49 @@ app.include_router(student.router, prefix="/student", tags=["student"])
 
 logger.info("All routers registered successfully!")
 
+# Frontend assets, served from their precompressed .br/.gz variants when available
+if os.path.isdir(settings.STATIC_DIR):
+    app.mount(settings.STATIC_URL, PrecompressedStaticFiles(directory=settings.STATIC_DIR, html=True), name="ui")
+
+metrics_writer = None
+
+@app.on_event("startup")
+async def start_metrics_writer():
+    global metrics_writer
+    if settings.METRICS_MULTIPROC_DIR:
+        metrics_writer = metrics.SnapshotWriter(settings.METRICS_MULTIPROC_DIR, settings.METRICS_WRITE_INTERVAL)
+        metrics_writer.start()
+
+@app.on_event("startup")
+async def start_tracing():
+    configure_tracing()
+
+@app.on_event("shutdown")
+async def stop_tracing():
+    shutdown_tracing()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if settings.LOOP_LAG_MONITOR:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+@app.on_event("shutdown")
+async def stop_metrics_writer():
+    if metrics_writer is not None:
+        metrics_writer.stop()
+
+@app.on_event("shutdown")
+async def close_async_pools():
+    await dispose_async_engines()
+
+@app.on_event("shutdown")
+async def flush_access_log():
+    access_log_listener.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to School Management System API"}
@@ -95,6 +150,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated across workers when METRICS_MULTIPROC_DIR is set"""
+    return PlainTextResponse(metrics.render(metrics.collect()), media_type="text/plain; version=0.0.4")
+
 @app.get("/_debug/routes", include_in_schema=True)
 async def list_routes():
     """List all registered routes for debugging"""
@@ -107,10 +167,68 @@ async def list_routes():
         })
     return routes
 
+@app.get("/_debug/queries", include_in_schema=True)
+async def list_recent_queries(limit: int = 50, min_queries: int = 0,
+                              current_admin = Depends(admin.get_current_admin)):
+    """List SQL statement counts for the most recent requests, newest first"""
+    requests = [r for r in reversed(recent_requests) if r["queries"] >= min_queries]
+    return requests[:limit]
+
+@app.get("/_debug/slow-queries", include_in_schema=True)
+async def list_slow_queries(limit: int = 50, route: Optional[str] = None,
+                            current_admin = Depends(admin.get_current_admin)):
+    """Statements slower than SLOW_QUERY_MS with redacted parameters and plan, newest first"""
+    entries = [e for e in reversed(slow_query_log.entries) if route is None or e["route"] == route]
+    return entries[:limit]
+
+@app.get("/_debug/loop-lag", include_in_schema=True)
+async def loop_lag(limit: int = 20, current_admin = Depends(admin.get_current_admin)):
+    """Event loop stalls with the route and stack that blocked it, and blocked time per route"""
+    return {
+        "threshold_ms": settings.LOOP_LAG_THRESHOLD_MS,
+        "by_route": loop_monitor.summary(),
+        "stalls": list(reversed(loop_monitor.stalls))[:limit],
+    }
+
+@app.get("/_debug/principal-cache", include_in_schema=True)
+async def principal_cache_stats(current_admin = Depends(admin.get_current_admin)):
+    """Hit/miss counters for the principal cache used by get_current_user"""
+    return principal_cache.stats()
+
+@app.get("/_debug/password-pool", include_in_schema=True)
+async def password_pool_stats(current_admin = Depends(admin.get_current_admin)):
+    """Queue depth and rejections of the bcrypt thread pool"""
+    return password_pool.stats()
+
+@app.get("/_debug/logins", include_in_schema=True)
+async def login_stats(current_admin = Depends(admin.get_current_admin)):
+    """Password logins vs. refresh-token renewals, and throttled attempts, since startup"""
+    stats = {key: login_counts[key] for key in
+             ("password", "password_failed", "refresh", "refresh_rejected", "refresh_reuse_detected",
+              "throttled_email", "throttled_ip")}
+    renewals = stats["password"] + stats["refresh"]
+    stats["refresh_share"] = round(stats["refresh"] / renewals, 3) if renewals else 0.0
+    return stats
+
+@app.get("/_debug/profiles", include_in_schema=True)
+async def list_profiles(current_admin = Depends(admin.get_current_admin)):
+    """Stored request profiles, newest first"""
+    return profile_store.list()
+
+@app.get("/_debug/profiles/{profile_id}", include_in_schema=True)
+async def get_profile(profile_id: str, format: str = "svg", current_admin = Depends(admin.get_current_admin)):
+    """One profile as an SVG flamegraph, folded stacks (flamegraph.pl, speedscope) or JSON"""
+    profile = profile_store.load(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "svg":
+        return Response(render_flamegraph(profile), media_type="image/svg+xml")
+    if format == "folded":
+        return PlainTextResponse(folded_stacks(profile["stacks"]))
+    if format == "json":
+        return profile
+    raise HTTPException(status_code=400, detail="format must be svg, folded or json")
+
 @app.get("/test-cors")
 async def test_cors():
-    return {"message": "CORS is working!"}
-
-@app.options("/test-cors")
-async def test_cors_preflight():
-    return {"message": "Preflight request successful"} 
\ No newline at end of file
+    return {"message": "CORS is working!"} 
\ No newline at end of file
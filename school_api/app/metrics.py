@@ -0,0 +1,329 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from .access_log import route_template
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label used for requests that matched no route, so scanners cannot explode cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Metric:
+    """A named family of samples keyed by label values"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = [[list(labels), self._copy(value)] for labels, value in self._values.items()]
+        return {"type": self.type, "help": self.documentation, "labelnames": list(self.labelnames),
+                "samples": samples}
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Called before every snapshot, e.g. to refresh gauges that are read rather than counted"""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {collector.__name__} failed: {str(e)}")
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"))
+db_pool_size = registry.register(Gauge(
+    "db_pool_size", "Persistent connections configured for the pool", ("pool",)))
+db_pool_checked_out = registry.register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool", ("pool",)))
+db_pool_overflow = registry.register(Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", ("pool",)))
+
+
+def _collect_pool_stats():
+    from .database import async_engine, async_read_engine, engine, read_engine
+
+    pools = {"primary": engine, "read": read_engine, "async": async_engine.sync_engine,
+             "async_read": async_read_engine.sync_engine}
+    seen = set()
+    for name, db_engine in pools.items():
+        pool = db_engine.pool
+        # The read engines fall back to the primary pool when there is no separate one
+        if id(pool) in seen or not hasattr(pool, "checkedout"):
+            continue
+        seen.add(id(pool))
+        db_pool_size.set(pool.size(), name)
+        db_pool_checked_out.set(pool.checkedout(), name)
+        db_pool_overflow.set(max(0, pool.overflow()), name)
+
+
+password_hash_queued = registry.register(Gauge(
+    "password_hash_queued", "Password hash/verify operations waiting for a bcrypt thread"))
+password_hash_running = registry.register(Gauge(
+    "password_hash_running", "Password hash/verify operations running"))
+
+
+def _collect_password_pool_stats():
+    from .auth import password_pool
+
+    stats = password_pool.stats()
+    password_hash_queued.set(stats["queued"])
+    password_hash_running.set(stats["running"])
+
+
+registry.add_collector(_collect_pool_stats)
+registry.add_collector(_collect_password_pool_stats)
+
+
+class MetricsMiddleware:
+    """Records latency, status and in-flight count per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            http_requests_in_flight.dec()
+            route = route_template(scope) or UNMATCHED_ROUTE
+            method = scope["method"]
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, route)
+            http_requests_total.inc(method, route, str(status[0]))
+
+
+# Multiple workers: each process writes its snapshot to METRICS_MULTIPROC_DIR and /metrics
+# merges every file, so any worker can answer the scrape for the whole server.
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics_{pid}.json")
+
+
+def write_snapshot(directory: str):
+    """Atomically replace this process's snapshot file"""
+    path = _snapshot_path(directory, os.getpid())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots: List[Tuple[dict, bool]]) -> dict:
+    """Sum samples across processes; gauges of processes that have exited are dropped"""
+    merged = {}
+    for snapshot, alive in snapshots:
+        for name, data in snapshot.items():
+            if data["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**data, "samples": {}})
+            for labels, value in data["samples"]:
+                key = tuple(labels)
+                if data["type"] == "histogram":
+                    current = target["samples"].get(key)
+                    if current is None:
+                        target["samples"][key] = [list(value[0]), value[1], value[2]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0.0) + value
+    for data in merged.values():
+        data["samples"] = [[list(labels), value] for labels, value in data["samples"].items()]
+    return merged
+
+
+def collect(directory: Optional[str] = None) -> dict:
+    """Snapshot of this process, or of every worker when a multiprocess directory is set"""
+    directory = directory if directory is not None else settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return registry.snapshot()
+
+    write_snapshot(directory)
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith("metrics_") and filename.endswith(".json")):
+            continue
+        try:
+            pid = int(filename[len("metrics_"):-len(".json")])
+            with open(os.path.join(directory, filename)) as f:
+                snapshots.append((json.load(f), _process_alive(pid)))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Skipping metrics file {filename}: {str(e)}")
+    return merge_snapshots(snapshots)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(snapshot: dict) -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, data in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        names = data["labelnames"]
+        for labels, value in data["samples"]:
+            if data["type"] == "histogram":
+                cumulative = 0
+                bounds = [*data["buckets"], float("inf")]
+                for bound, count in zip(bounds, value[0]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(names, labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(names, labels)} {_format_value(value[1])}")
+                lines.append(f"{name}_count{_format_labels(names, labels)} {value[2]}")
+            else:
+                lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class SnapshotWriter:
+    """Background thread refreshing this worker's snapshot file between scrapes"""
+
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                write_snapshot(self.directory)
+            except OSError as e:
+                logger.error(f"Could not write metrics snapshot: {str(e)}")
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        write_snapshot(self.directory)
@@ -1,10 +1,14 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text, Date, Float
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text, Date, Float, Index, event, inspect
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Role lists, paged by id
+        Index("ix_users_role_id", "role", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
@@ -12,13 +16,14 @@ class User(Base):
     hashed_password = Column(String)
     role = Column(String)  # teacher, student
     is_active = Column(Boolean, default=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # "ver" claim in access tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Fields for students
     grade = Column(String, nullable=True)
     section = Column(String, nullable=True)
-    parent_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
     # Fields for teachers
     subject = Column(String, nullable=True)
@@ -32,6 +37,12 @@ class User(Base):
     # Parent-child relationship
     parent = relationship("User", remote_side=[id], backref="children", foreign_keys=[parent_id])
 
+@event.listens_for(User.hashed_password, "set")
+def revoke_tokens_on_password_change(target, value, oldvalue, initiator):
+    """A new password invalidates every access token issued with the old one"""
+    if inspect(target).persistent and value != oldvalue:
+        target.token_version = (target.token_version or 0) + 1
+
 class Class(Base):
     __tablename__ = "classes"
 
@@ -40,7 +51,7 @@ class Class(Base):
     grade = Column(String)
     section = Column(String)
     subject = Column(String)
-    teacher_id = Column(Integer, ForeignKey("users.id"))
+    teacher_id = Column(Integer, ForeignKey("users.id"), index=True)
     capacity = Column(Integer)
     current_students = Column(Integer, default=0)
     schedule = Column(String)
@@ -70,6 +81,11 @@ class ClassEnrollment(Base):
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        # A teacher's assignments paged by (due_date, id), a class's by id
+        Index("ix_assignments_teacher_id_due_date", "teacher_id", "due_date", "id"),
+        Index("ix_assignments_class_id_id", "class_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -90,6 +106,10 @@ class Assignment(Base):
 
 class AssignmentSubmission(Base):
     __tablename__ = "assignment_submissions"
+    __table_args__ = (
+        # One submission per student per assignment
+        Index("uq_assignment_submissions_assignment_student", "assignment_id", "student_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id"))
@@ -109,6 +129,12 @@ class AssignmentSubmission(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # One record per student per class per day; also serves (class_id, date) lookups
+        Index("uq_attendance_class_date_student", "class_id", "date", "student_id", unique=True),
+        # A student's attendance paged by (date, id)
+        Index("ix_attendance_student_id_date", "student_id", "date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"))
@@ -125,6 +151,12 @@ class Attendance(Base):
 
 class Grade(Base):
     __tablename__ = "grades"
+    __table_args__ = (
+        # One grade per student per assignment in a class (NULL assignment_id never conflicts)
+        Index("uq_grades_class_assignment_student", "class_id", "assignment_id", "student_id", unique=True),
+        # A student's grades paged by id
+        Index("ix_grades_student_id_id", "student_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"))
@@ -145,4 +177,25 @@ class Grade(Base):
     student = relationship("User", foreign_keys=[student_id])
     class_ = relationship("Class")
     assignment = relationship("Assignment", back_populates="grades")
-    submission = relationship("AssignmentSubmission", back_populates="grade", foreign_keys=[submission_id]) 
\ No newline at end of file
+    submission = relationship("AssignmentSubmission", back_populates="grade", foreign_keys=[submission_id])
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)  # HMAC-SHA256 hex digest, never the token
+    family_id = Column(String(32), nullable=False, index=True)  # Shared by every rotation of one login
+    token_version = Column(Integer, nullable=False, default=0)  # users.token_version when issued
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True), nullable=True)  # Set when rotated; reuse revokes the family
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CacheStamp(Base):
+    __tablename__ = "cache_stamps"
+
+    # Bumped whenever cached data named here changes, so every worker can drop its copy
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,163 @@
+from datetime import date, datetime
+from typing import List, Optional
+import base64
+
+import orjson
+from fastapi import HTTPException, Query, Request, status
+from sqlalchemy import and_, false, or_, tuple_
+from sqlalchemy.engine import Row
+
+from .config import settings
+from .responses import wants_ndjson
+
+
+def encode_cursor(values: list) -> str:
+    """Opaque, URL-safe cursor for the sort key values of a row"""
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+
+def _invalid_cursor(reason) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid cursor: {reason}")
+
+
+def decode_cursor(cursor: str) -> list:
+    """The sort key values in a cursor; 400 if it is not one of ours"""
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise _invalid_cursor(e)
+    if not isinstance(values, list) or not values:
+        raise _invalid_cursor("not a list of values")
+    return values
+
+
+def _typed_values(values: list, keys) -> list:
+    """Cursor values as the Python types of the key columns; 400 if they do not fit"""
+    try:
+        if len(values) != len(keys):
+            raise ValueError(f"{len(values)} values for {len(keys)} sort keys")
+        typed = []
+        for key, value in zip(keys, values):
+            python_type = key.type.python_type
+            if value is None:
+                if not key.nullable:
+                    raise ValueError(f"{key.key} cannot be null")
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif not isinstance(value, python_type) or isinstance(value, bool):
+                raise ValueError(f"{key.key} is not a {python_type.__name__}")
+            typed.append(value)
+        return typed
+    except (TypeError, ValueError) as e:
+        raise _invalid_cursor(e)
+
+
+def _past(keys, values, descending: bool):
+    """Rows after (key, ...) = (value, ...) in the order of the keys, NULLs sorting last.
+
+    Spelled out key by key because a row comparison is never true when either side holds
+    a NULL: k1 past v1, or k1 = v1 and the rest of the key past the rest of the values.
+    """
+    key, value = keys[0], values[0]
+    if value is None:
+        past, same = false(), key.is_(None)
+    else:
+        past, same = key < value if descending else key > value, key == value
+        if key.nullable:
+            past = or_(past, key.is_(None))
+    if len(keys) == 1:
+        return past
+    return or_(past, and_(same, _past(keys[1:], values[1:], descending)))
+
+
+class Page:
+    """The slice of a list a request asked for with ?limit= and ?cursor=.
+
+    Lists are ordered by a unique sort key, (id) or e.g. (date, id), and the cursor holds
+    the key of the last row of the previous page. The next page starts with an index seek
+    past that key instead of skipping OFFSET rows, so page N costs what page 1 costs, and
+    rows inserted or deleted meanwhile do not shift the pages. NULLs in a nullable key
+    column (an assignment without a due date) sort last in either direction. The link to the next page
+    is sent in a Link header; the body stays the plain JSON list.
+
+    Paging is opt-in: a request without ?limit= or ?cursor= gets the whole list as before,
+    since existing clients do not follow Link headers. A cursor without a limit pages by
+    PAGE_SIZE_DEFAULT.
+
+    NDJSON streams (Accept: application/x-ndjson) are exports: they honour an explicit
+    limit and cursor but have no default page size and no Link header.
+    """
+
+    def __init__(self, request: Request, limit: Optional[int], cursor: Optional[str]):
+        self.request = request
+        self.cursor = cursor
+        self._after = None if cursor is None else decode_cursor(cursor)
+        self.streamed = wants_ndjson(request)
+        if limit is None and cursor is not None and not self.streamed:
+            limit = settings.PAGE_SIZE_DEFAULT
+        self.limit = limit
+        self.next_cursor = None
+        self._keys = ()
+
+    def apply(self, query, *keys, descending: bool = False):
+        """Order a select()/Query by the sort key, start it after the cursor and limit it to the page"""
+        self._keys = keys
+        nullable = any(key.nullable for key in keys)
+        if self._after is not None:
+            values = _typed_values(self._after, keys)
+            if nullable:
+                query = query.filter(_past(keys, values, descending))
+            else:
+                if len(keys) == 1:
+                    column, value = keys[0], values[0]
+                else:
+                    column, value = tuple_(*keys), tuple_(*values)
+                query = query.filter(column < value if descending else column > value)
+        if nullable:
+            # Spelled out, as the default differs between SQLite and PostgreSQL
+            order = [key.desc().nulls_last() if descending else key.asc().nulls_last() for key in keys]
+        else:
+            order = [key.desc() if descending else key for key in keys]
+        query = query.order_by(*order)
+        if self.limit is not None:
+            # One row more than the page tells whether there is a next one
+            query = query.limit(self.limit if self.streamed else self.limit + 1)
+        return query
+
+    def rows(self, rows) -> List:
+        """The rows of the page, from the result of the applied query; notes the next cursor"""
+        rows = list(rows)
+        if self.limit is not None and len(rows) > self.limit:
+            rows = rows[:self.limit]
+            self.next_cursor = encode_cursor(self._key_values(rows[-1]))
+        return rows
+
+    def _key_values(self, row) -> list:
+        if isinstance(row, Row):
+            try:
+                return [row._mapping[key] for key in self._keys]
+            except KeyError:
+                # (entity, entity, ...) rows of a multi-entity query: the key is on the first one
+                row = row[0]
+        return [getattr(row, key.key) for key in self._keys]
+
+    @property
+    def headers(self) -> dict:
+        """Link: <...>; rel="next" when there is a next page"""
+        if self.next_cursor is None:
+            return {}
+        url = self.request.url.include_query_params(cursor=self.next_cursor)
+        return {"Link": f'<{url}>; rel="next"'}
+
+
+def page_params(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_SIZE_MAX,
+                                 description=f"Rows per page (default {settings.PAGE_SIZE_DEFAULT} with a cursor, "
+                                             "else the whole list)"),
+    cursor: Optional[str] = Query(None, description='Cursor from the rel="next" Link of the previous page'),
+) -> Page:
+    """Dependency parsing ?limit= and ?cursor= for a keyset-paginated list endpoint"""
+    return Page(request, limit, cursor)
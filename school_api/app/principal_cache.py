@@ -0,0 +1,191 @@
+from collections import OrderedDict
+from typing import Optional
+import logging
+import threading
+import time
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from . import models
+from .config import settings
+from .database import upsert_insert
+
+logger = logging.getLogger(__name__)
+
+# cache_stamps row bumped whenever a user row changes, so other workers drop their entries
+PRINCIPAL_STAMP = "principals"
+
+
+class PrincipalCache:
+    """Bounded TTL/LRU cache of user column values, keyed by token subject (email)"""
+
+    def __init__(self, max_size: int, ttl: float, stamp_interval: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stamp_interval = stamp_interval
+        self._entries = OrderedDict()  # email -> (expires_at, column values)
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, email: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, email: str, values: dict):
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *emails: str):
+        with self._lock:
+            for email in emails:
+                if self._entries.pop(email, None) is not None:
+                    self.invalidations += 1
+
+    def invalidate_users(self, *user_ids: int):
+        """Drop the entries of the users whatever their email (it may have changed or be unloaded)"""
+        user_ids = set(user_ids)
+        with self._lock:
+            for email in [email for email, (_, values) in self._entries.items() if values["id"] in user_ids]:
+                del self._entries[email]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def sync_version(self, db: Session):
+        """Drop everything if another worker bumped the stamp; checks at most every stamp_interval"""
+        now = time.monotonic()
+        if now - self._checked_at < self.stamp_interval:
+            return
+        version = db.scalar(
+            select(models.CacheStamp.version).filter(models.CacheStamp.name == PRINCIPAL_STAMP)
+        ) or 0
+        with self._lock:
+            if self._version is not None and version != self._version:
+                logger.info("Principal stamp changed, clearing principal cache")
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            self._version = version
+            self._checked_at = now
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stamp_version": self._version,
+            }
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    stamp_interval=settings.PRINCIPAL_CACHE_STAMP_INTERVAL,
+)
+
+
+def _column_values(user: models.User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
+
+
+def principal_values(db: Session, email: str) -> Optional[dict]:
+    """Column values of the user for a token subject, from the cache when possible"""
+    if principal_cache.enabled:
+        principal_cache.sync_version(db)
+        values = principal_cache.get(email)
+        if values is not None:
+            return values
+
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user is None:
+        return None
+    values = _column_values(user)
+    if principal_cache.enabled:
+        principal_cache.put(email, values)
+    return values
+
+
+def attach_principal(db: Session, values: dict) -> models.User:
+    """Rebuild a user row from cached values and attach it to the session without a SELECT"""
+    user = models.User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def get_principal(db: Session, email: str) -> Optional[models.User]:
+    """Load the user for a token subject, from the cache when possible"""
+    values = principal_values(db, email)
+    if values is None:
+        return None
+    return attach_principal(db, values)
+
+
+# Invalidation: any flush that updates or deletes a user (admin.update_user, delete_user,
+# update_student, update_teacher, update_parent, promotions, profile edits, ...) notes the
+# user's id; the stamp is bumped once right before the transaction commits (so the
+# cache_stamps row is locked only for the commit, not the whole transaction), and the
+# local entries are dropped once it has committed.
+@event.listens_for(Session, "after_flush")
+def _note_changed_principals(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User) and (obj in session.deleted or session.is_modified(obj)):
+            # The identity key, not the email: that may be expired or unloaded on the instance
+            identity = inspect(obj).identity
+            if identity is not None:
+                session.info.setdefault("changed_principals", set()).add(identity[0])
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_principal_stamp(session):
+    # commit() flushes pending changes only after this hook; flush them first to note them
+    session.flush()
+    if not session.info.get("changed_principals"):
+        return
+    insert = upsert_insert(session)
+    stmt = insert(models.CacheStamp).values(name=PRINCIPAL_STAMP, version=1).on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": models.CacheStamp.version + 1},
+    )
+    session.connection().execute(stmt)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session):
+    user_ids = session.info.pop("changed_principals", None)
+    if user_ids:
+        principal_cache.invalidate_users(*user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_principals(session):
+    session.info.pop("changed_principals", None)
@@ -0,0 +1,306 @@
+from collections import Counter
+from html import escape
+from typing import List, Optional
+from urllib.parse import parse_qs
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+
+from .access_log import route_template
+from .config import settings
+from .instrumentation import current_stats
+
+logger = logging.getLogger(__name__)
+
+# Profile ids are generated here (millisecond timestamp then random hex, so they sort by age);
+# anything else in a URL is rejected before touching the disk
+PROFILE_ID_LENGTH = 32
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def new_profile_id() -> str:
+    return f"{int(time.time() * 1000):013d}{uuid.uuid4().hex[:PROFILE_ID_LENGTH - 13]}"
+
+
+def frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(APP_DIR):
+        filename = os.path.relpath(filename, APP_DIR)
+    else:
+        filename = os.path.join(*filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of the registered threads from a background thread.
+
+    The event loop thread is shared by every in-flight request, so concurrent async work
+    shows up too; sync endpoints are sampled on the worker thread running them.
+    """
+
+    def __init__(self, interval: float, max_seconds: float):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def add_thread(self, ident: Optional[int] = None):
+        self._threads.add(ident or threading.get_ident())
+
+    def remove_thread(self, ident: Optional[int] = None):
+        self._threads.discard(ident or threading.get_ident())
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for ident in list(self._threads):
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                logger.warning(f"Profile stopped after {self.max_seconds}s")
+                break
+            self._sample()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class ProfileStore:
+    """Profiles saved as JSON files in one directory, oldest removed beyond the count and size limits"""
+
+    def __init__(self, directory: str, max_files: int, max_bytes: int):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def _files(self) -> List[os.DirEntry]:
+        if not os.path.isdir(self.directory):
+            return []
+        with os.scandir(self.directory) as entries:
+            files = [e for e in entries if e.name.endswith(".json") and e.is_file()]
+        return sorted(files, key=lambda e: e.name)
+
+    def save(self, profile: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(profile["id"])
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(profile, f, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+        self.prune()
+
+    def prune(self):
+        files = self._files()
+        total = sum(e.stat().st_size for e in files)
+        while files and (len(files) > self.max_files or total > self.max_bytes):
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            try:
+                os.remove(oldest.path)
+            except FileNotFoundError:
+                pass
+
+    def list(self) -> List[dict]:
+        """Profile metadata, newest first"""
+        profiles = []
+        for entry in reversed(self._files()):
+            try:
+                with open(entry.path) as f:
+                    profile = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping profile {entry.name}: {str(e)}")
+                continue
+            profile.pop("stacks", None)
+            profiles.append(profile)
+        return profiles
+
+    def load(self, profile_id: str) -> Optional[dict]:
+        if len(profile_id) != PROFILE_ID_LENGTH or not profile_id.isalnum():
+            return None
+        try:
+            with open(self._path(profile_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES,
+                             settings.PROFILE_MAX_MB * 1024 * 1024)
+
+
+def folded_stacks(stacks: dict) -> str:
+    """Folded stacks ("root;child;leaf count"), as read by flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in Counter(stacks).most_common())
+
+
+def render_flamegraph(profile: dict, width: int = 1200, row_height: int = 16) -> str:
+    """Self-contained SVG flamegraph (root at the bottom); hover a frame for its sample count"""
+    root = {"count": 0, "children": {}}
+    depth = 0
+    for stack, count in profile["stacks"].items():
+        node = root
+        node["count"] += count
+        frames = stack.split(";")
+        depth = max(depth, len(frames))
+        for frame in frames:
+            node = node["children"].setdefault(frame, {"count": 0, "children": {}})
+            node["count"] += count
+
+    total = root["count"] or 1
+    height = (depth + 2) * row_height
+    title = f"{profile['method']} {profile['path']} - {profile['duration_ms']} ms, {total} samples"
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="12">{escape(title)}</text>',
+    ]
+
+    def draw(node, name, x, level):
+        node_width = node["count"] / total * width
+        if node_width < 0.5:
+            return
+        y = height - (level + 1) * row_height
+        hue = zlib.crc32(name.encode()) % 60
+        share = node["count"] / total * 100
+        parts.append(
+            f'<g><title>{escape(name)} ({node["count"]} samples, {share:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{node_width:.1f}" height="{row_height - 1}" '
+            f'fill="hsl({hue},90%,60%)"/>'
+        )
+        if node_width > 40:
+            label = name if len(name) * 7 < node_width else name[:int(node_width / 7) - 2] + ".."
+            parts.append(f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{escape(label)}</text>')
+        parts.append("</g>")
+        for child_name, child in sorted(node["children"].items()):
+            draw(child, child_name, x, level + 1)
+            x += child["count"] / total * width
+
+    x = 0.0
+    for name, child in sorted(root["children"].items()):
+        draw(child, name, x, 0)
+        x += child["count"] / total * width
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def _profile_requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.decode("latin-1").lower() in ("1", "true")
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[0].lower() in ("1", "true")
+
+
+def _token_claims_admin(scope) -> bool:
+    """Cheap pre-check from the token's role claim, so other callers never start a sampler.
+
+    The authenticated role is checked again before a profile is kept.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return False
+            try:
+                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            except JWTError:
+                return False
+            return payload.get("role") == "admin"
+    return False
+
+
+class ProfilingMiddleware:
+    """Profiles single admin requests sent with "X-Profile: 1" (or ?profile=1).
+
+    The profile id is returned in X-Profile-Id; the stored profiles are listed at /_debug/profiles.
+    One request is profiled at a time per worker; others run unprofiled meanwhile.
+    """
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or self._busy
+            or not _profile_requested(scope)
+            or not _token_claims_admin(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_stats()
+        profiler = SamplingProfiler(settings.PROFILE_INTERVAL_MS / 1000, settings.PROFILE_MAX_SECONDS)
+        profiler.add_thread()  # the event loop
+        if stats is not None:
+            stats.profiler = profiler
+        profile_id = new_profile_id()
+        status = 500
+
+        def authorized() -> bool:
+            return stats is not None and stats.role == "admin"
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if authorized():
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                    message["headers"] = headers
+            await send(message)
+
+        self._busy = True
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            self._busy = False
+            if authorized():
+                profile = {
+                    "id": profile_id,
+                    "created": round(time.time(), 3),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_template(scope),
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "interval_ms": settings.PROFILE_INTERVAL_MS,
+                    "samples": profiler.samples,
+                    "stacks": dict(profiler.stacks),
+                }
+                try:
+                    await run_in_threadpool(self.store.save, profile)
+                except OSError as e:
+                    logger.error(f"Could not save profile {profile_id}: {str(e)}")
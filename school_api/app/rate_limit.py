@@ -0,0 +1,115 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+import importlib
+import logging
+import math
+import threading
+import time
+
+from fastapi import HTTPException, status
+
+from .auth import login_counts
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend(ABC):
+    """Storage for sliding-window counters.
+
+    The in-process backend is per worker; with several uvicorn workers, point
+    LOGIN_RATE_LIMIT_BACKEND at a shared implementation (e.g. one backed by Redis)
+    so every worker sees the same counts.
+    """
+
+    @abstractmethod
+    def hit(self, key: str, limit: int, window: float) -> Tuple[bool, int]:
+        """Record an attempt; returns (allowed, retry_after_seconds). Refused attempts are not counted."""
+
+    @abstractmethod
+    def reset(self, key: str):
+        """Forget the attempts recorded for key"""
+
+
+class InMemorySlidingWindow(RateLimitBackend):
+    """Sliding-window counter: the current fixed window plus a weighted share of the previous one.
+
+    Each key costs one small list, and the least recently used keys are dropped
+    past max_keys, so a flood of random emails cannot grow memory without bound.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._entries = OrderedDict()  # key -> [window_start, current_count, previous_count]
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window: float) -> Tuple[bool, int]:
+        now = time.time()
+        window_start = now - (now % window)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < window_start - window:
+                entry = [window_start, 0, 0]
+            elif entry[0] < window_start:
+                entry = [window_start, 0, entry[1]]
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+            elapsed = (now - window_start) / window
+            estimated = entry[2] * (1 - elapsed) + entry[1]
+            if estimated >= limit:
+                if entry[1] >= limit or entry[2] == 0:
+                    retry_after = window_start + window - now
+                else:
+                    # Wait until enough of the previous window has slid out
+                    retry_after = (estimated - limit + 1) / entry[2] * window
+                return False, max(1, math.ceil(retry_after))
+            entry[1] += 1
+            return True, 0
+
+    def reset(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def load_backend(path: Optional[str]) -> RateLimitBackend:
+    """Instantiate "package.module:ClassName", or the in-process backend when path is empty"""
+    if not path:
+        return InMemorySlidingWindow()
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class LoginRateLimiter:
+    """Per-email and per-client-IP limits checked before any password work"""
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    def check(self, email: str, client_ip: Optional[str]):
+        rules = [
+            ("ip", f"login:ip:{client_ip}", settings.LOGIN_RATE_LIMIT_PER_IP),
+            ("email", f"login:email:{email.strip().lower()}", settings.LOGIN_RATE_LIMIT_PER_EMAIL),
+        ]
+        for kind, key, limit in rules:
+            if kind == "ip" and not client_ip:
+                continue
+            allowed, retry_after = self.backend.hit(key, limit, settings.LOGIN_RATE_LIMIT_WINDOW)
+            if not allowed:
+                login_counts[f"throttled_{kind}"] += 1
+                logger.warning(f"Login throttled by {kind} limit: {key}")
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts, please try again later",
+                    headers={"Retry-After": str(retry_after)},
+                )
+
+    def reset_email(self, email: str):
+        """Clear the per-email count after a successful login"""
+        self.backend.reset(f"login:email:{email.strip().lower()}")
+
+
+login_limiter = LoginRateLimiter(load_backend(settings.LOGIN_RATE_LIMIT_BACKEND))
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import hashlib
+import hmac
+import logging
+import secrets
+
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from . import models
+from .auth import login_counts
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes, PostgreSQL aware ones
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def hash_refresh_token(token: str) -> str:
+    """HMAC-SHA256 digest stored in place of the token; a DB leak yields no usable tokens"""
+    return hmac.new(settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_refresh_token(db: Session, user: models.User, family_id: Optional[str] = None) -> str:
+    """Add a refresh token for the user (the caller commits) and return its plaintext"""
+    token = secrets.token_urlsafe(32)
+    db.add(models.RefreshToken(
+        user_id=user.id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        token_version=user.token_version,
+        expires_at=_utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+def revoke_family(db: Session, family_id: str):
+    """Revoke every token from one login (the caller commits)"""
+    db.execute(
+        update(models.RefreshToken)
+        .filter(models.RefreshToken.family_id == family_id, models.RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=_utcnow())
+    )
+
+
+def _reject(detail: str) -> HTTPException:
+    login_counts["refresh_rejected"] += 1
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[models.User, str]:
+    """Spend a refresh token and return its user with the next token of the same family"""
+    row = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == hash_refresh_token(token)
+    ).first()
+    if row is None:
+        raise _reject("Invalid refresh token")
+    if row.revoked_at is not None:
+        raise _reject("Refresh token has been revoked")
+
+    # Mark it used only if nobody else did first; a second use means the token leaked
+    now = _utcnow()
+    claimed = db.execute(
+        update(models.RefreshToken)
+        .filter(models.RefreshToken.id == row.id, models.RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+    ).rowcount
+    if not claimed:
+        logger.warning(f"Refresh token reuse detected for user {row.user_id}, revoking family {row.family_id}")
+        login_counts["refresh_reuse_detected"] += 1
+        revoke_family(db, row.family_id)
+        db.commit()
+        raise _reject("Refresh token has already been used")
+
+    user = db.get(models.User, row.user_id)
+    if (
+        _as_naive_utc(row.expires_at) <= now
+        or user is None
+        or user.is_active is False
+        or user.token_version != row.token_version
+    ):
+        revoke_family(db, row.family_id)
+        db.commit()
+        raise _reject("Refresh token is no longer valid")
+
+    new_token = issue_refresh_token(db, user, family_id=row.family_id)
+    db.commit()
+    login_counts["refresh"] += 1
+    return user, new_token
+
+
+def revoke_refresh_token(db: Session, token: str) -> bool:
+    """Log out: revoke the family the token belongs to"""
+    row = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == hash_refresh_token(token)
+    ).first()
+    if row is None:
+        return False
+    revoke_family(db, row.family_id)
+    db.commit()
+    return True
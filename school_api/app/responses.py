@@ -0,0 +1,101 @@
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Optional, Type
+
+import orjson
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from .config import settings
+from .database import AsyncReadSessionLocal, ReadSessionLocal
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON rendered by orjson; datetimes, dates, UUIDs and enums are encoded natively.
+
+    Anything orjson does not know (Decimal, pydantic models, sets) goes through jsonable_encoder.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+def schema_columns(model, schema: Type[BaseModel]) -> List:
+    """The model's columns that the response schema exposes, for select(*schema_columns(...))"""
+    columns = model.__table__.columns
+    return [getattr(model, name) for name in schema.model_fields if name in columns]
+
+
+@lru_cache(maxsize=256)
+def missing_defaults(schema: Type[BaseModel], keys: tuple, fields: Optional[frozenset] = None) -> dict:
+    """Defaults of the schema's fields (of the requested ones) not among keys"""
+    return {name: field.get_default(call_default_factory=True)
+            for name, field in schema.model_fields.items()
+            if name not in keys and (fields is None or name in fields)}
+
+
+def rows_response(rows: Iterable, schema: Optional[Type[BaseModel]] = None, status_code: int = 200,
+                  fields: Optional[frozenset] = None, headers: Optional[dict] = None) -> ORJSONResponse:
+    """Encode result rows as JSON objects keyed by column label, without building ORM objects.
+
+    Meant for rows selected with schema_columns (or labelled after the schema's fields): the
+    values are not validated again. Schema fields the rows do not have (e.g. relationships)
+    get their default; with a sparse fieldset only the requested ones do.
+    """
+    content = [dict(row._mapping) for row in rows]
+    if schema is not None and content:
+        defaults = missing_defaults(schema, tuple(content[0]), fields)
+        if defaults:
+            for item in content:
+                item.update(defaults)
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def wants_ndjson(request: Request) -> bool:
+    """The client asked for newline-delimited JSON (Accept: application/x-ndjson)"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _ndjson_chunk(rows, schema, fields, item: Optional[Callable]) -> bytes:
+    content = [dict(row._mapping) if item is None else item(row) for row in rows]
+    if schema is not None and content:
+        defaults = missing_defaults(schema, tuple(content[0]), fields)
+        if defaults:
+            for entry in content:
+                entry.update(defaults)
+    return b"".join(orjson.dumps(entry, default=jsonable_encoder, option=orjson.OPT_APPEND_NEWLINE)
+                    for entry in content)
+
+
+def stream_rows(statement, schema: Optional[Type[BaseModel]] = None, fields: Optional[frozenset] = None,
+                item: Optional[Callable] = None) -> Iterator[bytes]:
+    """NDJSON chunks of a SELECT, STREAM_YIELD_PER rows at a time, from a server-side cursor.
+
+    Runs on its own read-only session: the request's session is closed once the handler
+    returns, before the body is sent. `item` turns a row into the JSON object when a plain
+    dict of its columns is not enough; otherwise rows are encoded like rows_response.
+    """
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=settings.STREAM_YIELD_PER))
+        for rows in result.partitions():
+            yield _ndjson_chunk(rows, schema, fields, item)
+    finally:
+        db.close()
+
+
+async def astream_rows(statement, schema: Optional[Type[BaseModel]] = None, fields: Optional[frozenset] = None,
+                       item: Optional[Callable] = None) -> AsyncIterator[bytes]:
+    """stream_rows for handlers on an AsyncSession"""
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(statement.execution_options(yield_per=settings.STREAM_YIELD_PER))
+        async for rows in result.partitions():
+            yield _ndjson_chunk(rows, schema, fields, item)
+
+
+def ndjson_response(chunks, headers: Optional[dict] = None) -> StreamingResponse:
+    """Stream stream_rows/astream_rows output as application/x-ndjson, one JSON object per line"""
+    return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE, headers=headers)
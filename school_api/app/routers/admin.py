@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from .. import models, schemas
-from ..database import get_db
-from .auth import get_current_user, get_password_hash
+from ..database import get_db, get_async_db
+from ..etag import conditional_get
+from ..fieldsets import Fieldset, fieldset
+from ..instrumentation import TimedRoute
+from ..pagination import Page, page_params
+from ..responses import (ORJSONResponse, astream_rows, missing_defaults, ndjson_response, rows_response,
+                         schema_columns, stream_rows, wants_ndjson)
+from .auth import get_current_user
+from ..auth import hash_password_async
 from pydantic import BaseModel
 
 # Add new response model for user credentials
@@ -23,6 +32,7 @@ class UserCredentialsResponse(BaseModel):
         from_attributes = True
 
 router = APIRouter(
+    route_class=TimedRoute,
     tags=["Admin"],
     dependencies=[Depends(get_current_user)]
 )
@@ -43,10 +53,18 @@ async def get_current_admin(
         )
     return current_user
 
+# ?fields= / ?include= for the user and class lists
+user_fieldset = fieldset(schemas.User.model_fields)
+class_fieldset = fieldset(schemas.Class.model_fields, expansions=("teacher", "enrolled_students"),
+                          default_include=("teacher", "enrolled_students"))
+
 # User Management Endpoints
+
 @router.get("/users/credentials", response_model=List[UserCredentialsResponse])
 async def get_users_credentials(
+    response: Response,
     current_admin: models.User = Depends(get_current_admin),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all users with their test credentials. Admin access only."""
@@ -57,8 +75,9 @@ async def get_users_credentials(
             detail="Only admin users can access this endpoint"
         )
     
-    # Get all users
-    users = db.query(models.User).all()
+    # Get a page of users
+    users = page.rows(page.apply(db.query(models.User), models.User.id))
+    response.headers.update(page.headers)
     
     # Map test passwords based on role
     test_passwords = {
@@ -89,13 +108,22 @@ async def get_users_credentials(
 
 @router.get("/users", response_model=List[schemas.User])
 async def get_users(
+    request: Request,
     current_admin: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    fieldset: Fieldset = Depends(user_fieldset),
+    page: Page = Depends(page_params),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all users"""
+    """Get all users; one JSON object per line with Accept: application/x-ndjson"""
     try:
-        users = db.query(models.User).all()
-        return users
+        # Columns straight to JSON; no ORM objects or response model validation per user
+        query = page.apply(select(*fieldset.columns(schema_columns(models.User, schemas.User))), models.User.id)
+        if wants_ndjson(request):
+            return ndjson_response(astream_rows(query, schemas.User, fields=fieldset.fields))
+        users = page.rows(await db.execute(query))
+        return rows_response(users, schemas.User, fields=fieldset.fields, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -145,7 +173,7 @@ async def update_user(
         # Update user fields
         for field, value in user_update.dict(exclude_unset=True).items():
             if field == "password":
-                setattr(db_user, "hashed_password", get_password_hash(value))
+                setattr(db_user, "hashed_password", await hash_password_async(value))
             else:
                 setattr(db_user, field, value)
         
@@ -202,67 +230,88 @@ async def delete_user(
         )
 
 # Class Management Endpoints
+
+def _active_student_count():
+    """Correlated count of a class's active enrollments, as the current_students column"""
+    return select(func.count(models.ClassEnrollment.id)).join(
+        models.User, models.User.id == models.ClassEnrollment.student_id
+    ).filter(
+        models.ClassEnrollment.class_id == models.Class.id,
+        models.ClassEnrollment.status == "active"
+    ).scalar_subquery().label("current_students")
+
+def _enrolled_students(db: Session, class_ids) -> dict:
+    """class id -> EnrolledStudent dicts of its active students in enrollment order, in one query"""
+    students_by_class = {}
+    rows = db.execute(
+        select(
+            models.ClassEnrollment.class_id,
+            *schema_columns(models.User, schemas.EnrolledStudent)
+        ).join(
+            models.User, models.User.id == models.ClassEnrollment.student_id
+        ).filter(
+            models.ClassEnrollment.class_id.in_(class_ids),
+            models.ClassEnrollment.status == "active"
+        ).order_by(models.ClassEnrollment.id)
+    )
+    for row in rows:
+        student = dict(row._mapping)
+        students_by_class.setdefault(student.pop("class_id"), []).append(student)
+    return students_by_class
+
+def _teachers(db: Session, teacher_ids) -> dict:
+    """teacher id -> TeacherInfo dict, in one query"""
+    teacher_ids = {teacher_id for teacher_id in teacher_ids if teacher_id is not None}
+    if not teacher_ids:
+        return {}
+    return {row.id: dict(row._mapping) for row in db.execute(
+        select(*schema_columns(models.User, schemas.TeacherInfo)).filter(models.User.id.in_(teacher_ids))
+    )}
+
 @router.get("/classes", response_model=List[schemas.Class])
 async def get_classes(
     current_admin: models.User = Depends(get_current_admin),
+    fieldset: Fieldset = Depends(class_fieldset),
+    include_students: bool = Query(True, description="Embed each class's active students; false returns counts only"),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all classes"""
     try:
-        # Query classes with teacher information
-        classes = db.query(models.Class).options(
-            joinedload(models.Class.teacher),
-            joinedload(models.Class.enrolled_students)
-        ).all()
-        
-        # Process the classes to include only active enrollments in the count
+        if not include_students:
+            fieldset = Fieldset(fieldset.fields, fieldset.include - {"enrolled_students"})
+        # Only the requested columns; current_students counts active enrollments rather than
+        # trusting the stored counter, and each expansion is one extra query for the page
+        columns = [c for c in schema_columns(models.Class, schemas.Class) if c.key != "current_students"]
+        columns = fieldset.columns(columns)
+        if fieldset.includes("teacher") and not fieldset.wants("teacher_id"):
+            columns.append(models.Class.teacher_id)
+        if fieldset.wants("current_students") and not fieldset.includes("enrolled_students"):
+            columns.append(_active_student_count())
+
+        rows = page.rows(db.execute(page.apply(select(*columns), models.Class.id)))
+        classes = [dict(row._mapping) for row in rows]
+
+        students_by_class = None
+        if fieldset.includes("enrolled_students"):
+            students_by_class = _enrolled_students(db, [class_["id"] for class_ in classes])
+        teachers = {}
+        if fieldset.includes("teacher"):
+            teachers = _teachers(db, {class_["teacher_id"] for class_ in classes})
+
         class_data = []
         for class_ in classes:
-            active_enrollments = []
-            for enrollment in class_.enrolled_students:
-                if enrollment.status == "active":
-                    student = db.query(models.User).filter(models.User.id == enrollment.student_id).first()
-                    if student:
-                        active_enrollments.append({
-                            "id": student.id,
-                            "email": student.email,
-                            "full_name": student.full_name,
-                            "role": student.role,
-                            "grade": student.grade,
-                            "section": student.section
-                        })
-
-            teacher_data = None
-            if class_.teacher:
-                teacher_data = {
-                    "id": class_.teacher.id,
-                    "email": class_.teacher.email,
-                    "full_name": class_.teacher.full_name,
-                    "subject": class_.teacher.subject,
-                    "role": class_.teacher.role,
-                    "created_at": class_.teacher.created_at
-                }
-
-            class_dict = {
-                "id": class_.id,
-                "name": class_.name,
-                "grade": class_.grade,
-                "section": class_.section,
-                "subject": class_.subject,
-                "teacher_id": class_.teacher_id,
-                "teacher": teacher_data,
-                "capacity": class_.capacity,
-                "current_students": len(active_enrollments),
-                "schedule": class_.schedule,
-                "room": class_.room,
-                "status": class_.status,
-                "created_at": class_.created_at,
-                "updated_at": class_.updated_at,
-                "enrolled_students": active_enrollments
-            }
-            class_data.append(class_dict)
-        
-        return class_data
+            if students_by_class is not None:
+                students = students_by_class.get(class_["id"], [])
+                class_["enrolled_students"] = students
+                class_["current_students"] = len(students)
+            if fieldset.includes("teacher"):
+                class_["teacher"] = teachers.get(class_["teacher_id"])
+            class_data.append(fieldset.project(class_))
+
+        return ORJSONResponse(class_data, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         print(f"Error in get_classes: {str(e)}")  # Add logging
         raise HTTPException(
@@ -274,69 +323,31 @@ async def get_classes(
 async def get_class(
     class_id: int,
     current_admin: models.User = Depends(get_current_admin),
+    include_students: bool = Query(True, description="Embed the active students; false returns the count only"),
     db: Session = Depends(get_db)
 ):
     """Get a specific class by ID"""
     try:
-        # Query class with teacher and enrollment information using joinedload
-        class_ = db.query(models.Class).options(
-            joinedload(models.Class.teacher),
-            joinedload(models.Class.enrolled_students)
-        ).filter(models.Class.id == class_id).first()
+        # The class, its active students and its teacher: three queries however large the class
+        columns = [c for c in schema_columns(models.Class, schemas.Class) if c.key != "current_students"]
+        if not include_students:
+            columns.append(_active_student_count())
+        row = db.execute(select(*columns).filter(models.Class.id == class_id)).first()
         
-        if not class_:
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Class not found"
             )
         
-        # Process enrolled students
-        active_enrollments = []
-        for enrollment in class_.enrolled_students:
-            if enrollment.status == "active":
-                student = db.query(models.User).filter(models.User.id == enrollment.student_id).first()
-                if student:
-                    active_enrollments.append({
-                        "id": student.id,
-                        "email": student.email,
-                        "full_name": student.full_name,
-                        "role": student.role,
-                        "grade": student.grade,
-                        "section": student.section
-                    })
-
-        # Format teacher data
-        teacher_data = None
-        if class_.teacher:
-            teacher_data = {
-                "id": class_.teacher.id,
-                "email": class_.teacher.email,
-                "full_name": class_.teacher.full_name,
-                "subject": class_.teacher.subject,
-                "role": class_.teacher.role,
-                "created_at": class_.teacher.created_at
-            }
-
-        # Create response
-        response = {
-            "id": class_.id,
-            "name": class_.name,
-            "grade": class_.grade,
-            "section": class_.section,
-            "subject": class_.subject,
-            "teacher_id": class_.teacher_id,
-            "teacher": teacher_data,
-            "capacity": class_.capacity,
-            "current_students": len(active_enrollments),
-            "schedule": class_.schedule,
-            "room": class_.room,
-            "status": class_.status,
-            "created_at": class_.created_at,
-            "updated_at": class_.updated_at,
-            "enrolled_students": active_enrollments
-        }
-
-        return response
+        class_ = dict(row._mapping)
+        if include_students:
+            active_students = _enrolled_students(db, [class_id]).get(class_id, [])
+            class_["enrolled_students"] = active_students
+            class_["current_students"] = len(active_students)
+        class_["teacher"] = _teachers(db, [class_["teacher_id"]]).get(class_["teacher_id"])
+
+        return class_
     
     except HTTPException as he:
         raise he
@@ -509,6 +520,7 @@ class DashboardStats(BaseModel):
 @router.get("/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
     current_admin: models.User = Depends(get_current_admin),
+    cache_headers: dict = Depends(conditional_get(models.User, models.Class, user=get_current_admin)),
     db: Session = Depends(get_db)
 ):
     """Get dashboard statistics"""
@@ -529,12 +541,19 @@ async def get_dashboard_stats(
 @router.get("/students", response_model=List[schemas.User])
 async def get_students(
     current_admin: models.User = Depends(get_current_admin),
+    fieldset: Fieldset = Depends(user_fieldset),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all students"""
     try:
-        students = db.query(models.User).filter(models.User.role == "student").all()
-        return students
+        query = select(*fieldset.columns(schema_columns(models.User, schemas.User))).filter(
+            models.User.role == "student"
+        )
+        students = page.rows(db.execute(page.apply(query, models.User.id)))
+        return rows_response(students, schemas.User, fields=fieldset.fields, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -586,7 +605,7 @@ async def create_student(
             )
         
         # Hash the password
-        hashed_password = get_password_hash(student.password)
+        hashed_password = await hash_password_async(student.password)
         
         # Create new student with all fields
         db_student = models.User(
@@ -637,7 +656,7 @@ async def update_student(
         # Update student fields
         for field, value in student_update.dict(exclude_unset=True).items():
             if field == "password":
-                setattr(student, "hashed_password", get_password_hash(value))
+                setattr(student, "hashed_password", await hash_password_async(value))
             else:
                 setattr(student, field, value)
         
@@ -690,12 +709,19 @@ async def delete_student(
 @router.get("/teachers", response_model=List[schemas.User])
 async def get_teachers(
     current_admin: models.User = Depends(get_current_admin),
+    fieldset: Fieldset = Depends(user_fieldset),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all teachers"""
     try:
-        teachers = db.query(models.User).filter(models.User.role == "teacher").all()
-        return teachers
+        query = select(*fieldset.columns(schema_columns(models.User, schemas.User))).filter(
+            models.User.role == "teacher"
+        )
+        teachers = page.rows(db.execute(page.apply(query, models.User.id)))
+        return rows_response(teachers, schemas.User, fields=fieldset.fields, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -721,7 +747,7 @@ async def create_teacher(
             )
         
         # Hash the password
-        hashed_password = get_password_hash(teacher.password)
+        hashed_password = await hash_password_async(teacher.password)
         
         # Create new teacher with all fields
         db_teacher = models.User(
@@ -798,7 +824,7 @@ async def update_teacher(
         # Update teacher fields
         for field, value in teacher_update.dict(exclude_unset=True).items():
             if field == "password":
-                setattr(teacher, "hashed_password", get_password_hash(value))
+                setattr(teacher, "hashed_password", await hash_password_async(value))
             else:
                 setattr(teacher, field, value)
         
@@ -859,12 +885,19 @@ async def delete_teacher(
 @router.get("/parents", response_model=List[schemas.User])
 async def get_parents(
     current_admin: models.User = Depends(get_current_admin),
+    fieldset: Fieldset = Depends(user_fieldset),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all parents"""
     try:
-        parents = db.query(models.User).filter(models.User.role == "parent").all()
-        return parents
+        query = select(*fieldset.columns(schema_columns(models.User, schemas.User))).filter(
+            models.User.role == "parent"
+        )
+        parents = page.rows(db.execute(page.apply(query, models.User.id)))
+        return rows_response(parents, schemas.User, fields=fieldset.fields, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -917,7 +950,7 @@ async def create_parent(
             )
         
         # Create new parent user
-        hashed_password = get_password_hash(parent.password)
+        hashed_password = await hash_password_async(parent.password)
         db_parent = models.User(
             email=parent.email,
             hashed_password=hashed_password,
@@ -961,7 +994,7 @@ async def update_parent(
         # Update fields
         for field, value in parent_update.dict(exclude_unset=True).items():
             if field == "password":
-                setattr(db_parent, "hashed_password", get_password_hash(value))
+                setattr(db_parent, "hashed_password", await hash_password_async(value))
             else:
                 setattr(db_parent, field, value)
         
@@ -1383,20 +1416,46 @@ async def remove_student_from_class(
             detail=str(e)
         )
 
+def _enrollment_item(row) -> dict:
+    """A class_enrollments ⋈ users row as a ClassEnrollment response object"""
+    item = {}
+    student = {}
+    for key, value in row._mapping.items():
+        if key.startswith("student."):
+            student[key[len("student."):]] = value
+        else:
+            item[key] = value
+    if student["id"] is None:
+        item["student"] = None
+    else:
+        item["student"] = {**student, **missing_defaults(schemas.User, tuple(student))}
+    item["class_"] = None
+    return item
+
 @router.get("/classes/{class_id}/enrollments", response_model=List[schemas.ClassEnrollment])
 async def get_class_enrollments(
     class_id: int,
+    request: Request,
     current_admin: models.User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Get all enrollments for a class"""
+    """Get all enrollments for a class; one JSON object per line with Accept: application/x-ndjson"""
     try:
-        enrollments = db.query(models.ClassEnrollment).filter(
-            models.ClassEnrollment.class_id == class_id
-        ).all()
-        return enrollments
+        # One join instead of loading each enrollment's student and class
+        query = (
+            select(
+                *schema_columns(models.ClassEnrollment, schemas.ClassEnrollment),
+                *(column.label(f"student.{column.key}") for column in schema_columns(models.User, schemas.User))
+            )
+            .outerjoin(models.User, models.User.id == models.ClassEnrollment.student_id)
+            .filter(models.ClassEnrollment.class_id == class_id)
+            .order_by(models.ClassEnrollment.id)
+        )
+        if wants_ndjson(request):
+            return ndjson_response(stream_rows(query, item=_enrollment_item))
+        return ORJSONResponse([_enrollment_item(row) for row in db.execute(query)])
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        ) 
\ No newline at end of file
+        )
\ No newline at end of file
@@ -2,13 +2,16 @@ from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from .. import models, schemas
 from ..database import get_db
+from ..instrumentation import TimedRoute
+from ..responses import ORJSONResponse
+from ..dependencies import get_current_user
+from ..auth import get_password_hash, verify_password, hash_password_async, verify_password_async, login_counts
+from ..rate_limit import login_limiter
+from ..refresh_tokens import issue_refresh_token, revoke_refresh_token, rotate_refresh_token
 from ..config import settings
 import logging
 
@@ -16,26 +19,18 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def get_user(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: Session, email: str, password: str):
     user = get_user(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -49,42 +44,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    logger.info("Attempting to get current user")
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        logger.info(f"Decoding token: {token[:10]}...")
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            logger.error("No email found in token")
-            raise credentials_exception
-        logger.info(f"Found email in token: {email}")
-    except JWTError as e:
-        logger.error(f"JWT Error: {str(e)}")
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
-        logger.error(f"No user found for email: {email}")
-        raise credentials_exception
-    
-    logger.info(f"Successfully found user: {user.full_name}")
-    return user
+def token_claims(user: models.User) -> dict:
+    """Claims that let role guards authorize a request without loading the user"""
+    return {"sub": user.email, "uid": user.id, "role": user.role, "ver": user.token_version}
 
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     logger.info(f"Login attempt for user: {form_data.username}")
-    user = authenticate_user(db, form_data.username, form_data.password)
+    login_limiter.check(form_data.username, request.client.host if request.client else None)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         logger.warning(f"Failed login attempt for user: {form_data.username}")
+        login_counts["password_failed"] += 1
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -92,22 +67,52 @@ async def login_for_access_token(
         )
     
     logger.info(f"Successful login for user: {form_data.username} with role: {user.role}")
+    login_limiter.reset_email(form_data.username)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
+    refresh_token = issue_refresh_token(db, user)
+    db.commit()
+    login_counts["password"] += 1
+    
     response = {
         "access_token": access_token,
         "token_type": "bearer",
-        "user_role": user.role
+        "user_role": user.role,
+        "refresh_token": refresh_token
     }
     
     logger.info(f"Generated token for user: {form_data.username}")
     return response
 
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh_access_token(
+    body: schemas.RefreshRequest,
+    db: Session = Depends(get_db)
+):
+    """Exchange a refresh token for a new access token and a rotated refresh token (no bcrypt)"""
+    user, refresh_token = rotate_refresh_token(db, body.refresh_token)
+    access_token = create_access_token(
+        data=token_claims(user),
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user_role": user.role,
+        "refresh_token": refresh_token
+    }
+
+@router.post("/logout")
+async def logout(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke the refresh token and every rotation of it"""
+    revoke_refresh_token(db, body.refresh_token)
+    return {"message": "Logged out"}
+
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
     db_user = get_user(db, email=user.email)
     if db_user:
@@ -117,7 +122,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password_async(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -132,7 +137,6 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 @router.get("/me", response_model=schemas.User)
 async def read_users_me(request: Request, current_user: models.User = Depends(get_current_user)):
     logger.info(f"Processing /me request for user: {current_user.email}")
-    logger.info(f"Request headers: {dict(request.headers)}")
     
     user_data = {
         "id": current_user.id,
@@ -144,31 +148,7 @@ async def read_users_me(request: Request, current_user: models.User = Depends(ge
     
     logger.info(f"Returning user data: {user_data}")
     
-    response = JSONResponse(
-        content=user_data,
-        headers={
-            "Access-Control-Allow-Origin": "http://127.0.0.1:5500",  # Specific origin
-            "Access-Control-Allow-Credentials": "true",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Authorization, Content-Type",
-        }
-    )
-    return response
-
-@router.options("/me")
-async def options_users_me(request: Request):
-    logger.info("Handling OPTIONS request for /me endpoint")
-    logger.info(f"Request headers: {dict(request.headers)}")
-    
-    return JSONResponse(
-        content={},
-        headers={
-            "Access-Control-Allow-Origin": "http://127.0.0.1:5500",  # Specific origin
-            "Access-Control-Allow-Credentials": "true",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Authorization, Content-Type",
-        }
-    )
+    return ORJSONResponse(content=user_data)
 
 async def get_current_student(
     current_user: models.User = Depends(get_current_user)
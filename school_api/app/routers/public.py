@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from pydantic import BaseModel
 from .. import models
 from ..database import get_db
+from ..etag import conditional_get
+from ..fieldsets import Fieldset, fieldset
+from ..instrumentation import TimedRoute
+from ..pagination import Page, page_params
+from ..responses import ndjson_response, rows_response, schema_columns, stream_rows, wants_ndjson
 
 router = APIRouter(
+    route_class=TimedRoute,
     tags=["Public"],
     include_in_schema=True
 )
@@ -22,20 +29,38 @@ class PublicUserResponse(BaseModel):
     class Config:
         orm_mode = True
 
+# ?fields= for the user lists
+public_user_fieldset = fieldset(PublicUserResponse.model_fields)
+
 @router.get(
     "/users", 
     response_model=List[PublicUserResponse],
     include_in_schema=True,
     responses={
-        200: {"description": "List of all users"},
+        200: {"description": "A page of users (next page in the Link header); "
+                            "one per line with Accept: application/x-ndjson"},
+        304: {"description": "Not modified since the ETag sent in If-None-Match"},
         500: {"description": "Internal server error"}
     }
 )
-def get_users(db: Session = Depends(get_db)):
+def get_users(
+    request: Request,
+    cache_headers: dict = Depends(conditional_get(models.User)),
+    fieldset: Fieldset = Depends(public_user_fieldset),
+    page: Page = Depends(page_params),
+    db: Session = Depends(get_db)
+):
     """Get all users with basic public information. No authentication required."""
     try:
-        users = db.query(models.User).all()
-        return users
+        query = page.apply(select(*fieldset.columns(schema_columns(models.User, PublicUserResponse))), models.User.id)
+        if wants_ndjson(request):
+            return ndjson_response(stream_rows(query, PublicUserResponse, fields=fieldset.fields),
+                                   headers=cache_headers)
+        users = page.rows(db.execute(query))
+        return rows_response(users, PublicUserResponse, fields=fieldset.fields,
+                             headers={**cache_headers, **page.headers})
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -47,13 +72,15 @@ def get_users(db: Session = Depends(get_db)):
     response_model=List[PublicUserResponse],
     include_in_schema=True,
     responses={
-        200: {"description": "List of users with specified role"},
+        200: {"description": "A page of users with specified role (next page in the Link header)"},
         404: {"description": "No users found with specified role"},
         500: {"description": "Internal server error"}
     }
 )
 def get_users_by_role(
     role: str, 
+    fieldset: Fieldset = Depends(public_user_fieldset),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """
@@ -72,13 +99,16 @@ def get_users_by_role(
                 detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}"
             )
             
-        users = db.query(models.User).filter(models.User.role == role).all()
-        if not users:
+        query = select(*fieldset.columns(schema_columns(models.User, PublicUserResponse))).filter(
+            models.User.role == role
+        )
+        users = page.rows(db.execute(page.apply(query, models.User.id)))
+        if not users and page.cursor is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No users found with role: {role}"
             )
-        return users
+        return rows_response(users, PublicUserResponse, fields=fieldset.fields, headers=page.headers)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, File, UploadFile, Form
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, File, UploadFile, Form
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, noload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, date
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_db, get_async_db
+from ..etag import conditional_get
+from ..instrumentation import TimedRoute
+from ..pagination import Page, page_params
+from ..responses import ORJSONResponse, astream_rows, ndjson_response, schema_columns, wants_ndjson
 from ..auth import get_current_student
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import FileResponse
 import logging
 import os
 import shutil
@@ -20,25 +26,13 @@ UPLOAD_DIR = "uploads/assignments/assignments/submissions"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 router = APIRouter(
+    route_class=TimedRoute,
     tags=["Student"],
     responses={404: {"description": "Not found"}},
 )
 
 logger.info("Student router initialized")
 
-def cors_response(data, request: Request = None):
-    """Helper function to add CORS headers to responses"""
-    origin = request.headers.get("origin", "http://127.0.0.1:5500") if request else "http://127.0.0.1:5500"
-    return JSONResponse(
-        content=data,
-        headers={
-            "Access-Control-Allow-Origin": origin,
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization",
-            "Access-Control-Allow-Credentials": "true"
-        }
-    )
-
 @router.get("/test")
 async def test_route():
     """Test route to verify the router is working"""
@@ -53,9 +47,6 @@ async def get_student_profile(
     """Get current student's profile"""
     try:
         logger.info(f"Getting profile for student: {current_student.email}")
-        logger.info(f"Request path: {request.url.path}")
-        logger.info(f"Request method: {request.method}")
-        logger.info(f"Request headers: {dict(request.headers)}")
         
         student = db.query(models.User).filter(
             models.User.id == current_student.id,
@@ -79,21 +70,12 @@ async def get_student_profile(
             "section": student.section,
             "contact": student.contact,
             "is_active": student.is_active,
-            "created_at": student.created_at.isoformat() if student.created_at else None,
-            "updated_at": student.updated_at.isoformat() if student.updated_at else None
+            "created_at": student.created_at,
+            "updated_at": student.updated_at
         }
         logger.info(f"Returning response data: {response_data}")
         
-        # Return response with specific CORS headers for this endpoint
-        return JSONResponse(
-            content=response_data,
-            headers={
-                "Access-Control-Allow-Origin": request.headers.get("origin", "http://127.0.0.1:5500"),
-                "Access-Control-Allow-Credentials": "true",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": "Authorization, Content-Type"
-            }
-        )
+        return ORJSONResponse(content=response_data)
     except Exception as e:
         logger.error(f"Error getting student profile: {str(e)}")
         logger.exception("Full traceback:")
@@ -102,38 +84,29 @@ async def get_student_profile(
             detail=str(e)
         )
 
-@router.options("/profile")
-async def options_student_profile(request: Request):
-    """Handle OPTIONS request for the profile endpoint"""
-    logger.info("Handling OPTIONS request for /profile endpoint")
-    logger.info(f"Request headers: {dict(request.headers)}")
-    
-    return JSONResponse(
-        content={},
-        headers={
-            "Access-Control-Allow-Origin": request.headers.get("origin", "http://127.0.0.1:5500"),
-            "Access-Control-Allow-Credentials": "true",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Authorization, Content-Type",
-        }
-    )
-
 @router.get("/classes", response_model=List[schemas.Class])
 async def get_student_classes(
     current_student: models.User = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    cache_headers: dict = Depends(conditional_get(models.Class, models.ClassEnrollment, models.User,
+                                                  user=get_current_student)),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all classes the student is enrolled in"""
     try:
-        classes = db.query(models.Class).join(
-            models.ClassEnrollment,
-            models.Class.id == models.ClassEnrollment.class_id
-        ).filter(
-            models.ClassEnrollment.student_id == current_student.id,
-            models.ClassEnrollment.status == "active"
-        ).options(
-            joinedload(models.Class.teacher)
-        ).all()
+        result = await db.execute(
+            select(models.Class).join(
+                models.ClassEnrollment,
+                models.Class.id == models.ClassEnrollment.class_id
+            ).filter(
+                models.ClassEnrollment.student_id == current_student.id,
+                models.ClassEnrollment.status == "active"
+            ).options(
+                joinedload(models.Class.teacher),
+                # Roster is not part of the student view and cannot lazy load on an AsyncSession
+                noload(models.Class.enrolled_students)
+            )
+        )
+        classes = result.scalars().all()
         
         return classes
     except Exception as e:
@@ -146,6 +119,7 @@ async def get_student_classes(
 async def get_student_assignments(
     current_student: models.User = Depends(get_current_student),
     status_filter: Optional[str] = None,
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all assignments for the student's enrolled classes"""
@@ -166,8 +140,8 @@ async def get_student_assignments(
         if status_filter:
             query = query.filter(models.Assignment.status.ilike(f"%{status_filter}%"))
         
-        # Get assignments
-        results = query.order_by(models.Assignment.due_date).all()
+        # Get a page of assignments, earliest due date first
+        results = page.rows(page.apply(query, models.Assignment.due_date, models.Assignment.id))
         
         # Convert to dict for JSON response
         assignments_data = []
@@ -192,7 +166,7 @@ async def get_student_assignments(
                 "id": assignment.id,
                 "title": assignment.title,
                 "description": assignment.description,
-                "due_date": assignment.due_date.isoformat() if assignment.due_date else None,
+                "due_date": assignment.due_date,
                 "status": submission_status,
                 "grade": grade,
                 "max_grade": getattr(assignment, 'max_grade', 100),  # Default max grade is 100
@@ -202,15 +176,9 @@ async def get_student_assignments(
                 "subject": class_.subject
             })
         
-        return JSONResponse(
-            content=assignments_data,
-            headers={
-                "Access-Control-Allow-Origin": "http://127.0.0.1:5500",
-                "Access-Control-Allow-Credentials": "true",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": "Authorization, Content-Type"
-            }
-        )
+        return ORJSONResponse(content=assignments_data, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error getting assignments: {str(e)}")
         raise HTTPException(
@@ -222,6 +190,7 @@ async def get_student_assignments(
 async def get_student_grades(
     current_student: models.User = Depends(get_current_student),
     class_id: Optional[int] = None,
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all grades for the student"""
@@ -238,8 +207,8 @@ async def get_student_grades(
         if class_id:
             query = query.filter(models.Grade.class_id == class_id)
         
-        # Get grades
-        results = query.order_by(models.Grade.created_at.desc()).all()
+        # Get a page of grades, newest first (ids follow creation order)
+        results = page.rows(page.apply(query, models.Grade.id, descending=True))
         
         # Convert to dict for JSON response
         grades_data = []
@@ -250,18 +219,12 @@ async def get_student_grades(
                 "max_score": grade.max_score,
                 "class_id": grade.class_id,
                 "subject": class_.name,
-                "created_at": grade.created_at.isoformat() if grade.created_at else None
+                "created_at": grade.created_at
             })
         
-        return JSONResponse(
-            content=grades_data,
-            headers={
-                "Access-Control-Allow-Origin": "http://127.0.0.1:5500",
-                "Access-Control-Allow-Credentials": "true",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": "Authorization, Content-Type"
-            }
-        )
+        return ORJSONResponse(content=grades_data, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error getting grades: {str(e)}")
         raise HTTPException(
@@ -271,16 +234,19 @@ async def get_student_grades(
 
 @router.get("/attendance", response_model=List[schemas.Attendance])
 async def get_student_attendance(
+    request: Request,
+    response: Response,
     current_student: models.User = Depends(get_current_student),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     class_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    page: Page = Depends(page_params),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get student's attendance records"""
+    """Get student's attendance records; one JSON object per line with Accept: application/x-ndjson"""
     try:
         # Build base query
-        query = db.query(models.Attendance).filter(
+        query = select(models.Attendance).filter(
             models.Attendance.student_id == current_student.id
         )
         
@@ -292,10 +258,21 @@ async def get_student_attendance(
         if class_id:
             query = query.filter(models.Attendance.class_id == class_id)
         
+        # Latest day first
+        query = page.apply(query, models.Attendance.date, models.Attendance.id, descending=True)
+        if wants_ndjson(request):
+            # Columns only: no ORM objects per record while streaming
+            columns = query.with_only_columns(*schema_columns(models.Attendance, schemas.Attendance))
+            return ndjson_response(astream_rows(columns, schemas.Attendance))
+
         # Get attendance records
-        attendance = query.order_by(models.Attendance.date.desc()).all()
+        result = await db.execute(query)
+        attendance = page.rows(result.scalars())
+        response.headers.update(page.headers)
         
         return attendance
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -305,21 +282,26 @@ async def get_student_attendance(
 @router.get("/schedule", response_model=List[schemas.Class])
 async def get_student_schedule(
     current_student: models.User = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    cache_headers: dict = Depends(conditional_get(models.Class, models.ClassEnrollment, models.User,
+                                                  user=get_current_student)),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get student's class schedule"""
     try:
-        schedule = db.query(models.Class).join(
-            models.ClassEnrollment,
-            models.Class.id == models.ClassEnrollment.class_id
-        ).filter(
-            models.ClassEnrollment.student_id == current_student.id,
-            models.ClassEnrollment.status == "active"
-        ).options(
-            joinedload(models.Class.teacher)
-        ).order_by(
-            models.Class.schedule
-        ).all()
+        result = await db.execute(
+            select(models.Class).join(
+                models.ClassEnrollment,
+                models.Class.id == models.ClassEnrollment.class_id
+            ).filter(
+                models.ClassEnrollment.student_id == current_student.id,
+                models.ClassEnrollment.status == "active"
+            ).options(
+                joinedload(models.Class.teacher)
+            ).order_by(
+                models.Class.schedule
+            )
+        )
+        schedule = result.scalars().all()
         
         # Convert to dict for JSON response
         schedule_data = []
@@ -368,15 +350,7 @@ async def get_student_schedule(
                     "end_time": end_time
                 })
         
-        return JSONResponse(
-            content=schedule_data,
-            headers={
-                "Access-Control-Allow-Origin": "http://127.0.0.1:5500",
-                "Access-Control-Allow-Credentials": "true",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": "Authorization, Content-Type"
-            }
-        )
+        return ORJSONResponse(content=schedule_data, headers=cache_headers)
     except Exception as e:
         logger.error(f"Error getting schedule: {str(e)}")
         raise HTTPException(
@@ -457,19 +431,13 @@ async def submit_assignment(
         db.commit()
         db.refresh(submission)
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "message": "Assignment submitted successfully",
                 "submission_id": submission.id,
                 "submission_date": submission.submission_date.isoformat(),
                 "file_name": file_name,
                 "file_path": db_file_path
-            },
-            headers={
-                "Access-Control-Allow-Origin": "http://127.0.0.1:5500",
-                "Access-Control-Allow-Credentials": "true",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": "Authorization, Content-Type"
             }
         )
 
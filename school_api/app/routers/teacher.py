@@ -1,42 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from .. import models, schemas
-from ..database import get_db
-from ..auth import get_current_teacher, get_password_hash
+from ..database import get_db, get_async_db, upsert_insert, writes_on_read
+from ..etag import conditional_get
+from ..fieldsets import Fieldset, fieldset
+from ..instrumentation import TimedRoute
+from ..pagination import Page, page_params
+from ..responses import ORJSONResponse, rows_response, schema_columns
+from ..auth import get_current_teacher, hash_password_async
 from ..config import settings
 import logging
 from sqlalchemy.sql import func, case
 import os
-from sqlalchemy import text
+from sqlalchemy import Integer, and_, false, literal, null, select, text
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter(tags=["teacher"])
+router = APIRouter(tags=["teacher"], route_class=TimedRoute)
 
-def cors_response(data):
-    """Helper function to add CORS headers to responses"""
-    return JSONResponse(
-        content=data,
-        headers={
-            "Access-Control-Allow-Origin": "http://127.0.0.1:5500",  # Specific origin for development
-            "Access-Control-Allow-Credentials": "true",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Authorization, Content-Type"
-        }
-    )
+# Columns of the grades unique key used for upserts
+GRADE_KEY = ["class_id", "assignment_id", "student_id"]
+# ... and of the attendance unique key (one record per student per class per day)
+ATTENDANCE_KEY = ["class_id", "date", "student_id"]
+
+
+def last_per_key(records, key) -> List[dict]:
+    """The records as upsert rows, keeping only the last one for each key.
+
+    PostgreSQL refuses an INSERT ... ON CONFLICT DO UPDATE that would touch the same row
+    twice, so a batch repeating a key has to be reduced to one row per key first.
+    """
+    rows = {}
+    for record in records:
+        row = record.dict()
+        rows[tuple(row[column] for column in key)] = row
+    return list(rows.values())
 
-@router.options("/{path:path}")
-async def options_handler(request: Request):
-    """Handle OPTIONS requests for all teacher endpoints"""
-    logger.info("Handling OPTIONS request")
-    return cors_response({})
+# ?fields= / ?include= for the class and roster lists
+TEACHER_CLASS_FIELDS = ("id", "name", "grade", "section", "schedule", "room", "teacher_id", "current_students",
+                        "capacity", "subject", "status", "students_count", "created_at", "updated_at")
+teacher_class_fieldset = fieldset(TEACHER_CLASS_FIELDS, expansions=("recent_assignments",),
+                                  default_include=("recent_assignments",))
+class_student_fieldset = fieldset(schemas.EnrolledStudent.model_fields)
 
 @router.get("/profile", response_model=schemas.User)
+@writes_on_read  # Backfills the teacher's subject
 async def get_teacher_profile(
     request: Request,
     current_teacher: models.User = Depends(get_current_teacher),
@@ -52,10 +66,10 @@ async def get_teacher_profile(
         if first_class:
             current_teacher.subject = first_class.subject
             db.commit()
-            db.refresh(current_teacher)
+            db.refresh(current_teacher.user)
     
     # Return full teacher profile with all fields
-    return cors_response({
+    return ORJSONResponse({
         "id": current_teacher.id,
         "email": current_teacher.email,
         "full_name": current_teacher.full_name,
@@ -65,8 +79,8 @@ async def get_teacher_profile(
         "contact": current_teacher.contact,
         "qualification": current_teacher.qualification,
         "bio": current_teacher.bio,
-        "created_at": current_teacher.created_at.isoformat() if current_teacher.created_at else None,
-        "updated_at": current_teacher.updated_at.isoformat() if current_teacher.updated_at else None
+        "created_at": current_teacher.created_at,
+        "updated_at": current_teacher.updated_at
     })
 
 @router.put("/profile", response_model=schemas.User)
@@ -81,16 +95,16 @@ async def update_teacher_profile(
         # Update teacher fields
         for field, value in profile_update.dict(exclude_unset=True).items():
             if field == "password":
-                setattr(current_teacher, "hashed_password", get_password_hash(value))
+                setattr(current_teacher, "hashed_password", await hash_password_async(value))
             else:
                 setattr(current_teacher, field, value)
         
         current_teacher.updated_at = datetime.utcnow()
         db.commit()
-        db.refresh(current_teacher)
+        db.refresh(current_teacher.user)
 
         # Return serialized response
-        return cors_response({
+        return ORJSONResponse({
             "id": current_teacher.id,
             "email": current_teacher.email,
             "full_name": current_teacher.full_name,
@@ -100,9 +114,11 @@ async def update_teacher_profile(
             "contact": current_teacher.contact,
             "qualification": current_teacher.qualification,
             "bio": current_teacher.bio,
-            "created_at": current_teacher.created_at.isoformat() if current_teacher.created_at else None,
-            "updated_at": current_teacher.updated_at.isoformat() if current_teacher.updated_at else None
+            "created_at": current_teacher.created_at,
+            "updated_at": current_teacher.updated_at
         })
+    except HTTPException as he:
+        raise he
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -114,70 +130,72 @@ async def update_teacher_profile(
 async def get_teacher_classes(
     request: Request,
     current_teacher: models.User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    cache_headers: dict = Depends(conditional_get(models.Class, models.ClassEnrollment, models.Assignment,
+                                                  user=get_current_teacher)),
+    fieldset: Fieldset = Depends(teacher_class_fieldset),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all classes assigned to the teacher"""
     try:
         logger.info(f"Getting classes for teacher: {current_teacher.email} (ID: {current_teacher.id})")
         
-        # Query classes with related data
-        classes = db.query(models.Class).filter(
+        # Query only the requested class columns; enrollments are counted in SQL, not loaded
+        columns = fieldset.columns(getattr(models.Class, name) for name in TEACHER_CLASS_FIELDS
+                                   if name not in ("current_students", "students_count"))
+        if fieldset.wants("current_students") or fieldset.wants("students_count"):
+            columns.append(
+                select(func.count(models.ClassEnrollment.id)).filter(
+                    models.ClassEnrollment.class_id == models.Class.id,
+                    models.ClassEnrollment.status == "active"
+                ).scalar_subquery().label("active_students")
+            )
+        teacher_classes = (
             models.Class.teacher_id == current_teacher.id,
             models.Class.status == "active"  # Only show active classes
-        ).options(
-            joinedload(models.Class.enrolled_students)  # Load enrollments efficiently
-        ).all()
+        )
+        classes = [dict(row._mapping) for row in (await db.execute(select(*columns).filter(*teacher_classes)))]
         
         if not classes:
-            return cors_response([])  # Return empty list instead of 404
+            return ORJSONResponse([], headers=cache_headers)  # Return empty list instead of 404
+        
+        # The 5 latest active assignments of every class, in one query
+        recent_assignments = {}
+        if fieldset.includes("recent_assignments"):
+            position = func.row_number().over(
+                partition_by=models.Assignment.class_id,
+                order_by=models.Assignment.due_date.desc()
+            ).label("position")
+            ranked = select(
+                models.Assignment.class_id, models.Assignment.id, models.Assignment.title,
+                models.Assignment.due_date, models.Assignment.status, position
+            ).join(
+                models.Class, models.Class.id == models.Assignment.class_id
+            ).filter(
+                models.Assignment.status == "Active", *teacher_classes
+            ).subquery()
+            rows = await db.execute(
+                select(ranked.c.class_id, ranked.c.id, ranked.c.title, ranked.c.due_date, ranked.c.status)
+                .filter(ranked.c.position <= 5)
+                .order_by(ranked.c.class_id, ranked.c.position)
+            )
+            for row in rows:
+                assignment = dict(row._mapping)
+                recent_assignments.setdefault(assignment.pop("class_id"), []).append(assignment)
         
         # Serialize the classes with detailed information
         serialized_classes = []
         for class_ in classes:
-            # Get active enrollments
-            active_enrollments = [
-                e for e in class_.enrolled_students 
-                if e.status == "active"
-            ]
-            
-            # Get recent assignments
-            recent_assignments = db.query(models.Assignment).filter(
-                models.Assignment.class_id == class_.id,
-                models.Assignment.status == "Active"
-            ).order_by(
-                models.Assignment.due_date.desc()
-            ).limit(5).all()
-            
-            # Format assignments with proper date serialization
-            assignment_list = [{
-                "id": a.id,
-                "title": a.title,
-                "due_date": a.due_date.isoformat() if a.due_date else None,
-                "status": a.status
-            } for a in recent_assignments]
-            
-            # Format dates for class
-            serialized_class = {
-                "id": class_.id,
-                "name": class_.name,
-                "grade": class_.grade,
-                "section": class_.section,
-                "schedule": class_.schedule,
-                "room": class_.room,
-                "teacher_id": class_.teacher_id,
-                "current_students": len(active_enrollments),
-                "capacity": class_.capacity,
-                "subject": class_.subject,
-                "status": class_.status,
-                "recent_assignments": assignment_list,
-                "students_count": len(active_enrollments),
-                "created_at": class_.created_at.isoformat() if class_.created_at else None,
-                "updated_at": class_.updated_at.isoformat() if class_.updated_at else None
-            }
-            serialized_classes.append(serialized_class)
+            active_students = class_.pop("active_students", None)
+            if fieldset.wants("current_students"):
+                class_["current_students"] = active_students
+            if fieldset.wants("students_count"):
+                class_["students_count"] = active_students
+            if fieldset.includes("recent_assignments"):
+                class_["recent_assignments"] = recent_assignments.get(class_["id"], [])
+            serialized_classes.append(class_)
         
         logger.info(f"Found {len(serialized_classes)} classes")
-        return cors_response(serialized_classes)
+        return ORJSONResponse(serialized_classes, headers=cache_headers)
         
     except Exception as e:
         logger.error(f"Error getting classes: {str(e)}")
@@ -221,7 +239,7 @@ async def get_teacher_class(
             "status": class_.status
         }
         
-        return cors_response(serialized_class)
+        return ORJSONResponse(serialized_class)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -326,11 +344,11 @@ async def get_dashboard_stats(
             "last_updated": datetime.now().isoformat()
         }
         logger.info("Successfully compiled dashboard stats")
-        return cors_response(response_data)
+        return ORJSONResponse(response_data)
 
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {str(e)}")
-        return cors_response({
+        return ORJSONResponse({
             "total_students": 0,
             "total_classes": 0,
             "active_assignments": 0,
@@ -446,11 +464,11 @@ async def get_recent_activities(
         # Sort all activities by timestamp and take the 10 most recent
         activities.sort(key=lambda x: x["timestamp"], reverse=True)
         logger.info(f"Returning {len(activities[:10])} total activities")
-        return cors_response(activities[:10])
+        return ORJSONResponse(activities[:10])
 
     except Exception as e:
         logger.error(f"Error getting recent activities: {str(e)}")
-        return cors_response([])  # Return empty list instead of raising error
+        return ORJSONResponse([])  # Return empty list instead of raising error
 
 @router.get("/schedule")
 async def get_teacher_schedule(
@@ -491,18 +509,18 @@ async def get_teacher_schedule(
 async def get_teacher_assignments(
     request: Request,
     current_teacher: models.User = Depends(get_current_teacher),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get all assignments created by the teacher"""
     try:
         logger.info(f"Getting assignments for teacher: {current_teacher.email}")
         
-        # Query assignments
-        assignments = db.query(models.Assignment).filter(
-            models.Assignment.teacher_id == current_teacher.id
-        ).order_by(
-            models.Assignment.due_date.desc()
-        ).all()
+        # Query a page of assignments, latest due date first
+        assignments = page.rows(page.apply(
+            db.query(models.Assignment).filter(models.Assignment.teacher_id == current_teacher.id),
+            models.Assignment.due_date, models.Assignment.id, descending=True
+        ))
         
         logger.info(f"Found {len(assignments)} assignments")
         
@@ -546,12 +564,12 @@ async def get_teacher_assignments(
                     "description": assignment.description or "",
                     "class_id": assignment.class_id,
                     "class_name": class_.name if class_ else "Unknown Class",
-                    "due_date": assignment.due_date.isoformat() if assignment.due_date else None,
+                    "due_date": assignment.due_date,
                     "max_score": assignment.max_score or 100.0,
                     "status": status,
                     "teacher_id": assignment.teacher_id,
-                    "created_at": assignment.created_at.isoformat() if assignment.created_at else None,
-                    "updated_at": assignment.updated_at.isoformat() if assignment.updated_at else None,
+                    "created_at": assignment.created_at,
+                    "updated_at": assignment.updated_at,
                     "submission_stats": {
                         "total_submissions": total_submissions,
                         "graded_submissions": graded_submissions,
@@ -565,16 +583,20 @@ async def get_teacher_assignments(
                 logger.error(f"Error processing assignment {assignment.id}: {str(e)}")
                 continue
         
-        return cors_response(serialized_assignments)
+        return ORJSONResponse(serialized_assignments, headers=page.headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error getting assignments: {str(e)}")
         # Return empty list instead of raising exception
-        return cors_response([])
+        return ORJSONResponse([])
 
 @router.get("/classes/{class_id}/assignments", response_model=List[schemas.Assignment])
 async def get_class_assignments(
     class_id: int,
+    response: Response,
     current_teacher: models.User = Depends(get_current_teacher),
+    page: Page = Depends(page_params),
     db: Session = Depends(get_db)
 ):
     """Get assignments for a specific class"""
@@ -590,12 +612,15 @@ async def get_class_assignments(
                 detail="Class not found or not assigned to you"
             )
         
-        # Get assignments for the class
-        assignments = db.query(models.Assignment).filter(
-            models.Assignment.class_id == class_id
-        ).all()
-        
+        # Get a page of assignments for the class
+        assignments = page.rows(page.apply(
+            db.query(models.Assignment).filter(models.Assignment.class_id == class_id),
+            models.Assignment.id
+        ))
+        response.headers.update(page.headers)
         return assignments
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error getting class assignments: {str(e)}")
         raise HTTPException(
@@ -678,17 +703,17 @@ async def create_assignment(
         logger.info(f"Assignment created successfully with ID: {new_assignment.id}")
         
         # Return serialized assignment
-        return cors_response({
+        return ORJSONResponse({
             "id": new_assignment.id,
             "title": new_assignment.title,
             "description": new_assignment.description,
             "class_id": new_assignment.class_id,
-            "due_date": new_assignment.due_date.isoformat() if new_assignment.due_date else None,
+            "due_date": new_assignment.due_date,
             "max_score": new_assignment.max_score,
             "status": new_assignment.status,
             "teacher_id": new_assignment.teacher_id,
-            "created_at": new_assignment.created_at.isoformat() if new_assignment.created_at else None,
-            "updated_at": new_assignment.updated_at.isoformat() if new_assignment.updated_at else None,
+            "created_at": new_assignment.created_at,
+            "updated_at": new_assignment.updated_at,
             "submission_stats": {
                 "total_submissions": 0,
                 "graded_submissions": 0,
@@ -785,24 +810,24 @@ async def get_assignment_details(
                 "id": submission.id,
                 "student_id": submission.student_id,
                 "student_name": student_name,
-                "submission_date": submission.submission_date.isoformat() if submission.submission_date else None,
+                "submission_date": submission.submission_date,
                 "score": score,
                 "feedback": submission.feedback,
                 "status": submission.status
             })
         
-        return cors_response({
+        return ORJSONResponse({
             "id": assignment.id,
             "title": assignment.title,
             "description": assignment.description,
             "class_id": assignment.class_id,
             "class_name": class_.name if class_ else "Unknown Class",
-            "due_date": assignment.due_date.isoformat() if assignment.due_date else None,
+            "due_date": assignment.due_date,
             "max_score": assignment.max_score,
             "status": status_value,
             "teacher_id": assignment.teacher_id,
-            "created_at": assignment.created_at.isoformat() if assignment.created_at else None,
-            "updated_at": assignment.updated_at.isoformat() if assignment.updated_at else None,
+            "created_at": assignment.created_at,
+            "updated_at": assignment.updated_at,
             "submission_stats": {
                 "total_submissions": total_submissions,
                 "graded_submissions": graded_submissions,
@@ -853,17 +878,17 @@ async def update_assignment(
         db.refresh(assignment)
         
         # Return updated assignment
-        return cors_response({
+        return ORJSONResponse({
             "id": assignment.id,
             "title": assignment.title,
             "description": assignment.description,
             "class_id": assignment.class_id,
-            "due_date": assignment.due_date.isoformat() if assignment.due_date else None,
+            "due_date": assignment.due_date,
             "max_score": assignment.max_score,
             "status": assignment.status,
             "teacher_id": assignment.teacher_id,
-            "created_at": assignment.created_at.isoformat() if assignment.created_at else None,
-            "updated_at": assignment.updated_at.isoformat() if assignment.updated_at else None
+            "created_at": assignment.created_at,
+            "updated_at": assignment.updated_at
         })
     except HTTPException as he:
         raise he
@@ -920,7 +945,7 @@ async def delete_assignment(
         # Finally, delete the assignment
         db.delete(assignment)
         db.commit()
-        return cors_response({"message": "Assignment deleted successfully"})
+        return ORJSONResponse({"message": "Assignment deleted successfully"})
             
     except HTTPException as he:
         raise he
@@ -934,6 +959,7 @@ async def delete_assignment(
         )
 
 @router.get("/classes/{class_id}/attendance", response_model=List[schemas.Attendance])
+@writes_on_read  # Creates default "absent" records for the requested date
 async def get_class_attendance(
     class_id: int,
     date: Optional[date] = None,
@@ -1001,7 +1027,7 @@ async def get_class_attendance(
                 "class_id": record.class_id,
                 "student_id": record.student_id,
                 "student_name": student.full_name,
-                "date": record.date.isoformat() if record.date else None,
+                "date": record.date,
                 "status": record.status,
                 "notes": record.notes
             }
@@ -1013,7 +1039,7 @@ async def get_class_attendance(
         # Sort records by student name
         attendance_records.sort(key=lambda x: x["student_name"])
         
-        return cors_response(attendance_records)
+        return ORJSONResponse(attendance_records)
         
     except HTTPException as he:
         db.rollback()
@@ -1046,18 +1072,31 @@ async def mark_class_attendance(
                 detail="Class not found or not assigned to you"
             )
         
-        # Create attendance records
-        db_records = []
-        for record in attendance_records:
-            db_record = models.Attendance(**record.dict())
-            db.add(db_record)
-            db_records.append(db_record)
+        if not attendance_records:
+            return []
         
-        db.commit()
-        for record in db_records:
-            db.refresh(record)
+        # The upsert writes whatever class_id each record names; only the path class is checked
+        if any(record.class_id != class_id for record in attendance_records):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Every attendance record must be for the class in the URL"
+            )
+        
+        # Upsert attendance records; marking a student again for the same day updates the record
+        stmt = upsert_insert(db)(models.Attendance).values(last_per_key(attendance_records, ATTENDANCE_KEY))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=ATTENDANCE_KEY,
+            set_={
+                "status": stmt.excluded.status,
+                "notes": stmt.excluded.notes,
+                "updated_at": func.now()
+            }
+        ).returning(models.Attendance)
+        db_records = db.scalars(stmt, execution_options={"populate_existing": True}).all()
+        response = [schemas.Attendance.model_validate(record) for record in db_records]
         
-        return db_records
+        db.commit()
+        return response
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -1111,17 +1150,19 @@ async def get_class_grades(
     class_id: int,
     assignment_id: Optional[int] = None,
     current_teacher: models.User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get grades for a class"""
     try:
         logger.info(f"Getting grades for class {class_id} and assignment {assignment_id}")
         
         # Verify class belongs to teacher
-        class_ = db.query(models.Class).filter(
-            models.Class.id == class_id,
-            models.Class.teacher_id == current_teacher.id
-        ).first()
+        class_ = (await db.execute(
+            select(models.Class).filter(
+                models.Class.id == class_id,
+                models.Class.teacher_id == current_teacher.id
+            )
+        )).scalars().first()
         
         if not class_:
             logger.warning(f"Class {class_id} not found or not assigned to teacher {current_teacher.id}")
@@ -1135,10 +1176,12 @@ async def get_class_grades(
         # If assignment_id is provided, verify it exists and belongs to this class
         if assignment_id:
             logger.info(f"Verifying assignment {assignment_id}")
-            assignment = db.query(models.Assignment).filter(
-                models.Assignment.id == assignment_id,
-                models.Assignment.class_id == class_id
-            ).first()
+            assignment = (await db.execute(
+                select(models.Assignment).filter(
+                    models.Assignment.id == assignment_id,
+                    models.Assignment.class_id == class_id
+                )
+            )).scalars().first()
             
             if not assignment:
                 logger.warning(f"Assignment {assignment_id} not found for class {class_id}")
@@ -1149,74 +1192,47 @@ async def get_class_grades(
             
             logger.info(f"Found assignment: {assignment.title}")
         
-        # Get all enrolled students in the class
-        logger.info(f"Getting enrolled students for class {class_id}")
-        enrolled_students = db.query(models.User).join(
-            models.ClassEnrollment,
-            models.User.id == models.ClassEnrollment.student_id
-        ).filter(
-            models.ClassEnrollment.class_id == class_id,
-            models.ClassEnrollment.status == "active"
-        ).all()
-        
-        logger.info(f"Found {len(enrolled_students)} enrolled students")
-        
-        # Get existing grades and submissions for the assignment if specified
-        grades_dict = {}
-        submissions_dict = {}
+        # One row per enrolled student with their grade and submission for the assignment (if any),
+        # labelled after GradeResponse so the rows are encoded as they come from the database.
+        # The unique keys on grades and submissions keep it to one row per student.
+        Submission = models.AssignmentSubmission
         if assignment_id:
-            try:
-                # Get existing grades
-                logger.info(f"Getting grades for assignment {assignment_id}")
-                existing_grades = db.query(models.Grade).filter(
-                    models.Grade.class_id == class_id,
-                    models.Grade.assignment_id == assignment_id
-                ).all()
-                grades_dict = {grade.student_id: grade for grade in existing_grades}
-                logger.info(f"Found {len(existing_grades)} existing grades")
-                
-                # Get submissions for this assignment
-                logger.info(f"Getting submissions for assignment {assignment_id}")
-                submissions = db.query(models.AssignmentSubmission).filter(
-                    models.AssignmentSubmission.assignment_id == assignment_id
-                ).all()
-                submissions_dict = {sub.student_id: sub for sub in submissions}
-                logger.info(f"Found {len(submissions)} submissions")
-            except Exception as e:
-                logger.error(f"Error getting grades/submissions: {str(e)}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Error getting grades/submissions: {str(e)}"
-                )
-        
-        # Format grades with student names, including students without grades
-        formatted_grades = []
-        for student in enrolled_students:
-            grade = grades_dict.get(student.id)
-            submission = submissions_dict.get(student.id)
-            formatted_grade = {
-                "id": getattr(grade, 'id', None),
-                "student_id": student.id,
-                "student_name": student.full_name,
-                "class_id": class_id,
-                "assignment_id": assignment_id,
-                "score": getattr(grade, 'score', None),
-                "max_score": getattr(grade, 'max_score', 100.0),
-                "grade_type": getattr(grade, 'grade_type', "assignment"),
-                "weight": getattr(grade, 'weight', 1.0),
-                "feedback": getattr(grade, 'feedback', None),
-                "rubric_data": getattr(grade, 'rubric_data', None),
-                "status": getattr(grade, 'status', "pending"),
-                "submission_status": getattr(submission, 'status', "not_submitted"),
-                "submission_date": submission.submission_date.isoformat() if submission and hasattr(submission, 'submission_date') and submission.submission_date else None,
-                "graded_date": grade.graded_date.isoformat() if grade and hasattr(grade, 'graded_date') and grade.graded_date else None,
-                "created_at": grade.created_at.isoformat() if grade and hasattr(grade, 'created_at') and grade.created_at else None,
-                "updated_at": grade.updated_at.isoformat() if grade and hasattr(grade, 'updated_at') and grade.updated_at else None
-            }
-            formatted_grades.append(formatted_grade)
-        
-        logger.info(f"Returning {len(formatted_grades)} formatted grades")
-        return cors_response(formatted_grades)
+            grade_match = and_(models.Grade.class_id == class_id, models.Grade.assignment_id == assignment_id)
+            submission_match = Submission.assignment_id == assignment_id
+        else:
+            grade_match = submission_match = false()
+        rows = (await db.execute(
+            select(
+                models.Grade.id.label("id"),
+                models.User.id.label("student_id"),
+                models.User.full_name.label("student_name"),
+                literal(class_id, Integer).label("class_id"),
+                literal(assignment_id, Integer).label("assignment_id"),
+                models.Grade.score.label("score"),
+                func.coalesce(models.Grade.max_score, 100.0).label("max_score"),
+                func.coalesce(models.Grade.grade_type, "assignment").label("grade_type"),
+                func.coalesce(models.Grade.weight, 1.0).label("weight"),
+                null().label("feedback"),
+                models.Grade.rubric_data.label("rubric_data"),
+                func.coalesce(models.Grade.status, "pending").label("status"),
+                func.coalesce(Submission.status, "not_submitted").label("submission_status"),
+                Submission.submission_date.label("submission_date"),
+                null().label("graded_date"),
+                models.Grade.created_at.label("created_at"),
+                models.Grade.updated_at.label("updated_at"),
+            )
+            .select_from(models.ClassEnrollment)
+            .join(models.User, models.User.id == models.ClassEnrollment.student_id)
+            .outerjoin(models.Grade, and_(models.Grade.student_id == models.User.id, grade_match))
+            .outerjoin(Submission, and_(Submission.student_id == models.User.id, submission_match))
+            .filter(
+                models.ClassEnrollment.class_id == class_id,
+                models.ClassEnrollment.status == "active"
+            )
+        )).all()
+
+        logger.info(f"Returning {len(rows)} grades")
+        return rows_response(rows)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -1246,25 +1262,30 @@ async def create_or_update_grade(
                 detail="Class not found or not assigned to you"
             )
         
-        # Check if grade exists
-        grade = db.query(models.Grade).filter(
-            models.Grade.class_id == class_id,
-            models.Grade.assignment_id == grade_data.assignment_id,
-            models.Grade.student_id == grade_data.student_id
-        ).first()
+        # The upsert writes whatever class_id the grade names; only the path class is checked
+        if grade_data.class_id != class_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="The grade must be for the class in the URL"
+            )
         
-        if grade:
-            # Update existing grade
-            for key, value in grade_data.dict(exclude_unset=True).items():
-                setattr(grade, key, value)
-        else:
-            # Create new grade
-            grade = models.Grade(**grade_data.dict())
-            db.add(grade)
+        # Insert the grade, or update the fields that were sent if it already exists
+        update_fields = set(grade_data.dict(exclude_unset=True)) - set(GRADE_KEY)
+        stmt = upsert_insert(db)(models.Grade).values(**grade_data.dict())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=GRADE_KEY,
+            set_={
+                **{field: stmt.excluded[field] for field in update_fields},
+                "updated_at": func.now()
+            }
+        ).returning(models.Grade)
+        grade = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+        response = schemas.Grade.model_validate(grade)
         
         db.commit()
-        db.refresh(grade)
-        return grade
+        return response
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error creating/updating grade: {str(e)}")
         raise HTTPException(
@@ -1321,6 +1342,7 @@ async def add_grade_comment(
 async def get_class_students(
     class_id: int,
     current_teacher: models.User = Depends(get_current_teacher),
+    fieldset: Fieldset = Depends(class_student_fieldset),
     db: Session = Depends(get_db)
 ):
     """Get students in a specific class"""
@@ -1336,29 +1358,18 @@ async def get_class_students(
                 detail="Class not found or not assigned to you"
             )
         
-        # Get students enrolled in the class with active status
-        students = db.query(models.User).join(
-            models.ClassEnrollment,
-            models.User.id == models.ClassEnrollment.student_id
-        ).filter(
-            models.ClassEnrollment.class_id == class_id,
-            models.ClassEnrollment.status == "active",
-            models.User.role == "student"
-        ).all()
-        
-        # Format response according to EnrolledStudent schema
-        formatted_students = []
-        for student in students:
-            formatted_students.append({
-                "id": student.id,
-                "email": student.email,
-                "full_name": student.full_name,
-                "role": student.role,
-                "grade": student.grade,
-                "section": student.section
-            })
-        
-        return cors_response(formatted_students)
+        # Get students enrolled in the class with active status, only the requested columns
+        students = db.execute(
+            select(*fieldset.columns(schema_columns(models.User, schemas.EnrolledStudent))).join(
+                models.ClassEnrollment,
+                models.User.id == models.ClassEnrollment.student_id
+            ).filter(
+                models.ClassEnrollment.class_id == class_id,
+                models.ClassEnrollment.status == "active",
+                models.User.role == "student"
+            )
+        )
+        return rows_response(students)
     except Exception as e:
         logger.error(f"Error getting class students: {str(e)}")
         raise HTTPException(
@@ -1427,7 +1438,7 @@ async def get_class_stats(
         except Exception as e:
             logger.error(f"Error getting enrolled students count: {str(e)}")
 
-        return cors_response({
+        return ORJSONResponse({
             "active_assignments": active_assignments,
             "completed_assignments": completed_assignments,
             "average_grade": average_grade,
@@ -1439,7 +1450,7 @@ async def get_class_stats(
     except Exception as e:
         logger.error(f"Error getting class statistics: {str(e)}")
         # Return default values instead of raising exception
-        return cors_response({
+        return ORJSONResponse({
             "active_assignments": 0,
             "completed_assignments": 0,
             "average_grade": 0.0,
@@ -1468,18 +1479,23 @@ async def create_bulk_grades(
                 detail="One or more classes not found or not assigned to you"
             )
         
-        # Create grades
-        db_grades = []
-        for grade in grades:
-            db_grade = models.Grade(**grade.dict())
-            db.add(db_grade)
-            db_grades.append(db_grade)
+        if not grades:
+            return []
         
-        db.commit()
-        for grade in db_grades:
-            db.refresh(grade)
+        # Upsert grades; an existing grade for the same student/assignment is overwritten
+        stmt = upsert_insert(db)(models.Grade).values(last_per_key(grades, GRADE_KEY))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=GRADE_KEY,
+            set_={
+                **{field: stmt.excluded[field] for field in schemas.GradeCreate.model_fields if field not in GRADE_KEY},
+                "updated_at": func.now()
+            }
+        ).returning(models.Grade)
+        db_grades = db.scalars(stmt, execution_options={"populate_existing": True}).all()
+        response = [schemas.Grade.model_validate(grade) for grade in db_grades]
         
-        return db_grades
+        db.commit()
+        return response
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -1592,7 +1608,7 @@ async def get_assignment_submissions(
                 "student_id": submission.student_id,
                 "student_name": student_name,
                 "assignment_id": submission.assignment_id,
-                "submission_date": submission.submission_date.isoformat() if submission.submission_date else None,
+                "submission_date": submission.submission_date,
                 "status": submission.status,
                 "score": submission_grade.score if submission_grade else None,
                 "feedback": submission.feedback,
@@ -1600,7 +1616,7 @@ async def get_assignment_submissions(
             }
             serialized_submissions.append(serialized_submission)
         
-        return cors_response(serialized_submissions)
+        return ORJSONResponse(serialized_submissions)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -1657,9 +1673,6 @@ async def download_submission_file(
             media_type='application/octet-stream',
             filename=os.path.basename(clean_path),
             headers={
-                "Access-Control-Allow-Origin": "http://127.0.0.1:5500",
-                "Access-Control-Allow-Methods": "GET, OPTIONS",
-                "Access-Control-Allow-Headers": "Authorization, Content-Type",
                 "Content-Disposition": f"attachment; filename={os.path.basename(clean_path)}"
             }
         )
@@ -6,6 +6,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user_role: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
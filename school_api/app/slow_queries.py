@@ -0,0 +1,163 @@
+from collections import OrderedDict, deque
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+import json
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .instrumentation import current_stats
+
+logger = logging.getLogger(__name__)
+
+# JSON lines of slow statements; written from the EXPLAIN thread, never the request path
+slow_query_logger = logging.getLogger("school_api.slow_queries")
+slow_query_logger.propagate = False
+
+# Only these are explained; EXPLAIN (without ANALYZE) plans them without running them
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# Distinct statements whose plan is remembered instead of explained again
+PLAN_CACHE_SIZE = 256
+
+
+def redact(value):
+    """Keep numbers, booleans and NULLs (ids, limits, flags); hide text, dates and blobs"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<redacted {type(value).__name__}({len(value)})>"
+    return f"<redacted {type(value).__name__}>"
+
+
+def redact_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    return redact(parameters)
+
+
+class SlowQueryLog:
+    """Statements slower than SLOW_QUERY_MS with their plan, kept in memory and optionally in a file.
+
+    The request only queues the statement; EXPLAIN runs on a separate connection from a
+    background thread, so a slow query does not get slower by being logged.
+    """
+
+    def __init__(self, size: int):
+        self.entries = deque(maxlen=size)
+        self._plans = OrderedDict()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, statement: str, parameters, duration: float):
+        if threading.current_thread() is self._thread:
+            return  # the EXPLAIN statements themselves
+        stats = current_stats()
+        # executemany passes a list of parameter sets; the first is enough for the plan
+        if isinstance(parameters, list) and parameters and isinstance(parameters[0], (dict, tuple, list)):
+            parameters = parameters[0]
+        entry = {
+            "ts": round(time.time(), 3),
+            "ms": round(duration * 1000, 3),
+            "route": stats.route if stats is not None else None,
+            "method": stats.method if stats is not None else None,
+            "statement": statement,
+            "parameters": redact_parameters(parameters),
+            "plan": None,
+        }
+        self.entries.append(entry)
+        self._ensure_worker()
+        self._queue.put((entry, parameters))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            entry, parameters = self._queue.get()
+            try:
+                entry["plan"] = self.explain(entry["statement"], parameters)
+                slow_query_logger.warning(json.dumps(entry, separators=(",", ":"), default=str))
+            except Exception as e:
+                logger.error(f"Could not log slow query: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def explain(self, statement: str, parameters) -> Optional[list]:
+        """EXPLAIN QUERY PLAN (SQLite) / EXPLAIN rows for the statement, or None if not explainable"""
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        plan = self._plans.get(statement)
+        if plan is not None:
+            self._plans.move_to_end(statement)
+            return plan
+
+        from .database import engine
+
+        prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            with engine.connect() as conn:
+                rows = conn.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+        except Exception as e:
+            return [f"EXPLAIN failed: {str(e)}"]
+        if engine.dialect.name == "sqlite":
+            # (id, parent, notused, detail)
+            plan = [row[-1] for row in rows]
+        else:
+            plan = [" ".join(str(column) for column in row) for row in rows]
+        self._plans[statement] = plan
+        if len(self._plans) > PLAN_CACHE_SIZE:
+            self._plans.popitem(last=False)
+        return plan
+
+    def flush(self):
+        """Wait until every queued statement has been explained (tests and shutdown)"""
+        self._queue.join()
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_LOG_SIZE)
+
+
+def configure_slow_query_log():
+    """Also write slow statements to SLOW_QUERY_LOG_FILE, rotated by size"""
+    for handler in list(slow_query_logger.handlers):
+        slow_query_logger.removeHandler(handler)
+        handler.close()
+    if settings.SLOW_QUERY_LOG_FILE:
+        handler = RotatingFileHandler(settings.SLOW_QUERY_LOG_FILE,
+                                      maxBytes=settings.SLOW_QUERY_LOG_MAX_MB * 1024 * 1024,
+                                      backupCount=settings.SLOW_QUERY_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        slow_query_logger.addHandler(handler)
+    else:
+        slow_query_logger.addHandler(logging.NullHandler())
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["slow_query_start"].pop()
+    if settings.SLOW_QUERY_MS is not None and duration * 1000 >= settings.SLOW_QUERY_MS:
+        slow_query_log.record(statement, parameters, duration)
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_failed_query_start(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("slow_query_start"):
+        conn.info["slow_query_start"].pop()
@@ -0,0 +1,337 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .access_log import route_template
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Longest SQL text kept in a db span's db.statement attribute
+MAX_STATEMENT_LENGTH = 1000
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """One timed operation of a sampled trace; exported when it ends"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start", "end", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = SPAN_KIND_INTERNAL,
+                 attributes: Optional[dict] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+        self.status = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)
+
+    def finish(self):
+        self.end = time.time_ns()
+        tracer.export(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status is not None:
+            span["status"] = {"code": self.status}
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def otlp_payload(spans: List[Span]) -> dict:
+    """OTLP/JSON ExportTraceServiceRequest, as sent to a collector's /v1/traces"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_otlp_attribute("service.name", settings.TRACE_SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": "school_api"}, "spans": [span.to_otlp() for span in spans]}],
+    }]}
+
+
+class BatchExporter(ABC):
+    """Sends finished spans in batches from a background thread; subclasses say where to"""
+
+    def __init__(self, interval: float = 1.0, max_batch: int = 512):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def _drain(self):
+        spans = []
+        while len(spans) < self.max_batch:
+            try:
+                spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return spans
+
+    def flush(self):
+        while True:
+            spans = self._drain()
+            if not spans:
+                return
+            try:
+                self.write(otlp_payload(spans))
+            except Exception as e:
+                logger.error(f"Could not export {len(spans)} spans: {str(e)}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    @abstractmethod
+    def write(self, payload: dict):
+        """Deliver one OTLP/JSON payload; an exception drops the batch and is logged"""
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+
+class JsonLinesExporter(BatchExporter):
+    """One OTLP/JSON request per line, the format of the collector's file exporter"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def write(self, payload: dict):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+class OtlpHttpExporter(BatchExporter):
+    """POSTs OTLP/JSON to a collector (e.g. http://localhost:4318/v1/traces)"""
+
+    def __init__(self, endpoint: str, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+
+    def write(self, payload: dict):
+        request = urllib.request.Request(self.endpoint, data=json.dumps(payload).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+class Tracer:
+    """Head-sampled traces; nothing is recorded unless an exporter is configured"""
+
+    def __init__(self):
+        self.exporter: Optional[BatchExporter] = None
+
+    def export(self, span: Span):
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, attributes: Optional[dict] = None
+                    ) -> Optional[Span]:
+        """Root (server) span for a request, or None if the request is not sampled.
+
+        A valid W3C traceparent header continues the caller's trace and keeps its sampling decision.
+        """
+        if self.exporter is None:
+            return None
+        match = TRACEPARENT.match(traceparent or "")
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            if not int(flags, 16) & 1:
+                return None
+        else:
+            if random.random() >= settings.TRACE_SAMPLE_RATE:
+                return None
+            trace_id, parent_id = os.urandom(16).hex(), None
+        return Span(name, trace_id, parent_id, SPAN_KIND_SERVER, attributes)
+
+    def start_span(self, name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[dict] = None
+                   ) -> Optional[Span]:
+        """Child of the current span, or None when the current request is not being traced"""
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Trace the block as a child of the current span (a no-op outside sampled requests)"""
+        span = self.start_span(name, attributes=attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+
+tracer = Tracer()
+
+
+def configure_tracing() -> Optional[BatchExporter]:
+    """Start the exporter selected by TRACE_EXPORTER ("file" or "otlp"), if any"""
+    if settings.TRACE_EXPORTER == "file":
+        tracer.exporter = JsonLinesExporter(settings.TRACE_FILE, interval=settings.TRACE_EXPORT_INTERVAL)
+    elif settings.TRACE_EXPORTER == "otlp":
+        tracer.exporter = OtlpHttpExporter(settings.TRACE_OTLP_ENDPOINT, interval=settings.TRACE_EXPORT_INTERVAL)
+    elif settings.TRACE_EXPORTER:
+        logger.error(f"Unknown TRACE_EXPORTER {settings.TRACE_EXPORTER!r}; tracing is disabled")
+    if tracer.exporter is not None:
+        tracer.exporter.start()
+    return tracer.exporter
+
+
+def shutdown_tracing():
+    if tracer.exporter is not None:
+        tracer.exporter.stop()
+        tracer.exporter = None
+
+
+class TracingMiddleware:
+    """Server span per sampled request, named after the route template; adds X-Trace-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or tracer.exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        span = tracer.start_trace(f"{scope['method']} {scope['path']}", traceparent, {
+            "http.request.method": scope["method"],
+            "url.path": scope["path"],
+        })
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = STATUS_ERROR
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", span.trace_id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        token = _current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = route_template(scope)
+            if route is not None:
+                span.name = f"{scope['method']} {route}"
+                span.set_attribute("http.route", route)
+            span.finish()
+
+
+# SQL statements as client spans of whatever span is current (the handler, or auth)
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    span = tracer.start_span(operation, SPAN_KIND_CLIENT, {
+        "db.system": conn.dialect.name,
+        "db.operation": operation,
+        "db.statement": statement[:MAX_STATEMENT_LENGTH],
+    })
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is None:
+        return
+    span = conn.info["trace_spans"].pop()
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        span.set_attribute("db.rows_affected", cursor.rowcount)
+    span.finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_query_span(exception_context):
+    conn = exception_context.connection
+    if _current_span.get() is None or conn is None or not conn.info.get("trace_spans"):
+        return
+    span = conn.info["trace_spans"].pop()
+    span.record_error(exception_context.original_exception)
+    span.finish()
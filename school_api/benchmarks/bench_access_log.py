@@ -0,0 +1,95 @@
+"""
+Requests/second with the old BaseHTTPMiddleware request logger vs. AccessLogMiddleware.
+
+Both apps serve the same trivial route and log to /dev/null, so the numbers
+show only middleware and logging overhead. "before" is the former
+RequestLoggingMiddleware from main.py (two INFO lines plus the header dict,
+formatted on the request path); "after" queues one structured record that a
+background thread formats. Usage (from school_api/):
+
+    python benchmarks/bench_access_log.py [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.access_log import AccessLogMiddleware, configure_access_log
+
+old_logger = logging.getLogger("bench.request_logging")
+
+
+class RequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        path = request.url.path
+        method = request.method
+        old_logger.info(f"Request started: {method} {path}")
+        old_logger.info(f"Request headers: {dict(request.headers)}")
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        old_logger.info(f"Request completed: {method} {path} - Status: {response.status_code} - Time: {process_time:.3f}s")
+        return response
+
+
+def build_app(middleware):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(middleware)
+    return app
+
+
+async def measure(app, total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer " + "x" * 200, "User-Agent": "bench", "Accept": "application/json"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                (await client.get("/ping", headers=headers)).raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    old_handler = logging.StreamHandler(devnull)
+    old_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    old_logger.addHandler(old_handler)
+    old_logger.setLevel(logging.INFO)
+    old_logger.propagate = False
+    listener = configure_access_log(devnull)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    for mode, middleware in (("before", RequestLoggingMiddleware), ("after", AccessLogMiddleware)):
+        app = build_app(middleware)
+        asyncio.run(measure(app, 500, args.concurrency))  # warm up
+        rps = asyncio.run(measure(app, args.requests, args.concurrency))
+        print(f"{mode:>6}: {rps:8.0f} requests/s")
+    listener.stop()
+
+
+if __name__ == "__main__":
+    main()
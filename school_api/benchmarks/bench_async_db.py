@@ -0,0 +1,131 @@
+"""
+Event-loop lag under concurrent load: sync Session vs. AsyncSession in async handlers.
+
+Both routes run the same query as /teacher/classes; the sync one calls the
+blocking Session inside ``async def`` like the handlers used to. A ticker task
+measures how late the loop wakes it up while the requests run. Usage (from school_api/):
+
+    python benchmarks/bench_async_db.py [--requests 400] [--concurrency 25]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from app import models
+from app.database import Base, SessionLocal, dispose_async_engines, engine, get_async_db, get_db
+
+TEACHERS = 20
+CLASSES_PER_TEACHER = 6
+STUDENTS_PER_CLASS = 30
+
+app = FastAPI()
+
+
+def classes_query(teacher_id):
+    return select(models.Class).filter(
+        models.Class.teacher_id == teacher_id,
+        models.Class.status == "active"
+    ).options(selectinload(models.Class.enrolled_students))
+
+
+@app.get("/sync/{teacher_id}")
+async def sync_classes(teacher_id: int, db: Session = Depends(get_db)):
+    classes = db.execute(classes_query(teacher_id)).scalars().all()
+    return [{"id": c.id, "students": len(c.enrolled_students)} for c in classes]
+
+
+@app.get("/async/{teacher_id}")
+async def async_classes(teacher_id: int, db=Depends(get_async_db)):
+    classes = (await db.execute(classes_query(teacher_id))).scalars().all()
+    return [{"id": c.id, "students": len(c.enrolled_students)} for c in classes]
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    teacher_ids = []
+    for t in range(TEACHERS):
+        teacher = models.User(email=f"t{t}@bench.local", full_name=f"Teacher {t}", role="teacher")
+        db.add(teacher)
+        db.flush()
+        teacher_ids.append(teacher.id)
+        for c in range(CLASSES_PER_TEACHER):
+            class_ = models.Class(name=f"T{t} C{c}", teacher_id=teacher.id, capacity=40, status="active")
+            db.add(class_)
+            db.flush()
+            db.add_all([models.ClassEnrollment(student_id=s + 1, class_id=class_.id, status="active")
+                        for s in range(STUDENTS_PER_CLASS)])
+    db.commit()
+    db.close()
+    return teacher_ids
+
+
+async def measure(prefix, teacher_ids, total, concurrency):
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        interval = 0.001
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with semaphore:
+                response = await client.get(f"/{prefix}/{teacher_ids[i % len(teacher_ids)]}")
+                response.raise_for_status()
+
+        await one(0)  # warm up the pools
+        tick = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await tick
+    await dispose_async_engines()
+
+    lags.sort()
+    return {
+        "rps": total / elapsed,
+        "lag_mean_ms": statistics.mean(lags) * 1000,
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=25,
+                        help="keep below DB_POOL_SIZE + DB_MAX_OVERFLOW: the sync variant blocks the loop "
+                             "while waiting for a pooled connection and can deadlock past that")
+    args = parser.parse_args()
+
+    teacher_ids = seed()
+    for prefix in ("sync", "async"):
+        result = asyncio.run(measure(prefix, teacher_ids, args.requests, args.concurrency))
+        print(f"{prefix:>6}: {result['rps']:7.1f} req/s  loop lag mean {result['lag_mean_ms']:6.2f} ms  "
+              f"p99 {result['lag_p99_ms']:6.2f} ms  max {result['lag_max_ms']:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Per-request authentication overhead: email-only tokens vs. uid/role/ver claims.
+
+"before" reproduces the old get_current_student: decode the token, SELECT the
+user by email and check its role. "after" is the current guard, which authorizes
+from the token claims and the principal cache. Both routes return the caller's
+id so the handler itself costs nothing. Usage (from school_api/):
+
+    python benchmarks/bench_auth.py [--requests 3000] [--users 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from jose import jwt
+from sqlalchemy.orm import Session
+
+from app import models
+from app.auth import get_current_student
+from app.config import settings
+from app.database import Base, SessionLocal, engine, get_db
+from app.dependencies import oauth2_scheme
+from app.instrumentation import QueryStatsMiddleware
+from app.routers.auth import create_access_token, token_claims
+
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware)
+
+
+async def legacy_current_student(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    user = db.query(models.User).filter(models.User.email == payload.get("sub")).first()
+    if user is None or user.role != "student":
+        raise HTTPException(status_code=403)
+    return user
+
+
+@app.get("/before")
+async def before(current_student=Depends(legacy_current_student)):
+    return {"id": current_student.id}
+
+
+@app.get("/after")
+async def after(current_student=Depends(get_current_student)):
+    return {"id": current_student.id}
+
+
+def seed(users):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    students = [models.User(email=f"s{i}@bench.local", full_name=f"Student {i}", role="student",
+                            hashed_password="x") for i in range(users)]
+    db.add_all(students)
+    db.commit()
+    tokens = {
+        "before": [create_access_token({"sub": s.email}) for s in students],
+        "after": [create_access_token(token_claims(s)) for s in students],
+    }
+    db.close()
+    return tokens
+
+
+async def measure(path, tokens, total):
+    timings = []
+    queries = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(total):
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            timings.append(time.perf_counter() - started)
+            response.raise_for_status()
+            queries += int(response.headers["x-db-queries"])
+    timings.sort()
+    return {
+        "mean_us": statistics.mean(timings) * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99) - 1] * 1e6,
+        "queries_per_request": queries / total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    tokens = seed(args.users)
+    for mode in ("before", "after"):
+        asyncio.run(measure(f"/{mode}", tokens[mode], min(200, args.requests)))  # warm up
+        result = asyncio.run(measure(f"/{mode}", tokens[mode], args.requests))
+        print(f"{mode:>6}: mean {result['mean_us']:7.0f} us  p99 {result['p99_us']:7.0f} us  "
+              f"SQL/request {result['queries_per_request']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Full response vs. 304 Not Modified for the conditional GET endpoints.
+
+"full" sends no If-None-Match, so the handler loads its rows and renders the
+JSON. "304" revalidates with the ETag of the previous response: only the
+cache_stamps lookup runs. Requests go through the whole app (middleware, auth,
+routing) over an in-process ASGI transport. Usage (from school_api/):
+
+    python benchmarks/bench_etag.py [--students 2000] [--requests 300]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+import httpx
+
+from app import models
+from app.database import Base, SessionLocal, dispose_async_engines, engine
+from app.main import app
+from app.routers.auth import create_access_token, token_claims
+
+
+def seed(students):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        admin = models.User(email="admin@bench.com", full_name="Admin", role="admin", hashed_password="x")
+        teacher = models.User(email="teacher@bench.com", full_name="Teacher", role="teacher", hashed_password="x")
+        users = [
+            models.User(email=f"student{i}@bench.com", full_name=f"Student {i}", role="student",
+                        hashed_password="x", grade="10", section="A")
+            for i in range(students)
+        ]
+        db.add_all([admin, teacher] + users)
+        db.flush()
+        classes = [
+            models.Class(name=f"Class {i}", grade="10", section="A", subject="Math", teacher_id=teacher.id,
+                         capacity=students, schedule="Mon, Wed 09:00-10:30", room=str(i))
+            for i in range(8)
+        ]
+        db.add_all(classes)
+        db.flush()
+        for cls in classes:
+            db.add(models.Assignment(title="Homework", class_id=cls.id, teacher_id=teacher.id,
+                                     due_date=date.today(), max_score=100, status="Active"))
+            for user in users:
+                db.add(models.ClassEnrollment(student_id=user.id, class_id=cls.id, status="active"))
+        db.commit()
+        return {role: {"Authorization": f"Bearer {create_access_token(token_claims(user))}"}
+                for role, user in (("admin", admin), ("teacher", teacher), ("student", users[0]))}
+    finally:
+        db.close()
+
+
+async def measure(client, path, headers, total):
+    etag = (await client.get(path, headers=headers)).headers["etag"]
+    results = {}
+    for mode, extra in (("full", {}), ("304", {"If-None-Match": etag})):
+        timings = []
+        queries = 0
+        for _ in range(total):
+            started = time.perf_counter()
+            response = await client.get(path, headers={**headers, **extra})
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == (200 if mode == "full" else 304), response.status_code
+            queries += int(response.headers["x-db-queries"])
+        results[mode] = (statistics.median(timings) * 1000, queries / total, len(response.content))
+    return results
+
+
+async def run(args):
+    headers = seed(args.students)
+    cases = (
+        ("/teacher/classes", headers["teacher"]),
+        ("/student/schedule", headers["student"]),
+        ("/student/classes", headers["student"]),
+        ("/admin/stats", headers["admin"]),
+        ("/public/users", {}),
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path, path_headers in cases:
+            results = await measure(client, path, path_headers, args.requests)
+            (full_ms, full_sql, full_size), (hit_ms, hit_sql, _) = results["full"], results["304"]
+            print(f"{path:>18}: full {full_ms:7.2f} ms ({full_sql:.0f} SQL, {full_size} bytes), "
+                  f"304 {hit_ms:7.2f} ms ({hit_sql:.0f} SQL), {full_ms / hit_ms:.1f}x")
+    await dispose_async_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Login storm: bcrypt on the event loop vs. on the bounded password pool.
+
+Fires a burst of concurrent logins while a probe keeps requesting /health and
+records how long each probe takes. "before" verifies the password inline in an
+``async def`` like login_for_access_token used to; "after" is the real
+/auth/token route. Usage (from school_api/):
+
+    python benchmarks/bench_login_storm.py [--logins 64] [--concurrency 16]
+
+Keep --concurrency below the DB pool size (DB_POOL_SIZE + DB_MAX_OVERFLOW): the
+"before" route holds a connection while it blocks the loop.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+import httpx
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+
+from app import models
+from app.auth import password_pool, verify_password
+from app.database import SessionLocal, get_db
+from app.main import app
+from app.routers.auth import get_password_hash, get_user
+
+
+@app.post("/bench/before/token")
+async def inline_login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = get_user(db, form_data.username)
+    if not user or not verify_password(form_data.password, user.hashed_password):
+        raise HTTPException(status_code=401)
+    return {"ok": True}
+
+
+def seed(users):
+    db = SessionLocal()
+    hashed = get_password_hash("storm123")
+    db.add_all([models.User(email=f"s{i}@bench.local", full_name=f"Student {i}", role="student",
+                            hashed_password=hashed) for i in range(users)])
+    db.commit()
+    db.close()
+
+
+async def storm(path, logins, concurrency):
+    probes = []
+    statuses = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        done = asyncio.Event()
+
+        async def login(i):
+            async with semaphore:
+                response = await client.post(path, data={"username": f"s{i}@bench.local", "password": "storm123"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                probes.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    probes.sort()
+    return {
+        "elapsed": elapsed,
+        "statuses": statuses,
+        "probe_ms_p50": statistics.median(probes) * 1000,
+        "probe_ms_max": probes[-1] * 1000,
+        "probes": len(probes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    seed(args.logins)
+    for mode, path in (("before", "/bench/before/token"), ("after", "/auth/token")):
+        result = asyncio.run(storm(path, args.logins, args.concurrency))
+        print(f"{mode:>6}: {args.logins} logins in {result['elapsed']:.2f}s {result['statuses']}  "
+              f"/health p50 {result['probe_ms_p50']:.1f} ms, max {result['probe_ms_max']:.1f} ms "
+              f"({result['probes']} probes)")
+    print(f"password pool: {password_pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Fetch + encode time for /admin/users and /teacher/classes/{id}/grades, before and after orjson rows.
+
+"before" is the former code path: ORM objects validated against the response
+model and rendered with the stdlib json encoder (/admin/users), and a dict
+per student built field by field with .isoformat() calls from three queries
+(grades). "after" calls the current handlers, which select labelled columns
+and encode the rows with orjson. Usage (from school_api/):
+
+    python benchmarks/bench_serialization.py [--students 2000] [--rounds 20]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import List
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app import models, schemas
+from app.database import AsyncSessionLocal, Base, SessionLocal, dispose_async_engines, engine
+from app.routers import admin, teacher
+
+
+def seed(students):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        owner = models.User(email="teacher@bench.com", full_name="Teacher", role="teacher", hashed_password="x")
+        users = [
+            models.User(email=f"student{i}@bench.com", full_name=f"Student {i}", role="student",
+                        hashed_password="x", grade="10", section="A", contact="555-0100")
+            for i in range(students)
+        ]
+        db.add_all([owner] + users)
+        db.flush()
+        cls = models.Class(name="Math", grade="10", section="A", subject="Math", teacher_id=owner.id, capacity=students)
+        db.add(cls)
+        db.flush()
+        assignment = models.Assignment(title="Homework", class_id=cls.id, teacher_id=owner.id,
+                                       due_date=date.today(), max_score=100, status="Active")
+        db.add(assignment)
+        db.flush()
+        for user in users:
+            db.add(models.ClassEnrollment(student_id=user.id, class_id=cls.id, status="active"))
+            db.add(models.AssignmentSubmission(assignment_id=assignment.id, student_id=user.id,
+                                               status="submitted", submission_date=datetime.now()))
+            db.add(models.Grade(student_id=user.id, class_id=cls.id, assignment_id=assignment.id, score=80,
+                                created_at=datetime.now(), updated_at=datetime.now()))
+        db.commit()
+        return owner.id, cls.id, assignment.id
+    finally:
+        db.close()
+
+
+users_adapter = TypeAdapter(List[schemas.User])
+
+
+async def users_before(db):
+    users = (await db.execute(select(models.User))).scalars().all()
+    # What FastAPI does for response_model=List[schemas.User] with the default JSONResponse
+    validated = users_adapter.validate_python(users, from_attributes=True)
+    return JSONResponse(users_adapter.dump_python(validated, mode="json")).body
+
+
+async def users_after(db):
+    return (await admin.get_users(current_admin=None, db=db)).body
+
+
+async def grades_before(db, class_id, assignment_id):
+    students = (await db.execute(
+        select(models.User).join(models.ClassEnrollment, models.User.id == models.ClassEnrollment.student_id)
+        .filter(models.ClassEnrollment.class_id == class_id, models.ClassEnrollment.status == "active")
+    )).scalars().all()
+    grades = {g.student_id: g for g in (await db.execute(select(models.Grade).filter(
+        models.Grade.class_id == class_id, models.Grade.assignment_id == assignment_id))).scalars().all()}
+    submissions = {s.student_id: s for s in (await db.execute(select(models.AssignmentSubmission).filter(
+        models.AssignmentSubmission.assignment_id == assignment_id))).scalars().all()}
+    formatted = []
+    for student in students:
+        grade = grades.get(student.id)
+        submission = submissions.get(student.id)
+        formatted.append({
+            "id": getattr(grade, 'id', None),
+            "student_id": student.id,
+            "student_name": student.full_name,
+            "class_id": class_id,
+            "assignment_id": assignment_id,
+            "score": getattr(grade, 'score', None),
+            "max_score": getattr(grade, 'max_score', 100.0),
+            "grade_type": getattr(grade, 'grade_type', "assignment"),
+            "weight": getattr(grade, 'weight', 1.0),
+            "feedback": getattr(grade, 'feedback', None),
+            "rubric_data": getattr(grade, 'rubric_data', None),
+            "status": getattr(grade, 'status', "pending"),
+            "submission_status": getattr(submission, 'status', "not_submitted"),
+            "submission_date": submission.submission_date.isoformat() if submission and submission.submission_date else None,
+            "graded_date": None,
+            "created_at": grade.created_at.isoformat() if grade and grade.created_at else None,
+            "updated_at": grade.updated_at.isoformat() if grade and grade.updated_at else None,
+        })
+    return JSONResponse(formatted).body
+
+
+class Teacher:
+    def __init__(self, id):
+        self.id = id
+
+
+async def grades_after(db, class_id, assignment_id, teacher_id):
+    response = await teacher.get_class_grades(class_id, assignment_id, current_teacher=Teacher(teacher_id), db=db)
+    return response.body
+
+
+async def measure(fn, rounds, *args):
+    timings = []
+    body = b""
+    for _ in range(rounds + 1):  # the first round warms up caches and is dropped
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            body = await fn(db, *args)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings[1:]) * 1000, len(body)
+
+
+async def run(args):
+    teacher_id, class_id, assignment_id = seed(args.students)
+    cases = (
+        ("/admin/users", (users_before, ()), (users_after, ())),
+        ("/teacher/classes/{id}/grades", (grades_before, (class_id, assignment_id)),
+         (grades_after, (class_id, assignment_id, teacher_id))),
+    )
+    for name, (before, before_args), (after, after_args) in cases:
+        before_ms, before_size = await measure(before, args.rounds, *before_args)
+        after_ms, after_size = await measure(after, args.rounds, *after_args)
+        print(f"{name}: before {before_ms:8.1f} ms ({before_size} bytes), "
+              f"after {after_ms:8.1f} ms ({after_size} bytes), {before_ms / after_ms:.1f}x")
+    await dispose_async_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Mixed read/write throughput on SQLite: default settings vs. the production profile.
+
+Readers run the student attendance query while writers insert attendance rows,
+mirroring GET traffic during mark_class_attendance. Usage (from school_api/):
+
+    python benchmarks/bench_sqlite_profile.py [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.config import settings
+from app.database import Base, create_db_engine, create_read_engine
+
+STUDENTS = 200
+CLASSES = 20
+
+
+def seed(engine):
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    teacher = models.User(email="teacher@bench.local", full_name="Teacher", role="teacher")
+    db.add(teacher)
+    db.flush()
+    classes = [models.Class(name=f"Class {i}", teacher_id=teacher.id, capacity=40) for i in range(CLASSES)]
+    students = [models.User(email=f"s{i}@bench.local", full_name=f"Student {i}", role="student") for i in range(STUDENTS)]
+    db.add_all(classes + students)
+    db.flush()
+    start = date.today() - timedelta(days=60)
+    db.add_all([
+        models.Attendance(student_id=s.id, class_id=random.choice(classes).id,
+                          date=start + timedelta(days=d), status="present")
+        for s in students for d in range(25)
+    ])
+    db.commit()
+    ids = [s.id for s in students], [c.id for c in classes]
+    db.close()
+    return ids
+
+
+def run(profile: bool, seconds: float, readers: int, writers: int):
+    settings.SQLITE_PRODUCTION_MODE = profile
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    write_engine = create_db_engine(url)
+    read_engine = create_read_engine(write_engine) if profile else write_engine
+    student_ids, class_ids = seed(write_engine)
+    WriteSession = sessionmaker(bind=write_engine)
+    ReadSession = sessionmaker(bind=read_engine)
+
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        done = 0
+        while time.perf_counter() < deadline:
+            db = ReadSession()
+            try:
+                db.query(models.Attendance).filter(
+                    models.Attendance.student_id == random.choice(student_ids)
+                ).order_by(models.Attendance.date.desc()).all()
+                done += 1
+            except OperationalError:
+                with lock:
+                    counts["locked"] += 1
+            finally:
+                db.close()
+        with lock:
+            counts["reads"] += done
+
+    def writer():
+        done = 0
+        while time.perf_counter() < deadline:
+            db = WriteSession()
+            try:
+                db.add(models.Attendance(student_id=random.choice(student_ids),
+                                         class_id=random.choice(class_ids),
+                                         date=date.today(), status="present"))
+                db.commit()
+                done += 1
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    counts["locked"] += 1
+            finally:
+                db.close()
+        with lock:
+            counts["writes"] += done
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    write_engine.dispose()
+    read_engine.dispose()
+    return {k: v / seconds if k != "locked" else v for k, v in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    for label, profile in (("default", False), ("production", True)):
+        result = run(profile, args.seconds, args.readers, args.writers)
+        print(f"{label:>10}: {result['reads']:8.1f} reads/s  {result['writes']:7.1f} writes/s  "
+              f"{result['locked']:5d} 'database is locked' errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+JSON vs. NDJSON (Accept: application/x-ndjson) for the large list endpoints.
+
+Each request is sent straight to the ASGI app, recording the time to the first
+body chunk, the total time and the peak memory allocated while it ran
+(tracemalloc). A JSON list is built and rendered whole before its first byte;
+NDJSON is fetched STREAM_YIELD_PER rows at a time and written as it goes, so
+its first byte and peak memory should not grow with the table. Usage (from
+school_api/):
+
+    python benchmarks/bench_streaming.py [--users 50000] [--requests 5]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.append(SCHOOL_API_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from app import models
+from app.database import Base, SessionLocal, dispose_async_engines, engine
+from app.main import app
+from app.routers.auth import create_access_token, token_claims
+
+
+def seed(users):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        admin = models.User(email="admin@bench.com", full_name="Admin", role="admin", hashed_password="x")
+        db.add(admin)
+        db.flush()
+        db.execute(models.User.__table__.insert(), [
+            {"email": f"student{i}@bench.com", "full_name": f"Student {i}", "role": "student",
+             "hashed_password": "x", "grade": "10", "section": "A", "is_active": True}
+            for i in range(users)
+        ])
+        db.commit()
+        return {"Authorization": f"Bearer {create_access_token(token_claims(admin))}"}
+    finally:
+        db.close()
+
+
+async def request(path, headers):
+    """(seconds to the first body chunk, total seconds, body bytes) of one GET"""
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+             "http_version": "1.1", "scheme": "http", "server": ("bench", 80), "client": ("bench", 1),
+             "root_path": ""}
+    first_byte = None
+    size = 0
+    status = None
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_byte, size, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            size += len(message["body"])
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    finished = time.perf_counter()
+    disconnected.set()
+    assert status == 200, status
+    return first_byte - started, finished - started, size
+
+
+async def measure(path, headers, total):
+    ttfb, elapsed, peaks = [], [], []
+    for _ in range(total):
+        tracemalloc.start()
+        first, whole, size = await request(path, headers)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        ttfb.append(first)
+        elapsed.append(whole)
+    return statistics.median(ttfb) * 1000, statistics.median(elapsed) * 1000, max(peaks) / 2**20, size
+
+
+async def run(args):
+    admin = seed(args.users)
+    for path, headers in (("/admin/users", admin), ("/public/users", {})):
+        for mode, accept in (("json", "application/json"), ("ndjson", "application/x-ndjson")):
+            first, whole, peak, size = await measure(path, {**headers, "Accept": accept}, args.requests)
+            print(f"{path:>13} {mode:>6}: first byte {first:8.1f} ms, total {whole:8.1f} ms, "
+                  f"peak {peak:6.1f} MiB, {size} bytes")
+    await dispose_async_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Run the pytest-based tests against a throwaway SQLite database, never school.db
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent)
+sys.path.append(SCHOOL_API_DIR)
+
+TEST_DB_DIR = tempfile.mkdtemp(prefix="school_api_test_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TEST_DB_DIR, 'test.db')}")
+os.environ.setdefault("PROFILE_DIR", os.path.join(TEST_DB_DIR, "profiles"))
+
+import pytest
+from datetime import date
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient for the app, bound to the throwaway database"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def seed(client):
+    """An admin, a teacher with three classes, five enrolled students and some coursework"""
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        admin = models.User(email="admin@test.com", full_name="Admin", role="admin", hashed_password="x")
+        teacher = models.User(email="teacher@test.com", full_name="Teacher", role="teacher",
+                              hashed_password="x", subject="Math")
+        students = [
+            models.User(email=f"student{i}@test.com", full_name=f"Student {i}", role="student",
+                        hashed_password="x", grade="10", section="A")
+            for i in range(5)
+        ]
+        db.add_all([admin, teacher] + students)
+        db.flush()
+        classes = [
+            models.Class(name=f"Math {i}", grade="10", section="A", subject="Math", teacher_id=teacher.id,
+                         capacity=30, schedule="Mon, Wed 09:00-10:30", room=str(i))
+            for i in range(3)
+        ]
+        db.add_all(classes)
+        db.flush()
+        for cls in classes:
+            for student in students:
+                db.add(models.ClassEnrollment(student_id=student.id, class_id=cls.id, status="active"))
+        assignment = models.Assignment(title="Homework", description="Chapter 1", class_id=classes[0].id,
+                                       teacher_id=teacher.id, due_date=date.today(), max_score=100,
+                                       status="Active")
+        db.add(assignment)
+        db.flush()
+        db.add(models.Grade(student_id=students[0].id, class_id=classes[0].id,
+                            assignment_id=assignment.id, score=90))
+        db.add(models.Attendance(student_id=students[0].id, class_id=classes[0].id,
+                                 date=date.today(), status="present"))
+        db.commit()
+        return {
+            "admin": admin.email,
+            "teacher": teacher.email,
+            "student": students[0].email,
+            "class_id": classes[0].id,
+            "assignment_id": assignment.id,
+        }
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def auth_headers(seed):
+    """Returns Authorization headers for one of the seeded users ("admin", "teacher", "student")"""
+    from app.routers.auth import create_access_token
+
+    def headers_for(role):
+        return {"Authorization": f"Bearer {create_access_token({'sub': seed[role]})}"}
+
+    return headers_for
+
+
+@pytest.fixture
+def make_user(client):
+    """Returns a function adding a user with a bcrypt-hashed password and returning its id"""
+    from app import models
+    from app.database import SessionLocal
+    from app.routers.auth import get_password_hash
+
+    def create(email, role="student", password="secret"):
+        db = SessionLocal()
+        try:
+            user = models.User(email=email, full_name=email.split("@")[0], role=role,
+                               hashed_password=get_password_hash(password))
+            db.add(user)
+            db.commit()
+            return user.id
+        finally:
+            db.close()
+
+    return create
+
+
+@pytest.fixture
+def make_class(seed):
+    """Returns a function adding a class with its own enrolled students; all removed afterwards.
+
+    make_class(teacher=None, students=0, dropped=0) puts the class under the seeded teacher
+    (teacher="seed"), another teacher's email, or a new teacher (None); the first `dropped`
+    of its new students have dropped it. Returns the ids: class_id, teacher_id, student_ids.
+    """
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    created = []
+
+    def create(teacher="seed", students=0, dropped=0):
+        if teacher is None:
+            owner = models.User(email=f"teacher{len(created)}.extra@test.com", full_name="Extra Teacher",
+                                role="teacher", hashed_password="x")
+            db.add(owner)
+            db.flush()
+            created.append(owner)
+        else:
+            email = seed["teacher"] if teacher == "seed" else teacher
+            owner = db.query(models.User).filter(models.User.email == email).one()
+        class_ = models.Class(name=f"Extra class {len(created)}", grade="11", section="B", subject="Physics",
+                              teacher_id=owner.id, capacity=max(40, students), schedule="Fri 09:00-10:30",
+                              room="Hall")
+        new_students = [models.User(email=f"extra{len(created)}.{i}@test.com", full_name=f"Extra {i}",
+                                    role="student", hashed_password="x")
+                        for i in range(students)]
+        db.add_all([class_] + new_students)
+        db.flush()
+        enrollments = [models.ClassEnrollment(student_id=student.id, class_id=class_.id,
+                                              status="dropped" if i < dropped else "active")
+                       for i, student in enumerate(new_students)]
+        db.add_all(enrollments)
+        db.commit()
+        created.extend([class_] + new_students + enrollments)
+        return {"class_id": class_.id, "teacher_id": owner.id, "student_ids": [s.id for s in new_students]}
+
+    yield create
+    for row in reversed(created):
+        db.delete(row)
+        db.flush()
+    db.commit()
+    db.close()
@@ -0,0 +1,39 @@
+"""
+Build step: write .br and .gz variants of the frontend assets next to them.
+
+PrecompressedStaticFiles serves these instead of compressing html/js, css and
+images on every request. Re-run after changing the assets. Usage (from school_api/):
+
+    python precompress_assets.py [--directory ../html]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+SCHOOL_API_DIR = str(Path(__file__).resolve().parent)
+sys.path.append(SCHOOL_API_DIR)
+
+from app.compression import precompress_directory
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--directory", default=settings.STATIC_DIR)
+    args = parser.parse_args()
+
+    results = precompress_directory(args.directory)
+    original = compressed = 0
+    for path, variants in results.items():
+        size = os.path.getsize(path)
+        best = min([os.path.getsize(v) for v in variants], default=size)
+        original += size
+        compressed += best
+        kept = ", ".join(os.path.splitext(v)[1] for v in variants) or "none (too little saving)"
+        print(f"{os.path.relpath(path, args.directory)}: {size} -> {best} bytes, variants: {kept}")
+    print(f"{len(results)} files: {original} -> {compressed} bytes")
+
+
+if __name__ == "__main__":
+    main()
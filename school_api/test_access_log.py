@@ -0,0 +1,45 @@
+import io
+import json
+
+import pytest
+
+from app.access_log import configure_access_log
+
+
+@pytest.fixture
+def access_records(client):
+    stream = io.StringIO()
+    listener = configure_access_log(stream)
+
+    def records():
+        listener.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield records
+    configure_access_log()
+
+
+def test_structured_record_per_request(client, access_records):
+    client.get("/public/users")
+    [record] = access_records()
+    assert record["method"] == "GET"
+    assert record["route"] == "/public/users"
+    assert record["status"] == 200
+    assert record["db_queries"] == 2  # cache_stamps lookup and the users
+    assert "authorization" not in json.dumps(record).lower()
+
+
+def test_route_template_and_route_levels(client, auth_headers, seed, access_records):
+    client.get("/health")
+    client.get(f"/teacher/classes/{seed['class_id']}/students", headers=auth_headers("teacher"))
+    records = access_records()
+    # /health is configured at DEBUG, below the access log level
+    assert [r["route"] for r in records] == ["/teacher/classes/{class_id}/students"]
+
+
+def test_sampling_keeps_errors(client, access_records, monkeypatch):
+    monkeypatch.setattr("app.config.settings.ACCESS_LOG_SAMPLE_RATE", 0.0)
+    client.get("/public/users")
+    client.get("/student/classes")
+    records = access_records()
+    assert [r["status"] for r in records] == [401]
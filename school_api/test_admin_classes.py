@@ -0,0 +1,46 @@
+import pytest
+
+from app.instrumentation import assert_query_budget
+
+
+@pytest.fixture
+def big_class(make_class):
+    """A fourth class with 30 students, one of whom dropped it"""
+    return make_class(students=30, dropped=1)
+
+
+def test_class_endpoints_run_a_fixed_number_of_queries(client, auth_headers, seed, big_class):
+    admin = auth_headers("admin")
+    client.get("/admin/classes", headers=admin)  # warm the principal cache
+
+    classes = client.get("/admin/classes", headers=admin)
+    assert len(classes.json()) == 4
+    # classes, active students of the page, teachers
+    assert_query_budget(classes, 3)
+
+    big = client.get(f"/admin/classes/{big_class['class_id']}", headers=admin)
+    small = client.get(f"/admin/classes/{seed['class_id']}", headers=admin)
+    assert big.headers["x-db-queries"] == small.headers["x-db-queries"]
+    assert_query_budget(big, 3)
+
+    # Only active enrollments are listed and counted
+    assert big.json()["current_students"] == 29 == len(big.json()["enrolled_students"])
+    assert big_class["student_ids"][0] not in {student["id"] for student in big.json()["enrolled_students"]}
+
+
+def test_include_students_false_returns_counts_only(client, auth_headers, seed, big_class):
+    admin = auth_headers("admin")
+    full = client.get("/admin/classes", headers=admin).json()
+    counts = client.get("/admin/classes", params={"include_students": "false"}, headers=admin)
+    assert_query_budget(counts, 2)
+    assert [c["current_students"] for c in counts.json()] == [len(c["enrolled_students"]) for c in full]
+    assert all("enrolled_students" not in c and c["teacher"]["email"] == seed["teacher"] for c in counts.json())
+
+    one = client.get(f"/admin/classes/{big_class['class_id']}", params={"include_students": "false"},
+                     headers=admin)
+    assert one.json()["current_students"] == 29
+    assert one.json()["enrolled_students"] is None
+    assert_query_budget(one, 2)
+
+    assert client.get("/admin/classes/999999", params={"include_students": "false"},
+                      headers=admin).status_code == 404
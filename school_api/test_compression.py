@@ -0,0 +1,110 @@
+import asyncio
+import gzip
+import os
+import zlib
+
+import brotli
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.compression import CompressionMiddleware, PrecompressedStaticFiles, accepted_encoding, precompress_directory
+
+
+def test_accepted_encoding_prefers_brotli():
+    assert accepted_encoding("gzip, deflate, br") == "br"
+    assert accepted_encoding("gzip, br;q=0") == "gzip"
+    assert accepted_encoding("*") == "br"
+    assert accepted_encoding("identity") is None
+    assert accepted_encoding(None) is None
+
+
+def test_json_is_compressed_as_negotiated(client, seed, monkeypatch):
+    # The conftest seed makes small bodies
+    monkeypatch.setattr("app.config.settings.COMPRESSION_MIN_SIZE", 1)
+    plain = client.get("/public/users", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    for encoding in ("gzip", "br"):
+        response = client.get("/public/users", headers={"Accept-Encoding": encoding})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < len(plain.content)
+        assert response.json() == plain.json()
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_chunks_are_flushed():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((b'{"row": %d}\n' % i * 50 for i in range(3)), media_type="application/x-ndjson")
+
+    messages = []
+
+    async def receive():
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream", "query_string": b"",
+             "headers": [(b"accept-encoding", b"gzip")], "http_version": "1.1", "scheme": "http",
+             "server": ("test", 80), "client": ("test", 1), "root_path": "", "app": app}
+    asyncio.run(app(scope, receive, send))
+
+    start = messages[0]
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert not any(name == b"content-length" for name, _ in start["headers"])
+    decoder = zlib.decompressobj(31)
+    chunks = [decoder.decompress(m["body"]) for m in messages[1:] if m["body"]]
+    # Every row arrives decodable as soon as it is sent
+    assert chunks[:3] == [b'{"row": %d}\n' % i * 50 for i in range(3)]
+
+
+def test_precompressed_static_files(tmp_path):
+    script = tmp_path / "app.js"
+    script.write_text("function greet() { return 'hello'; }\n" * 200)
+    photo = tmp_path / "photo.jpeg"
+    photo.write_bytes(os.urandom(4096))
+
+    results = precompress_directory(str(tmp_path), extensions=(".js", ".jpeg"))
+    assert sorted(os.path.basename(v) for v in results[str(script)]) == ["app.js.br", "app.js.gz"]
+    assert results[str(photo)] == []  # random bytes, like a JPEG, do not compress
+
+    app = Starlette(routes=[Mount("/ui", PrecompressedStaticFiles(directory=str(tmp_path)))])
+
+    async def fetch(path, encoding):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers={"Accept-Encoding": encoding})
+
+    br = asyncio.run(fetch("/ui/app.js", "br"))
+    assert br.headers["content-encoding"] == "br"
+    assert br.headers["content-type"].startswith(("text/javascript", "application/javascript"))
+    assert int(br.headers["content-length"]) == os.path.getsize(f"{script}.br")
+    assert br.text == script.read_text()
+
+    gz = asyncio.run(fetch("/ui/app.js", "gzip"))
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(open(f"{script}.gz", "rb").read()) == script.read_bytes()
+
+    plain = asyncio.run(fetch("/ui/app.js", "identity"))
+    assert "content-encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["vary"]
+
+    # An asset edited after the build step is served as is, not from the stale variant
+    stat = os.stat(f"{script}.br")
+    os.utime(script, (stat.st_atime, stat.st_mtime + 10))
+    stale = asyncio.run(fetch("/ui/app.js", "br"))
+    assert "content-encoding" not in stale.headers
+    assert brotli.decompress(open(f"{script}.br", "rb").read()) == script.read_bytes()
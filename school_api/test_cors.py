@@ -0,0 +1,38 @@
+from app.instrumentation import recent_requests
+
+ORIGIN = "http://127.0.0.1:5500"
+
+
+def test_preflight_is_answered_before_the_app(client):
+    before = len(recent_requests)
+    response = client.options("/teacher/classes", headers={
+        "Origin": ORIGIN,
+        "Access-Control-Request-Method": "GET",
+        "Access-Control-Request-Headers": "authorization",
+    })
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+    assert response.headers["access-control-max-age"] == "86400"
+    assert "authorization" in response.headers["access-control-allow-headers"].lower()
+    assert "x-db-queries" not in response.headers
+    assert len(recent_requests) == before
+
+
+def test_unknown_origin_is_refused(client):
+    response = client.options("/teacher/classes", headers={
+        "Origin": "https://evil.example", "Access-Control-Request-Method": "GET"})
+    assert response.status_code == 400
+    assert "access-control-allow-origin" not in response.headers
+
+
+def test_responses_carry_one_set_of_cors_headers(client, auth_headers):
+    response = client.get("/student/assignments", headers={**auth_headers("student"), "Origin": ORIGIN})
+    assert response.status_code == 200
+    assert response.headers.get_list("access-control-allow-origin") == [ORIGIN]
+    assert "X-DB-Queries" in response.headers["access-control-expose-headers"]
+
+
+def test_no_options_routes_left(client):
+    from app.main import app
+
+    assert not [route.path for route in app.routes if "OPTIONS" in (getattr(route, "methods", None) or ())]
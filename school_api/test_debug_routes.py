@@ -0,0 +1,18 @@
+import pytest
+
+DEBUG_ROUTES = [
+    "/_debug/queries",
+    "/_debug/slow-queries",
+    "/_debug/principal-cache",
+    "/_debug/password-pool",
+    "/_debug/logins",
+    "/_debug/loop-lag",
+]
+
+
+@pytest.mark.parametrize("path", DEBUG_ROUTES)
+def test_debug_route_is_admin_only(client, auth_headers, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=auth_headers("student")).status_code == 403
+    assert client.get(path, headers=auth_headers("teacher")).status_code == 403
+    assert client.get(path, headers=auth_headers("admin")).status_code == 200
@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import update
+
+from app import models
+from app.database import SessionLocal
+from app.etag import etag_matches, table_versions
+
+CONDITIONAL_ENDPOINTS = [
+    ("teacher", "/teacher/classes"),
+    ("student", "/student/schedule"),
+    ("student", "/student/classes"),
+    ("admin", "/admin/stats"),
+    (None, "/public/users"),
+]
+
+
+def set_room(class_id, room):
+    db = SessionLocal()
+    try:
+        db.get(models.Class, class_id).room = room
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("role,path", CONDITIONAL_ENDPOINTS)
+def test_revalidation_answers_not_modified(client, auth_headers, role, path):
+    headers = auth_headers(role) if role else {}
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert "no-cache" in first.headers["cache-control"]
+
+    second = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+
+def test_not_modified_skips_the_row_queries(client):
+    etag = client.get("/public/users").headers["etag"]
+    response = client.get("/public/users", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    # Only the cache_stamps lookup
+    assert response.headers["x-db-queries"] == "1"
+
+
+def test_orm_write_changes_the_etag(client, auth_headers, seed):
+    headers = auth_headers("teacher")
+    etag = client.get("/teacher/classes", headers=headers).headers["etag"]
+
+    set_room(seed["class_id"], "Lab")
+    try:
+        response = client.get("/teacher/classes", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert any(c["room"] == "Lab" for c in response.json())
+    finally:
+        set_room(seed["class_id"], "0")
+
+
+def test_bulk_update_bumps_the_table_counter(seed):
+    db = SessionLocal()
+    try:
+        before = table_versions(db, ["users"])[0]
+        db.execute(update(models.User).filter(models.User.email == seed["admin"]).values(contact="555-0199"))
+        db.commit()
+        assert table_versions(db, ["users"])[0] == before + 1
+    finally:
+        db.close()
+
+
+def test_rolled_back_write_keeps_the_counter(seed):
+    db = SessionLocal()
+    try:
+        before = table_versions(db, ["classes"])[0]
+        db.get(models.Class, seed["class_id"]).room = "Gym"
+        db.flush()
+        db.rollback()
+        assert table_versions(db, ["classes"])[0] == before
+    finally:
+        db.close()
+
+
+def test_counter_is_bumped_once_per_commit(seed):
+    db = SessionLocal()
+    try:
+        before = table_versions(db, ["classes"])[0]
+        for room in ("Gym", "Lab"):
+            db.get(models.Class, seed["class_id"]).room = room
+            db.flush()
+            # Nothing is written to cache_stamps until the commit
+            assert table_versions(db, ["classes"])[0] == before
+        db.get(models.Class, seed["class_id"]).room = "0"
+        db.commit()
+        assert table_versions(db, ["classes"])[0] == before + 1
+    finally:
+        db.close()
+
+
+def test_etag_is_scoped_to_the_user(client, seed):
+    from app.routers.auth import create_access_token
+
+    def headers(email):
+        return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+    etag = client.get("/student/classes", headers=headers(seed["student"])).headers["etag"]
+    other = client.get("/student/classes", headers={**headers("student1@test.com"), "If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+
+def test_etag_matches():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('W/"abd"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
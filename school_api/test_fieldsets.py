@@ -0,0 +1,67 @@
+from app.instrumentation import recent_requests
+
+
+def last_statements():
+    return [s["sql"] for s in recent_requests[-1]["statements"]]
+
+
+def test_sparse_user_list_selects_only_requested_columns(client, auth_headers, seed):
+    response = client.get("/admin/users", params={"fields": "full_name"}, headers=auth_headers("admin"))
+    assert response.status_code == 200
+    assert all(set(user) == {"id", "full_name"} for user in response.json())
+    [select_users] = [sql for sql in last_statements() if "FROM users" in sql and "users.full_name" in sql]
+    assert "users.email" not in select_users
+
+
+def test_unknown_field_is_rejected(client, auth_headers):
+    response = client.get("/admin/users", params={"fields": "id,hashed_password"}, headers=auth_headers("admin"))
+    assert response.status_code == 400
+    assert "hashed_password" in response.json()["detail"]
+
+    response = client.get("/admin/classes", params={"include": "grades"}, headers=auth_headers("admin"))
+    assert response.status_code == 400
+
+
+def test_role_lists_accept_fields(client, auth_headers, seed):
+    response = client.get("/admin/teachers", params={"fields": "id,email,subject"}, headers=auth_headers("admin"))
+    assert response.json() == [{"id": response.json()[0]["id"], "email": seed["teacher"], "subject": "Math"}]
+
+
+def test_class_list_skips_expansions_not_requested(client, auth_headers):
+    full = client.get("/admin/classes", headers=auth_headers("admin"))
+    sparse = client.get("/admin/classes", params={"fields": "name,current_students"}, headers=auth_headers("admin"))
+    assert sparse.status_code == 200
+    assert [set(c) for c in sparse.json()] == [{"id", "name", "current_students"}] * len(full.json())
+    assert [c["current_students"] for c in sparse.json()] == [len(c["enrolled_students"]) for c in full.json()]
+    assert int(sparse.headers["x-db-queries"]) < int(full.headers["x-db-queries"])
+    assert not any("class_enrollments.status" in sql and "users.email" in sql for sql in last_statements())
+
+
+def test_class_list_includes_only_requested_expansions(client, auth_headers, seed):
+    response = client.get("/admin/classes", params={"fields": "id", "include": "teacher"},
+                          headers=auth_headers("admin"))
+    classes = response.json()
+    assert all(set(c) == {"id", "teacher"} for c in classes)
+    assert classes[0]["teacher"]["email"] == seed["teacher"]
+
+
+def test_teacher_classes_fields_and_include(client, auth_headers, seed):
+    response = client.get("/teacher/classes", params={"fields": "students_count"}, headers=auth_headers("teacher"))
+    assert response.status_code == 200
+    assert all(set(c) == {"id", "students_count"} for c in response.json())
+    assert {c["students_count"] for c in response.json()} == {5}
+
+    response = client.get("/teacher/classes", params={"fields": "name", "include": "recent_assignments"},
+                          headers=auth_headers("teacher"))
+    by_id = {c["id"]: c for c in response.json()}
+    assert [a["title"] for a in by_id[seed["class_id"]]["recent_assignments"]] == ["Homework"]
+
+
+def test_roster_and_public_lists_accept_fields(client, auth_headers, seed):
+    roster = client.get(f"/teacher/classes/{seed['class_id']}/students", params={"fields": "email"},
+                        headers=auth_headers("teacher"))
+    assert all(set(s) == {"id", "email"} for s in roster.json())
+    assert seed["student"] in {s["email"] for s in roster.json()}
+
+    users = client.get("/public/users/role/teacher", params={"fields": "full_name,subject"})
+    assert users.json()[0] == {"id": users.json()[0]["id"], "full_name": "Teacher", "subject": "Math"}
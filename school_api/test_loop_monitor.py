@@ -0,0 +1,44 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.loop_monitor import LoopLagMonitor
+
+
+def test_stall_is_attributed_to_blocking_route():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05, size=10)
+    app = FastAPI()
+
+    @app.get("/block/{seconds}")
+    async def block(seconds: float):
+        time.sleep(seconds)  # blocking call in an async handler
+        return {}
+
+    @app.on_event("startup")
+    async def start():
+        monitor.start()
+
+    @app.on_event("shutdown")
+    async def stop():
+        monitor.stop()
+
+    with TestClient(app) as client:
+        time.sleep(0.05)
+        client.get("/block/0.3")
+        time.sleep(0.05)
+
+    stall = max(monitor.stalls, key=lambda s: s["lag_ms"])
+    assert stall["route"] == "/block/{seconds}"
+    assert stall["path"] == "/block/0.3"
+    assert stall["lag_ms"] >= 150
+    assert stall["stack"][-1].startswith("block (")
+    assert monitor.summary()["/block/{seconds}"]["stalls"] >= 1
+
+
+def test_debug_endpoint_and_metrics(client, auth_headers):
+    body = client.get("/_debug/loop-lag", headers=auth_headers("admin")).json()
+    assert {"threshold_ms", "by_route", "stalls"} <= set(body)
+    text = client.get("/metrics").text
+    assert "# TYPE event_loop_lag_seconds histogram" in text
+    assert "event_loop_lag_seconds_count" in text
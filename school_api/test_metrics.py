@@ -0,0 +1,59 @@
+import json
+import os
+
+from app import metrics
+
+
+def sample(text, line_prefix):
+    """Value of the first exposition line starting with line_prefix"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_requests_are_labelled_by_route_template(client, auth_headers, seed):
+    headers = auth_headers("teacher")
+    client.get(f"/teacher/classes/{seed['class_id']}/students", headers=headers)
+    client.get("/teacher/classes/999999/students", headers=headers)
+    text = client.get("/metrics").text
+
+    route = 'route="/teacher/classes/{class_id}/students"'
+    assert sample(text, f'http_request_duration_seconds_count{{method="GET",{route}}}') >= 2
+    assert sample(text, f'http_request_duration_seconds_bucket{{method="GET",{route},le="+Inf"}}') >= 2
+    assert "/teacher/classes/999999" not in text
+
+
+def test_status_counters_and_unmatched_routes(client):
+    client.get("/no/such/route")
+    text = client.get("/metrics").text
+    assert sample(text, 'http_requests_total{method="GET",route="<unmatched>",status="404"}') >= 1
+
+
+def test_gauges(client):
+    text = client.get("/metrics").text
+    assert "# TYPE http_requests_in_flight gauge" in text
+    assert sample(text, "http_requests_in_flight") == 1  # the scrape itself
+    assert sample(text, 'db_pool_checked_out{pool="primary"}') is not None
+    assert sample(text, 'db_pool_size{pool="primary"}') == 10
+    assert sample(text, "password_hash_queued") == 0
+
+
+def test_multiprocess_aggregation(tmp_path):
+    other = metrics.Counter("http_requests_total", "x", ("method", "route", "status"))
+    other.inc("GET", "/health", "200", amount=5)
+    gauge = metrics.Gauge("http_requests_in_flight", "x")
+    gauge.set(7)
+    other_snapshot = {"http_requests_total": other.snapshot(), "http_requests_in_flight": gauge.snapshot()}
+
+    # A live worker and one that has exited (its gauges no longer count)
+    (tmp_path / f"metrics_{os.getppid()}.json").write_text(json.dumps(other_snapshot))
+    (tmp_path / "metrics_999999999.json").write_text(json.dumps(other_snapshot))
+
+    before = dict((tuple(l), v) for l, v in metrics.registry.snapshot()["http_requests_total"]["samples"])
+    merged = metrics.collect(str(tmp_path))
+    totals = dict((tuple(l), v) for l, v in merged["http_requests_total"]["samples"])
+    assert totals[("GET", "/health", "200")] == before.get(("GET", "/health", "200"), 0) + 10
+    own = metrics.registry.snapshot()["http_requests_in_flight"]["samples"]
+    assert merged["http_requests_in_flight"]["samples"][0][1] == 7 + (own[0][1] if own else 0)
+    assert (tmp_path / f"metrics_{os.getpid()}.json").exists()
@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import models
+from app.database import SessionLocal
+from app.pagination import encode_cursor
+
+
+def walk(client, url, headers=None, **params):
+    """Every page of a list, following the rel="next" Link headers"""
+    pages = []
+    response = client.get(url, params=params, headers=headers)
+    while True:
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        if "link" not in response.headers:
+            return pages
+        link = response.headers["link"]
+        assert link.endswith('>; rel="next"')
+        response = client.get(link[1:link.index(">")], headers=headers)
+
+
+def test_pages_cover_the_list_once_in_order(client, auth_headers, seed):
+    admin = auth_headers("admin")
+    everything = client.get("/admin/users", headers=admin).json()
+    pages = walk(client, "/admin/users", admin, limit=2)
+    assert len(pages) == (len(everything) + 1) // 2
+    assert [user for page in pages for user in page] == everything
+    assert [user["id"] for user in everything] == sorted(user["id"] for user in everything)
+
+    # Sparse fieldsets and role filters page the same way
+    students = walk(client, "/admin/students", admin, limit=3, fields="email")
+    assert [len(page) for page in students] == [3, 2]
+    assert all(set(user) == {"id", "email"} for page in students for user in page)
+
+
+def test_default_page_size(client, auth_headers, seed, monkeypatch):
+    monkeypatch.setattr("app.config.settings.PAGE_SIZE_DEFAULT", 4)
+    # Without a limit or cursor the whole list comes back, for clients that do not page
+    everything = client.get("/public/users")
+    assert len(everything.json()) > 5 and "link" not in everything.headers
+
+    # A cursor alone pages by the default size
+    response = client.get("/public/users", params={"cursor": encode_cursor([everything.json()[0]["id"]])})
+    assert response.json() == everything.json()[1:5]
+    assert 'rel="next"' in response.headers["link"]
+    assert "limit" not in response.headers["link"]
+
+    # NDJSON exports are not paged unless asked to
+    assert len(client.get("/public/users", headers={"Accept": "application/x-ndjson"}).text.splitlines()) > 4
+
+
+def test_limit_and_cursor_are_validated(client, auth_headers):
+    admin = auth_headers("admin")
+    assert client.get("/admin/users", params={"limit": 0}, headers=admin).status_code == 422
+    assert client.get("/admin/users", params={"limit": 100000}, headers=admin).status_code == 422
+    for cursor in ("not a cursor", encode_cursor(["x"]), encode_cursor([1, 2]), encode_cursor([None])):
+        response = client.get("/admin/users", params={"cursor": cursor}, headers=admin)
+        assert response.status_code == 400, cursor
+        assert response.json()["detail"].startswith("Invalid cursor")
+
+
+def test_role_list_past_the_last_page_is_empty(client, seed):
+    pages = walk(client, "/public/users/role/student", limit=5)
+    assert [len(page) for page in pages] == [5]
+    last_id = pages[0][-1]["id"]
+    response = client.get("/public/users/role/student", params={"cursor": encode_cursor([last_id])})
+    assert response.status_code == 200 and response.json() == []
+
+
+@pytest.fixture
+def attendance_history(seed):
+    """Ten more days of attendance for the seeded student, removed afterwards"""
+    db = SessionLocal()
+    student = db.query(models.User).filter(models.User.email == seed["student"]).one()
+    records = [models.Attendance(student_id=student.id, class_id=seed["class_id"],
+                                 date=date.today() - timedelta(days=day), status="late")
+               for day in range(1, 11)]
+    db.add_all(records)
+    db.commit()
+    yield
+    for record in records:
+        db.delete(record)
+    db.commit()
+    db.close()
+
+
+def test_attendance_pages_by_date(client, auth_headers, attendance_history):
+    student = auth_headers("student")
+    pages = walk(client, "/student/attendance", student, limit=4)
+    assert [len(page) for page in pages] == [4, 4, 3]
+    days = [record["date"] for page in pages for record in page]
+    assert days == sorted(days, reverse=True)
+    assert days[0] == date.today().isoformat()
+
+
+@pytest.fixture
+def undated_assignments(seed):
+    """Four assignments without a due date and two around the seeded one; removed afterwards"""
+    db = SessionLocal()
+    teacher = db.query(models.User).filter(models.User.email == seed["teacher"]).one()
+    assignments = [models.Assignment(title=f"Task {i}", description="", class_id=seed["class_id"],
+                                     teacher_id=teacher.id, due_date=due_date, max_score=10, status="Active")
+                   for i, due_date in enumerate([None] * 4 + [date.today() - timedelta(days=1),
+                                                              date.today() + timedelta(days=1)])]
+    db.add_all(assignments)
+    db.commit()
+    yield
+    for assignment in assignments:
+        db.delete(assignment)
+    db.commit()
+    db.close()
+
+
+@pytest.mark.parametrize("url, headers, descending", [
+    ("/teacher/assignments", "teacher", True),
+    ("/student/assignments", "student", False),
+])
+def test_null_due_dates_page_last(client, auth_headers, undated_assignments, url, headers, descending):
+    headers = auth_headers(headers)
+    everything = client.get(url, headers=headers).json()
+    pages = walk(client, url, headers, limit=2)
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assignments = [assignment for page in pages for assignment in page]
+    assert assignments == everything
+
+    # The dated ones in order, then the undated ones by id, across page boundaries
+    due_dates = [assignment["due_date"] for assignment in assignments]
+    assert due_dates[:3] == sorted(due_dates[:3], reverse=descending) and due_dates[3:] == [None] * 4
+    ids = [assignment["id"] for assignment in assignments[3:]]
+    assert ids == sorted(ids, reverse=descending)
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.auth import PasswordHashPool, password_pool, verify_password_async
+from app.database import SessionLocal
+from app.routers.auth import get_password_hash
+
+
+def test_hashing_runs_off_the_event_loop():
+    hashed = get_password_hash("secret")
+    loop_thread = threading.get_ident()
+    seen = []
+
+    def check(plain, stored):
+        seen.append(threading.current_thread().name)
+        return threading.get_ident() != loop_thread
+
+    assert asyncio.run(password_pool.run(check, "secret", hashed))
+    assert seen[0].startswith("password-hash")
+    assert asyncio.run(verify_password_async("secret", hashed))
+    assert not asyncio.run(verify_password_async("wrong", hashed))
+
+
+def test_saturated_pool_rejects_with_503():
+    pool = PasswordHashPool(workers=1, max_pending=2, retry_after=3)
+    release = threading.Event()
+
+    async def storm():
+        jobs = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc_info:
+            await pool.run(release.wait)
+        stats = pool.stats()
+        release.set()
+        await asyncio.gather(*jobs)
+        return exc_info.value, stats
+
+    error, stats = asyncio.run(storm())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "3"
+    assert stats["running"] == 1 and stats["queued"] == 1 and stats["rejected"] == 1
+    assert pool.stats()["completed"] == 2
+
+
+def test_cancelled_jobs_are_not_counted_as_completed():
+    pool = PasswordHashPool(workers=1, max_pending=3, retry_after=1)
+    release = threading.Event()
+
+    def fail():
+        raise ValueError("bcrypt failed")
+
+    async def run():
+        running = asyncio.create_task(pool.run(release.wait))
+        queued = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        # Cancelled while still queued: it never reaches a worker
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        await running
+        with pytest.raises(ValueError):
+            await pool.run(fail)
+
+    asyncio.run(run())
+    stats = pool.stats()
+    # The finished job and the failed one, not the cancelled one
+    assert stats["completed"] == 2
+    assert stats["running"] == 0 and stats["queued"] == 0
+
+
+def test_login_storm_gets_503_not_a_hang(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(password_pool, "max_pending", 0)
+    response = client.post("/auth/token", data={"username": "nobody@test.com", "password": "x"})
+    # Unknown users never reach bcrypt
+    assert response.status_code == 401
+
+    db = SessionLocal()
+    try:
+        db.add(models.User(email="storm@test.com", full_name="Storm", role="student",
+                           hashed_password=get_password_hash("secret")))
+        db.commit()
+    finally:
+        db.close()
+    response = client.post("/auth/token", data={"username": "storm@test.com", "password": "secret"})
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert client.get("/_debug/password-pool", headers=auth_headers("admin")).json()["rejected"] >= 1
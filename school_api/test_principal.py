@@ -0,0 +1,84 @@
+from jose import jwt
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.dependencies import Principal
+from app.principal_cache import principal_values
+from app.routers.auth import create_access_token, token_claims
+
+
+def login(client, email, password="secret"):
+    response = client.post("/auth/token", data={"username": email, "password": password})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+def test_login_token_carries_claims(client, make_user):
+    user_id = make_user("claims@test.com")
+    token = login(client, "claims@test.com")
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    assert claims["sub"] == "claims@test.com"
+    assert claims["uid"] == user_id
+    assert claims["role"] == "student"
+    assert claims["ver"] == 0
+
+
+def test_role_guards_authorize_from_claims(client, make_user):
+    make_user("guarded@test.com")
+    headers = {"Authorization": f"Bearer {login(client, 'guarded@test.com')}"}
+    assert client.get("/student/classes", headers=headers).status_code == 200
+    assert client.get("/teacher/classes", headers=headers).status_code == 403
+    assert client.get("/admin/users", headers=headers).status_code == 403
+
+
+def test_password_change_revokes_tokens(client, auth_headers, make_user):
+    user_id = make_user("rotated@test.com")
+    headers = {"Authorization": f"Bearer {login(client, 'rotated@test.com')}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    response = client.put(f"/admin/users/{user_id}", json={"password": "changed"},
+                          headers=auth_headers("admin"))
+    assert response.status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+    fresh = {"Authorization": f"Bearer {login(client, 'rotated@test.com', 'changed')}"}
+    assert client.get("/auth/me", headers=fresh).status_code == 200
+
+
+def test_role_change_revokes_tokens(client, auth_headers, make_user):
+    user_id = make_user("promoted@test.com")
+    headers = {"Authorization": f"Bearer {login(client, 'promoted@test.com')}"}
+
+    db = SessionLocal()
+    try:
+        db.get(models.User, user_id).role = "teacher"
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_principal_reads_columns_without_building_the_user(seed):
+    db = SessionLocal()
+    try:
+        principal = Principal(db, principal_values(db, seed["teacher"]))
+        assert principal.role == "teacher"
+        assert principal.full_name == "Teacher"
+        assert principal._user is None
+
+        # Relationships need the ORM row, which is attached to the session on demand
+        assert len(principal.teaching_classes) == 3
+        assert principal.user in db
+    finally:
+        db.close()
+
+
+def test_token_claims_match_user(seed):
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == seed["admin"]).first()
+        claims = token_claims(user)
+        assert claims == {"sub": user.email, "uid": user.id, "role": "admin", "ver": user.token_version}
+        assert create_access_token(claims)
+    finally:
+        db.close()
@@ -0,0 +1,155 @@
+import time
+
+import pytest
+from sqlalchemy import update
+
+from app import models
+from app.database import SessionLocal
+from app.instrumentation import count_queries
+from app.principal_cache import PRINCIPAL_STAMP, get_principal, principal_cache
+from app.routers.auth import create_access_token
+
+
+def bearer(email):
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    # Only look at the stamp when a test asks for it
+    monkeypatch.setattr(principal_cache, "stamp_interval", 3600)
+    monkeypatch.setattr(principal_cache, "_checked_at", time.monotonic())
+    principal_cache.clear()
+
+
+def test_repeat_requests_skip_the_user_query(client, make_user):
+    make_user("cached@test.com")
+    hits = principal_cache.hits
+
+    first = client.get("/auth/me", headers=bearer("cached@test.com"))
+    second = client.get("/auth/me", headers=bearer("cached@test.com"))
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert int(first.headers["x-db-queries"]) == 1
+    assert int(second.headers["x-db-queries"]) == 0
+    assert principal_cache.hits == hits + 1
+
+
+def test_cached_principal_is_attached_to_the_session(seed):
+    first = SessionLocal()
+    try:
+        get_principal(first, seed["teacher"])
+    finally:
+        first.close()
+
+    db = SessionLocal()
+    try:
+        with count_queries() as stats:
+            teacher = get_principal(db, seed["teacher"])
+        assert stats.count == 0
+        assert teacher in db
+        # Relationships still lazy-load through the request's session
+        assert len(teacher.teaching_classes) == 3
+    finally:
+        db.close()
+
+
+def test_admin_update_invalidates(client, auth_headers, make_user):
+    user_id = make_user("renamed@test.com")
+    headers = bearer("renamed@test.com")
+    client.get("/auth/me", headers=headers)
+
+    response = client.put(f"/admin/students/{user_id}", json={"full_name": "New Name"},
+                          headers=auth_headers("admin"))
+    assert response.status_code == 200
+    assert client.get("/auth/me", headers=headers).json()["full_name"] == "New Name"
+
+
+def test_deactivated_user_is_locked_out(client, auth_headers, make_user):
+    user_id = make_user("deactivated@test.com")
+    headers = bearer("deactivated@test.com")
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    response = client.put(f"/admin/users/{user_id}", json={"is_active": False},
+                          headers=auth_headers("admin"))
+    assert response.status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_deleted_user_is_locked_out(client, auth_headers, make_user):
+    user_id = make_user("deleted@test.com")
+    headers = bearer("deleted@test.com")
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    assert client.delete(f"/admin/users/{user_id}", headers=auth_headers("admin")).status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def stamp_version():
+    db = SessionLocal()
+    try:
+        return db.query(models.CacheStamp.version).filter(models.CacheStamp.name == PRINCIPAL_STAMP).scalar() or 0
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("change", ["deactivate", "delete"])
+def test_change_with_email_unloaded_bumps_the_stamp(client, make_user, change):
+    user_id = make_user(f"unloaded-{change}@test.com")
+    headers = bearer(f"unloaded-{change}@test.com")
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    before = stamp_version()
+
+    db = SessionLocal()
+    try:
+        user = db.get(models.User, user_id)
+        db.expire(user, ["email"])
+        if change == "delete":
+            db.delete(user)
+        else:
+            user.is_active = False
+        db.commit()
+    finally:
+        db.close()
+
+    assert stamp_version() == before + 1
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_change_from_another_worker_clears_cache(client, monkeypatch, make_user):
+    make_user("other-worker@test.com")
+    headers = bearer("other-worker@test.com")
+    monkeypatch.setattr(principal_cache, "stamp_interval", 0)
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    # Another worker deactivates the user; simulate it without touching this worker's cache
+    db = SessionLocal()
+    try:
+        db.execute(update(models.User).filter(models.User.email == "other-worker@test.com")
+                   .values(is_active=False))
+        db.execute(update(models.CacheStamp).filter(models.CacheStamp.name == PRINCIPAL_STAMP)
+                   .values(version=models.CacheStamp.version + 1))
+        db.commit()
+    finally:
+        db.close()
+
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_debug_endpoint_reports_counters(client, auth_headers):
+    stats = client.get("/_debug/principal-cache", headers=auth_headers("admin")).json()
+    assert {"hits", "misses", "evictions", "invalidations", "size"} <= stats.keys()
+
+
+def test_lru_bound():
+    from app.principal_cache import PrincipalCache
+
+    cache = PrincipalCache(max_size=2, ttl=60, stamp_interval=1)
+    cache.put("a", {})
+    cache.put("b", {})
+    cache.get("a")
+    cache.put("c", {})
+    assert cache.get("b") is None
+    assert cache.get("a") == {} and cache.get("c") == {}
+    assert cache.evictions == 1
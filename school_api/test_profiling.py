@@ -0,0 +1,61 @@
+from app.database import SessionLocal
+from app import models
+from app.profiling import ProfileStore
+from app.routers.auth import create_access_token, token_claims
+
+
+def claims_headers(email):
+    """Headers with a token carrying uid/role/ver claims, as issued by /auth/token"""
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == email).one()
+        return {"Authorization": f"Bearer {create_access_token(token_claims(user))}"}
+    finally:
+        db.close()
+
+
+def test_admin_request_is_profiled_and_listed(client, seed):
+    headers = {**claims_headers(seed["admin"]), "X-Profile": "1"}
+    response = client.get("/admin/classes", headers=headers)
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    listing = client.get("/_debug/profiles", headers=headers).json()
+    entry = next(p for p in listing if p["id"] == profile_id)
+    assert entry["route"] == "/admin/classes"
+    assert entry["status"] == 200
+    assert "stacks" not in entry
+
+    folded = client.get(f"/_debug/profiles/{profile_id}?format=folded", headers=headers)
+    assert folded.status_code == 200
+    svg = client.get(f"/_debug/profiles/{profile_id}", headers=headers)
+    assert svg.headers["content-type"] == "image/svg+xml"
+    assert svg.text.startswith("<svg")
+
+
+def test_query_flag_and_unknown_profiles(client, seed):
+    headers = claims_headers(seed["admin"])
+    response = client.get("/admin/stats?profile=1", headers=headers)
+    assert "x-profile-id" in response.headers
+    assert client.get("/_debug/profiles/../../etc/passwd", headers=headers).status_code == 404
+    assert client.get("/_debug/profiles/" + "0" * 32, headers=headers).status_code == 404
+
+
+def test_only_admins_are_profiled(client, seed):
+    headers = {**claims_headers(seed["student"]), "X-Profile": "1"}
+    response = client.get("/student/classes", headers=headers)
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert client.get("/_debug/profiles", headers=headers).status_code == 403
+
+
+def test_store_is_bounded(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=3, max_bytes=10 * 1024)
+    for i in range(5):
+        store.save({"id": f"{i:032d}", "stacks": {}})
+    assert [p["id"] for p in store.list()] == [f"{i:032d}" for i in (4, 3, 2)]
+
+    # A single profile over the size limit does not survive either
+    store.save({"id": "9" * 32, "stacks": {"x" * 20000: 1}})
+    assert store.load("9" * 32) is None
+    assert store.list() == []
@@ -0,0 +1,139 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+from starlette.requests import Request
+
+from app import models
+from app.database import Base, create_db_engine
+from app.pagination import Page, encode_cursor
+
+# The router queries that run on every dashboard load, and the table each must reach by index
+HOT_QUERIES = {
+    "teacher classes": (
+        "classes",
+        select(models.Class).filter(models.Class.teacher_id == 1, models.Class.status == "active"),
+    ),
+    "teacher assignments": (
+        "assignments",
+        select(models.Assignment).filter(models.Assignment.teacher_id == 1).order_by(models.Assignment.due_date.desc()),
+    ),
+    "class assignments": (
+        "assignments",
+        select(models.Assignment).filter(models.Assignment.class_id == 1, models.Assignment.status == "Active"),
+    ),
+    "users by role": (
+        "users",
+        select(func.count(models.User.id)).filter(models.User.role == "student"),
+    ),
+    "parent students": (
+        "users",
+        select(models.User).filter(models.User.parent_id == 1, models.User.role == "student"),
+    ),
+    "grade lookup": (
+        "grades",
+        select(models.Grade).filter(
+            models.Grade.class_id == 1, models.Grade.assignment_id == 1, models.Grade.student_id == 1
+        ),
+    ),
+    "gradebook grades": (
+        "grades",
+        select(models.Grade).filter(models.Grade.class_id == 1, models.Grade.assignment_id == 1),
+    ),
+    "submission lookup": (
+        "assignment_submissions",
+        select(models.AssignmentSubmission).filter(
+            models.AssignmentSubmission.assignment_id == 1, models.AssignmentSubmission.student_id == 1
+        ),
+    ),
+    "class attendance for a day": (
+        "attendance",
+        select(models.Attendance).filter(models.Attendance.class_id == 1, models.Attendance.date == date.today()),
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def plan_engine(tmp_path_factory):
+    engine = create_db_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, statement):
+    compiled = statement.compile(dialect=engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(plan_engine, name):
+    table, statement = HOT_QUERIES[name]
+    plan = query_plan(plan_engine, statement)
+    steps = [step for step in plan if step.split()[1:2] == [table]]
+    assert steps, plan
+    for step in steps:
+        assert "USING" in step and "INDEX" in step, f"{name}: {plan}"
+
+
+def second_page(statement, *keys, cursor, descending=False):
+    request = Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": []})
+    return Page(request, 50, encode_cursor(cursor)).apply(statement, *keys, descending=descending)
+
+
+# Keyset-paginated lists: the page after a cursor must be an index range scan, without a sort
+PAGED_QUERIES = {
+    "users": ("users", second_page(select(models.User), models.User.id, cursor=[50])),
+    "users by role": (
+        "users",
+        second_page(select(models.User.id, models.User.email).filter(models.User.role == "student"),
+                    models.User.id, cursor=[50]),
+    ),
+    "class assignments": (
+        "assignments",
+        second_page(select(models.Assignment).filter(models.Assignment.class_id == 1),
+                    models.Assignment.id, cursor=[50]),
+    ),
+    "student grades": (
+        "grades",
+        second_page(select(models.Grade).filter(models.Grade.student_id == 1),
+                    models.Grade.id, cursor=[50], descending=True),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", PAGED_QUERIES)
+def test_page_is_an_index_range_scan(plan_engine, name):
+    table, statement = PAGED_QUERIES[name]
+    plan = query_plan(plan_engine, statement)
+    steps = [step for step in plan if step.split()[1:2] == [table]]
+    assert steps and all("USING" in step and ("<" in step or ">" in step) for step in steps), f"{name}: {plan}"
+    assert not any("TEMP B-TREE" in step for step in plan), f"{name}: {plan}"
+
+
+# Lists sorted on a nullable column: the NULL rows sorting last are an OR in the predicate,
+# so the page is an index scan of the user's rows in order, without a sort, but not a seek
+NULLABLE_PAGED_QUERIES = {
+    "teacher assignments": (
+        "assignments",
+        second_page(select(models.Assignment).filter(models.Assignment.teacher_id == 1),
+                    models.Assignment.due_date, models.Assignment.id, cursor=["2024-05-01", 50], descending=True),
+    ),
+    "student attendance": (
+        "attendance",
+        second_page(select(models.Attendance).filter(models.Attendance.student_id == 1),
+                    models.Attendance.date, models.Attendance.id, cursor=["2024-05-01", 50], descending=True),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", NULLABLE_PAGED_QUERIES)
+def test_page_on_a_nullable_key_is_an_ordered_index_scan(plan_engine, name):
+    table, statement = NULLABLE_PAGED_QUERIES[name]
+    plan = query_plan(plan_engine, statement)
+    steps = [step for step in plan if step.split()[1:2] == [table]]
+    assert steps and all("USING" in step and "INDEX" in step for step in steps), f"{name}: {plan}"
+    assert not any("TEMP B-TREE" in step for step in plan), f"{name}: {plan}"
@@ -0,0 +1,55 @@
+import pytest
+
+from app.auth import login_counts
+from app.rate_limit import InMemorySlidingWindow, login_limiter
+
+
+def test_sliding_window_allows_up_to_limit():
+    backend = InMemorySlidingWindow()
+    results = [backend.hit("k", limit=3, window=3600)[0] for _ in range(4)]
+    assert results == [True, True, True, False]
+    allowed, retry_after = backend.hit("k", limit=3, window=3600)
+    assert not allowed and retry_after >= 1
+    backend.reset("k")
+    assert backend.hit("k", limit=3, window=3600)[0]
+
+
+def test_sliding_window_is_bounded():
+    backend = InMemorySlidingWindow(max_keys=10)
+    for i in range(100):
+        backend.hit(f"key{i}", limit=1, window=60)
+    assert len(backend._entries) == 10
+
+
+@pytest.fixture
+def fresh_limiter(monkeypatch):
+    monkeypatch.setattr(login_limiter, "backend", InMemorySlidingWindow())
+    monkeypatch.setattr("app.config.settings.LOGIN_RATE_LIMIT_PER_EMAIL", 3)
+
+
+def test_login_is_throttled_before_bcrypt(client, fresh_limiter, monkeypatch):
+    calls = []
+    monkeypatch.setattr("app.auth.verify_password", lambda *args: calls.append(args) or False)
+    throttled = login_counts["throttled_email"]
+
+    statuses = [
+        client.post("/auth/token", data={"username": "admin@test.com", "password": "guess"}).status_code
+        for _ in range(5)
+    ]
+    assert statuses == [401, 401, 401, 429, 429]
+    assert len(calls) == 3
+    assert login_counts["throttled_email"] == throttled + 2
+
+    response = client.post("/auth/token", data={"username": "ADMIN@test.com", "password": "guess"})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_ip_limit(client, auth_headers, fresh_limiter, monkeypatch):
+    monkeypatch.setattr("app.config.settings.LOGIN_RATE_LIMIT_PER_IP", 2)
+    statuses = [
+        client.post("/auth/token", data={"username": f"user{i}@test.com", "password": "x"}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [401, 401, 429]
+    assert client.get("/_debug/logins", headers=auth_headers("admin")).json()["throttled_ip"] >= 1
@@ -0,0 +1,75 @@
+from app import models
+from app.auth import login_counts
+from app.database import SessionLocal
+from app.refresh_tokens import hash_refresh_token
+
+
+def login(client, email, password="secret"):
+    response = client.post("/auth/token", data={"username": email, "password": password})
+    assert response.status_code == 200
+    return response.json()
+
+
+def refresh(client, token):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_refresh_rotates_and_skips_bcrypt(client, monkeypatch, make_user):
+    make_user("refresh@test.com")
+    tokens = login(client, "refresh@test.com")
+
+    def no_bcrypt(*args):
+        raise AssertionError("refresh must not verify a password")
+    monkeypatch.setattr("app.auth.verify_password", no_bcrypt)
+    refreshes = login_counts["refresh"]
+
+    response = refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert rotated["user_role"] == "student"
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {rotated['access_token']}"})
+    assert me.status_code == 200
+    assert login_counts["refresh"] == refreshes + 1
+
+
+def test_only_the_hash_is_stored(client, make_user):
+    make_user("hashed@test.com")
+    token = login(client, "hashed@test.com")["refresh_token"]
+    db = SessionLocal()
+    try:
+        row = db.query(models.RefreshToken).filter(
+            models.RefreshToken.token_hash == hash_refresh_token(token)
+        ).one()
+        assert token not in (row.token_hash, row.family_id)
+    finally:
+        db.close()
+
+
+def test_reuse_revokes_the_whole_family(client, auth_headers, make_user):
+    make_user("reuse@test.com")
+    first = login(client, "reuse@test.com")["refresh_token"]
+    second = refresh(client, first).json()["refresh_token"]
+
+    # Replaying the spent token kills the token that replaced it as well
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, second).status_code == 401
+    assert client.get("/_debug/logins", headers=auth_headers("admin")).json()["refresh_reuse_detected"] >= 1
+
+
+def test_logout_revokes(client, make_user):
+    make_user("logout@test.com")
+    token = login(client, "logout@test.com")["refresh_token"]
+    assert client.post("/auth/logout", json={"refresh_token": token}).status_code == 200
+    assert refresh(client, token).status_code == 401
+
+
+def test_password_change_invalidates_refresh_tokens(client, auth_headers, make_user):
+    user_id = make_user("changed@test.com")
+    token = login(client, "changed@test.com")["refresh_token"]
+    client.put(f"/admin/users/{user_id}", json={"password": "new-secret"}, headers=auth_headers("admin"))
+    assert refresh(client, token).status_code == 401
+
+
+def test_unknown_token_is_rejected(client):
+    assert refresh(client, "not-a-token").status_code == 401
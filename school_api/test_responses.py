@@ -0,0 +1,47 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from app import models, schemas
+from app.responses import ORJSONResponse, schema_columns
+
+
+def test_orjson_response_encodes_dates_natively():
+    body = ORJSONResponse({"day": date(2024, 5, 1), "at": datetime(2024, 5, 1, 8, 30, 0, 250000),
+                           "amount": Decimal("1.5"), 1: "non-string key"}).body
+    assert json.loads(body) == {"day": "2024-05-01", "at": "2024-05-01T08:30:00.250000", "amount": 1.5,
+                                "1": "non-string key"}
+
+
+def test_schema_columns_skip_non_columns():
+    names = [column.key for column in schema_columns(models.User, schemas.User)]
+    assert names[:3] == ["email", "full_name", "role"]
+    assert "students" not in names and "hashed_password" not in names
+
+
+def test_admin_users_match_response_model(client, auth_headers, seed):
+    response = client.get("/admin/users", headers=auth_headers("admin"))
+    assert response.status_code == 200
+    users = response.json()
+    assert set(users[0]) == set(schemas.User.model_fields)
+    for user in users:
+        schemas.User.model_validate(user)
+    assert {u["email"] for u in users} >= {seed["admin"], seed["teacher"], seed["student"]}
+
+
+def test_class_grades_rows(client, auth_headers, seed):
+    headers = auth_headers("teacher")
+    url = f"/teacher/classes/{seed['class_id']}/grades"
+    grades = client.get(url, params={"assignment_id": seed["assignment_id"]}, headers=headers).json()
+    assert len(grades) == 5
+    for grade in grades:
+        schemas.GradeResponse.model_validate(grade)
+    graded = next(g for g in grades if g["score"] is not None)
+    assert graded["score"] == 90 and graded["assignment_id"] == seed["assignment_id"]
+    ungraded = [g for g in grades if g["id"] is None]
+    assert len(ungraded) == 4
+    assert all(g["status"] == "pending" and g["submission_status"] == "not_submitted" for g in ungraded)
+
+    # Without an assignment every student is listed with the defaults
+    grades = client.get(url, headers=headers).json()
+    assert len(grades) == 5 and all(g["id"] is None and g["max_score"] == 100.0 for g in grades)
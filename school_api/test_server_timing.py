@@ -0,0 +1,30 @@
+def timings(response):
+    """Server-Timing entries as {name: milliseconds}"""
+    entries = {}
+    for entry in response.headers["server-timing"].split(","):
+        name, *params = entry.strip().split(";")
+        entries[name] = float(next(p for p in params if p.startswith("dur="))[4:])
+    return entries
+
+
+def test_admin_gets_phase_breakdown(client, auth_headers):
+    response = client.get("/admin/users", headers=auth_headers("admin"))
+    assert response.status_code == 200
+    phases = timings(response)
+    assert {"auth", "handler", "serialize", "db", "total"} <= set(phases)
+    assert phases["total"] >= phases["auth"] + phases["handler"]
+    assert 'desc="' in response.headers["server-timing"]
+
+
+def test_other_roles_get_no_server_timing(client, auth_headers):
+    response = client.get("/student/classes", headers=auth_headers("student"))
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    assert "server-timing" not in client.get("/health").headers
+
+
+def test_phases_are_exported_as_metrics(client, auth_headers):
+    client.get("/admin/users", headers=auth_headers("admin"))
+    text = client.get("/metrics").text
+    for phase in ("auth", "handler", "serialize", "db"):
+        assert f'http_request_phase_seconds_count{{route="/admin/users",phase="{phase}"}}' in text
@@ -0,0 +1,42 @@
+import json
+
+from app.slow_queries import configure_slow_query_log, redact_parameters, slow_query_log
+
+
+def test_slow_statements_are_logged_with_route_and_plan(client, auth_headers, monkeypatch):
+    monkeypatch.setattr("app.config.settings.SLOW_QUERY_MS", 0.0)
+    response = client.get("/teacher/dashboard/stats", headers=auth_headers("teacher"))
+    assert response.status_code == 200
+    slow_query_log.flush()
+    monkeypatch.setattr("app.config.settings.SLOW_QUERY_MS", None)
+
+    entries = client.get("/_debug/slow-queries", params={"route": "/teacher/dashboard/stats"},
+                         headers=auth_headers("admin")).json()
+    assert entries
+    assert all(e["method"] == "GET" for e in entries)
+    active = next(e for e in entries if "lower(classes.status)" in e["statement"])
+    assert "<redacted str(6)>" in json.dumps(active["parameters"])  # the "active" filter value
+    assert active["plan"] and all(isinstance(line, str) for line in active["plan"])
+    assert not any(e["statement"].startswith("EXPLAIN") for e in slow_query_log.entries)
+
+
+def test_parameters_are_redacted():
+    assert redact_parameters((42, "alice@example.com", None, True)) == [42, "<redacted str(17)>", None, True]
+    assert redact_parameters({"email": b"x"}) == {"email": "<redacted bytes(1)>"}
+
+
+def test_rotating_file(client, auth_headers, monkeypatch, tmp_path):
+    path = tmp_path / "slow.log"
+    monkeypatch.setattr("app.config.settings.SLOW_QUERY_LOG_FILE", str(path))
+    configure_slow_query_log()
+    try:
+        monkeypatch.setattr("app.config.settings.SLOW_QUERY_MS", 0.0)
+        client.get("/student/classes", headers=auth_headers("student"))
+        slow_query_log.flush()
+    finally:
+        monkeypatch.setattr("app.config.settings.SLOW_QUERY_MS", None)
+        monkeypatch.setattr("app.config.settings.SLOW_QUERY_LOG_FILE", None)
+        configure_slow_query_log()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert any(line["route"] == "/student/classes" and line["plan"] for line in lines)
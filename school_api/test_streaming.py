@@ -0,0 +1,72 @@
+import orjson
+from sqlalchemy import select
+
+from app import models
+from app.responses import stream_rows
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+def ndjson_lines(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    return [orjson.loads(line) for line in response.text.splitlines()]
+
+
+def test_user_lists_stream_one_object_per_line(client, auth_headers, seed):
+    admin = auth_headers("admin")
+    assert ndjson_lines(client.get("/admin/users", headers={**admin, **NDJSON})) == \
+        client.get("/admin/users", headers=admin).json()
+
+    sparse = ndjson_lines(client.get("/admin/users", params={"fields": "email"}, headers={**admin, **NDJSON}))
+    assert seed["teacher"] in {user["email"] for user in sparse}
+    assert all(set(user) == {"id", "email"} for user in sparse)
+
+    assert ndjson_lines(client.get("/public/users", headers=NDJSON)) == client.get("/public/users").json()
+
+
+def test_rows_are_fetched_and_written_in_batches(seed, monkeypatch):
+    monkeypatch.setattr("app.config.settings.STREAM_YIELD_PER", 2)
+    query = select(models.User.id, models.User.email).order_by(models.User.id)
+    chunks = list(stream_rows(query))
+    users = b"".join(chunks).splitlines()
+    assert len(users) >= 7
+    assert len(chunks) == (len(users) + 1) // 2
+    assert all(chunk.count(b"\n") == 2 for chunk in chunks[:-1])
+
+
+def test_public_users_etag_depends_on_representation(client, seed):
+    json_etag = client.get("/public/users").headers["etag"]
+    response = client.get("/public/users", headers=NDJSON)
+    assert response.headers["etag"] != json_etag
+    assert "Accept" in response.headers["vary"]
+
+    assert client.get("/public/users", headers={**NDJSON, "If-None-Match": json_etag}).status_code == 200
+    revalidated = client.get("/public/users", headers={**NDJSON, "If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_class_enrollments_nest_the_student(client, auth_headers, seed):
+    admin = auth_headers("admin")
+    url = f"/admin/classes/{seed['class_id']}/enrollments"
+    enrollments = client.get(url, headers=admin)
+    assert enrollments.status_code == 200
+    assert len(enrollments.json()) == 5
+    first = enrollments.json()[0]
+    assert first["class_id"] == seed["class_id"] and first["class_"] is None
+    assert first["student"]["id"] == first["student_id"]
+    assert "hashed_password" not in first["student"]
+
+    assert ndjson_lines(client.get(url, headers={**admin, **NDJSON})) == enrollments.json()
+
+
+def test_student_attendance_streams(client, auth_headers, seed):
+    student = auth_headers("student")
+    records = client.get("/student/attendance", headers=student).json()
+    assert records[0]["status"] == "present"
+    assert ndjson_lines(client.get("/student/attendance", headers={**student, **NDJSON})) == records
+
+    filtered = client.get("/student/attendance", params={"class_id": seed["class_id"] + 1},
+                          headers={**student, **NDJSON})
+    assert filtered.status_code == 200 and filtered.text == ""
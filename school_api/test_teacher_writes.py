@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+
+from app import models
+from app.database import SessionLocal
+
+
+@pytest.fixture
+def other_class(seed, make_class):
+    """Another teacher's class with a graded student and an attendance record; removed afterwards"""
+    class_ids = make_class(teacher=None)
+    db = SessionLocal()
+    student = db.query(models.User).filter(models.User.email == seed["student"]).one()
+    assignment = models.Assignment(title="Sketch", description="", class_id=class_ids["class_id"],
+                                   teacher_id=class_ids["teacher_id"], due_date=date.today(), max_score=100,
+                                   status="Active")
+    db.add(assignment)
+    db.flush()
+    grade = models.Grade(student_id=student.id, class_id=class_ids["class_id"], assignment_id=assignment.id,
+                         score=95)
+    attendance = models.Attendance(student_id=student.id, class_id=class_ids["class_id"], date=date.today(),
+                                   status="present")
+    db.add_all([grade, attendance])
+    db.commit()
+    ids = {"class_id": class_ids["class_id"], "assignment_id": assignment.id, "student_id": student.id,
+           "grade_id": grade.id, "attendance_id": attendance.id}
+    yield ids
+    for model, row_id in ((models.Attendance, ids["attendance_id"]), (models.Grade, ids["grade_id"]),
+                          (models.Assignment, ids["assignment_id"])):
+        db.query(model).filter(model.id == row_id).delete()
+    db.commit()
+    db.close()
+
+
+def stored(model, row_id):
+    db = SessionLocal()
+    try:
+        return db.get(model, row_id)
+    finally:
+        db.close()
+
+
+def test_grade_for_another_class_is_rejected(client, auth_headers, seed, other_class):
+    response = client.post(f"/teacher/classes/{seed['class_id']}/grades", headers=auth_headers("teacher"), json={
+        "student_id": other_class["student_id"], "class_id": other_class["class_id"],
+        "assignment_id": other_class["assignment_id"], "score": 1,
+    })
+    assert response.status_code == 400
+    assert stored(models.Grade, other_class["grade_id"]).score == 95
+
+
+def test_attendance_for_another_class_is_rejected(client, auth_headers, seed, other_class):
+    response = client.post(f"/teacher/classes/{seed['class_id']}/attendance", headers=auth_headers("teacher"), json=[
+        {"student_id": other_class["student_id"], "class_id": seed["class_id"], "date": date.today().isoformat(),
+         "status": "present"},
+        {"student_id": other_class["student_id"], "class_id": other_class["class_id"],
+         "date": date.today().isoformat(), "status": "absent"},
+    ])
+    assert response.status_code == 400
+    assert stored(models.Attendance, other_class["attendance_id"]).status == "present"
+
+
+def test_repeated_keys_in_a_batch_keep_the_last_entry(client, auth_headers, seed):
+    teacher = auth_headers("teacher")
+    student = client.get("/admin/students", headers=auth_headers("admin")).json()[1]["id"]
+    day = date.today().isoformat()
+    marks = client.post(f"/teacher/classes/{seed['class_id']}/attendance", headers=teacher, json=[
+        {"student_id": student, "class_id": seed["class_id"], "date": day, "status": status}
+        for status in ("present", "absent", "late")
+    ])
+    assert marks.status_code == 200, marks.text
+    assert [record["status"] for record in marks.json()] == ["late"]
+
+    assignment = client.get(f"/teacher/classes/{seed['class_id']}/assignments", headers=teacher).json()[0]["id"]
+    grades = client.post("/teacher/grades/bulk", headers=teacher, json=[
+        {"student_id": student, "class_id": seed["class_id"], "assignment_id": assignment, "score": score}
+        for score in (10, 20, 30)
+    ])
+    assert grades.status_code == 200, grades.text
+    assert [grade["score"] for grade in grades.json()] == [30]
+
+    db = SessionLocal()
+    try:
+        db.query(models.Attendance).filter(models.Attendance.id == marks.json()[0]["id"]).delete()
+        db.query(models.Grade).filter(models.Grade.id == grades.json()[0]["id"]).delete()
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from app.tracing import configure_tracing, shutdown_tracing
+
+
+@pytest.fixture
+def trace_file(monkeypatch, tmp_path):
+    """Trace every request to a JSON-lines file; yields a function returning the exported spans"""
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr("app.config.settings.TRACE_EXPORTER", "file")
+    monkeypatch.setattr("app.config.settings.TRACE_FILE", str(path))
+    monkeypatch.setattr("app.config.settings.TRACE_SAMPLE_RATE", 1.0)
+    configure_tracing()
+
+    def spans():
+        shutdown_tracing()
+        exported = []
+        for line in path.read_text().splitlines():
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    exported.extend(scope["spans"])
+        return exported
+
+    yield spans
+    shutdown_tracing()
+
+
+def attributes(span):
+    return {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+
+
+def test_request_auth_handler_and_query_spans(client, auth_headers, trace_file):
+    response = client.get("/teacher/dashboard/stats", headers=auth_headers("teacher"))
+    assert response.status_code == 200
+    trace_id = response.headers["x-trace-id"]
+
+    spans = [s for s in trace_file() if s["traceId"] == trace_id]
+    by_id = {s["spanId"]: s for s in spans}
+    server = next(s for s in spans if "parentSpanId" not in s)
+    assert server["name"] == "GET /teacher/dashboard/stats"
+    assert attributes(server)["http.route"] == "/teacher/dashboard/stats"
+    assert attributes(server)["http.response.status_code"] == "200"
+
+    auth = next(s for s in spans if s["name"] == "auth get_current_principal")
+    handler = next(s for s in spans if s["name"] == "handler get_dashboard_stats")
+    assert auth["parentSpanId"] == handler["parentSpanId"] == server["spanId"]
+    queries = [s for s in spans if attributes(s).get("db.system") == "sqlite"]
+    assert queries and all(by_id[q["parentSpanId"]]["name"] in (handler["name"], auth["name"]) for q in queries)
+    assert any(q["parentSpanId"] == handler["spanId"] for q in queries)
+    assert all(int(s["startTimeUnixNano"]) <= int(s["endTimeUnixNano"]) for s in spans)
+
+
+def test_traceparent_decides_sampling(client, trace_file):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    sampled = client.get("/health", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    assert sampled.headers["x-trace-id"] == trace_id
+    unsampled = client.get("/health", headers={"traceparent": f"00-{'1' * 32}-00f067aa0ba902b7-00"})
+    assert "x-trace-id" not in unsampled.headers
+
+    server = next(s for s in trace_file() if s["traceId"] == trace_id and s["kind"] == 2)
+    assert server["parentSpanId"] == "00f067aa0ba902b7"
+
+
+def test_tracing_is_off_by_default(client):
+    assert "x-trace-id" not in client.get("/health").headers
@@ -8,6 +8,9 @@ setup(
         "fastapi",
         "uvicorn",
         "sqlalchemy",
+        "aiosqlite",
+        "asyncpg",
+        "psycopg2-binary",
         "alembic",
         "python-jose[cryptography]",
         "passlib[bcrypt]",